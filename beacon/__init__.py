@@ -0,0 +1 @@
+"""Data, indexing and serving layers behind the Beacon Health Streamlit app."""
@@ -0,0 +1,48 @@
+"""Progress charts drawn from the adherence check-in log.
+
+Patients check in once a day per prescription. The repository appends each
+check-in to a log and folds it into weekly and monthly rollups as it is
+written (see ``Repository.record_checkins``). A chart picks the finest
+resolution that fits ``MAX_POINTS`` periods into its range, so it reads at
+most that many rows even for years of daily check-ins.
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Most periods a progress chart shows, before moving to a coarser resolution
+MAX_POINTS = 60
+
+# Resolution -> approximate days per period, finest first
+RESOLUTIONS = {'day': 1, 'week': 7, 'month': 30}
+
+# Chart ranges offered to patients; None means since the app was prescribed
+RANGES = {'30 days': 30, '6 months': 182, '1 year': 365, 'All': None}
+
+
+def resolution_for(days):
+    """Finest resolution drawing ``days`` days in at most ``MAX_POINTS`` periods."""
+    for granularity, period_days in RESOLUTIONS.items():
+        if days <= MAX_POINTS * period_days:
+            return granularity
+    return 'month'
+
+
+def _period_start(granularity, day):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def progress_series(repo, prescription_id, since, now=None):
+    """``(granularity, frame)`` of the share of check-ins taken per period since ``since``."""
+    today = (now or datetime.now()).date()
+    since = since.date() if isinstance(since, datetime) else since
+    granularity = resolution_for((today - since).days + 1)
+    history = repo.adherence_history(
+        prescription_id, granularity, _period_start(granularity, since)
+    ).set_index('period')
+    adherence = (100 * history['taken'] / history['days']).round(1)
+    return granularity, pd.DataFrame({'Adherence %': adherence})
@@ -0,0 +1,43 @@
+"""Practice analytics built from the repository's pre-aggregated rollups.
+
+Check-ins are folded into daily and weekly practice rollups as they are
+recorded (see ``Repository.record_checkins``), and prescriptions into a
+per-app rollup (see ``Repository.refresh_rollups``). The charts here read a fixed
+window of rollup rows, so rendering costs the same however long the practice
+history grows.
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Periods shown per chart granularity
+WINDOWS = {'day': 30, 'week': 12}
+
+# How many apps the usage chart lists
+TOP_APPS = 10
+
+
+def _window_start(granularity, now):
+    periods = WINDOWS[granularity]
+    if granularity == 'day':
+        return now.date() - timedelta(days=periods - 1)
+    monday = now.date() - timedelta(days=now.weekday())
+    return monday - timedelta(weeks=periods - 1)
+
+
+def engagement_series(repo, provider, granularity='week', now=None):
+    """Share of check-in days ``provider``'s patients took their app on, per period."""
+    start = _window_start(granularity, now or datetime.now())
+    freq = 'D' if granularity == 'day' else '7D'
+    periods = pd.date_range(start, periods=WINDOWS[granularity], freq=freq)
+    rollup = repo.engagement(provider, granularity, start).set_index('period')
+    engagement = 100 * rollup['taken'] / rollup['days']
+    return pd.DataFrame({'Engagement %': engagement.reindex(periods).round(1)})
+
+
+def app_usage(repo, provider, limit=TOP_APPS):
+    """``provider``'s most prescribed apps, ready for ``st.bar_chart``."""
+    usage = repo.app_usage(provider, limit)
+    return usage.rename(columns={
+        'app_name': 'App', 'prescriptions': 'Prescribed', 'active': 'Active'
+    }).set_index('App')
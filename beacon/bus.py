@@ -0,0 +1,213 @@
+"""Push writes to the open sessions that show the data they changed.
+
+A fragment that renders one user's data follows that user's channels, e.g.
+``follow(('inbox', recipient))`` in the inbox. ``store`` publishes the
+channels each write touches, and the ``Bus`` reruns just the following
+fragments, each in its own session. A message or prescription therefore
+reaches the recipient's open inbox, My Apps or patient list at once, with no
+timer and no full rerun, and sessions that do not show it are not woken.
+
+Channels are ``(topic, key)`` tuples:
+
+* ``('inbox', recipient)`` - messages sent to, or marked read by, a recipient
+* ``('patient', patient)`` - a patient's prescriptions and check-ins
+* ``('provider', provider)`` - a provider's patient list
+
+Writes made by other processes reach the bus through ``store.sync``. When
+several workers share the repository, a listener thread runs it every
+``LISTEN_INTERVAL`` seconds, so a push crosses workers in at most that long.
+
+Subscriptions go with their session: a fragment that was not rendered in the
+session's last full run, or a session that closed, is dropped the next time
+one of its channels is published.
+
+Rerunning a fragment from the server leans on Streamlit's private session
+API, which only ``rerun_fragment`` touches. On a Streamlit outside
+``STREAMLIT_VERSIONS``, or one that moved them, live updates turn off with a
+warning and ``follow`` returns False; sessions then see writes on their next
+rerun.
+"""
+import logging
+import re
+import threading
+import time
+
+import streamlit
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from beacon import metrics
+
+_LOGGER = logging.getLogger(__name__)
+
+try:
+    from streamlit.proto.ClientState_pb2 import ClientState
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner_utils.script_run_context import ThreadState
+except ImportError as error:
+    _LOGGER.warning("Live updates are off: this Streamlit has no %s", error.name)
+    ClientState = Runtime = ThreadState = None
+
+# Seconds between the listener's checks for writes made by other processes
+LISTEN_INTERVAL = 0.5
+
+# Streamlit (major, minor) releases the bus was checked against: from the first, before the second
+STREAMLIT_VERSIONS = ((1, 65), (2, 0))
+
+
+def _supported():
+    if ThreadState is None:
+        return False
+    version = tuple(int(part) for part in re.findall(r'\d+', streamlit.__version__)[:2])
+    low, high = STREAMLIT_VERSIONS
+    if not low <= version < high:
+        _LOGGER.warning("Live updates are off: not checked against Streamlit %s",
+                        streamlit.__version__)
+        return False
+    return True
+
+
+# Cleared when this Streamlit lacks an internal the bus needs
+_available = _supported()
+
+
+def _disable(error):
+    global _available
+    if _available:
+        _LOGGER.warning("Live updates are off: %s", error)
+    _available = False
+
+
+def current_subscriber():
+    """``(session id, fragment id)`` of the fragment being rendered, else None."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None or not _available:
+        return None
+    try:
+        fragment_id = ThreadState.get().fragment_id
+    except AttributeError as error:
+        _disable(error)
+        return None
+    return None if fragment_id is None else (ctx.session_id, fragment_id)
+
+
+def rerun_fragment(subscriber):
+    """Ask a session to rerun one fragment; False once the session or fragment is gone.
+
+    Streamlit has no public call for this, so it does what the browser's
+    rerun request does, on the session's event loop. The request carries no
+    widget states, so the rerun sees the session's current widget values and
+    no button is pressed twice. These are the only calls into Streamlit's
+    private session API; a release that changes them turns live updates off.
+    """
+    session_id, fragment_id = subscriber
+    if not _available or not Runtime.exists():
+        return False
+    try:
+        info = Runtime.instance()._session_mgr.get_active_session_info(session_id)
+        session = None if info is None else info.session
+        if session is None or not session._fragment_storage.contains(fragment_id):
+            return False
+        request = ClientState(fragment_id=fragment_id, is_auto_rerun=True)
+        request.page_script_hash = session._client_state.page_script_hash
+        request.query_string = session._client_state.query_string
+        session._event_loop.call_soon_threadsafe(session.request_rerun, request)
+    except AttributeError as error:
+        _disable(error)
+        return False
+    return True
+
+
+class Bus:
+    def __init__(self, deliver=rerun_fragment):
+        self.deliver = deliver
+        self._lock = threading.Lock()
+        # channel -> {subscriber: None}, and subscriber -> its channels
+        self._followers = {}
+        self._channels = {}
+        self._listener = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._channels)
+
+    def follow(self, *channels, subscriber=None):
+        """Rerun the calling fragment (or ``subscriber``) whenever ``channels`` are published.
+
+        Replaces what the fragment followed before, so a fragment that now
+        shows another user stops following the previous one.
+        """
+        subscriber = subscriber or current_subscriber()
+        if subscriber is None or not _available:
+            return False
+        channels = frozenset(channels)
+        with self._lock:
+            if self._channels.get(subscriber) == channels:
+                return True
+            self._unfollow(subscriber)
+            if channels:
+                self._channels[subscriber] = channels
+                for channel in channels:
+                    self._followers.setdefault(channel, {})[subscriber] = None
+        return True
+
+    def _unfollow(self, subscriber):
+        for channel in self._channels.pop(subscriber, ()):
+            followers = self._followers[channel]
+            del followers[subscriber]
+            if not followers:
+                del self._followers[channel]
+
+    def publish(self, *channels):
+        """Rerun the fragments following any of ``channels``; returns how many.
+
+        The publishing session is skipped: it is already rendering its write.
+        """
+        ctx = get_script_run_ctx(suppress_warning=True)
+        publisher = None if ctx is None else ctx.session_id
+        with self._lock:
+            subscribers = {
+                subscriber: channel for channel in channels
+                for subscriber in self._followers.get(channel, ())
+                if subscriber[0] != publisher
+            }
+        return self._deliver(subscribers)
+
+    def publish_all(self):
+        """Rerun every following fragment, e.g. after missing other processes' writes."""
+        with self._lock:
+            subscribers = {
+                subscriber: next(iter(channels)) for subscriber, channels in self._channels.items()
+            }
+        return self._deliver(subscribers)
+
+    def _deliver(self, subscribers):
+        gone = []
+        for subscriber, (topic, _) in subscribers.items():
+            if self.deliver(subscriber):
+                metrics.LIVE_UPDATES.inc(topic=topic)
+            else:
+                gone.append(subscriber)
+        if gone:
+            with self._lock:
+                for subscriber in gone:
+                    self._unfollow(subscriber)
+        return len(subscribers) - len(gone)
+
+    def listen(self, poll, interval=LISTEN_INTERVAL):
+        """Call ``poll`` every ``interval`` seconds on a daemon thread, once per bus."""
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(
+                target=self._listen, args=(poll, interval), name="beacon-bus-listener",
+                daemon=True,
+            )
+        self._listener.start()
+
+    def _listen(self, poll, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                poll()
+            except Exception:
+                _LOGGER.exception("Live update poll failed")
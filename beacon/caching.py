@@ -0,0 +1,69 @@
+"""Process-wide caches of values loaded from the repository on first read.
+
+A ``LoadingCache`` keeps up to ``max_entries`` values, dropping the least
+recently read first. Loads run outside the lock, so a write can land while
+one is in flight. Every write bumps a generation, and a load that started
+before the latest write is returned to its caller but not kept.
+"""
+import threading
+from collections import OrderedDict
+
+from beacon import metrics
+
+
+class LoadingCache:
+    def __init__(self, name, max_entries):
+        # ``name`` labels the cache's lookups in ``metrics``
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, load, fresh=None):
+        """The value for ``key``, calling ``load()`` on a miss.
+
+        A cached value that fails ``fresh(value)`` counts as a miss.
+        """
+        metrics.CACHE_REQUESTS.inc(cache=self.name)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None and (fresh is None or fresh(value)):
+                self._entries.move_to_end(key)
+                return value
+            generation = self._generation
+        metrics.CACHE_MISSES.inc(cache=self.name)
+        loaded = load()
+        with self._lock:
+            if generation != self._generation:
+                return loaded
+            value = self._entries.get(key)
+            # Another reader may have loaded it meanwhile; keep theirs
+            if value is not None and (fresh is None or fresh(value)):
+                return value
+            self._entries[key] = loaded
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return loaded
+
+    def written(self, key):
+        """Note a write to ``key``'s data; returns its cached value to update, if any."""
+        with self._lock:
+            self._generation += 1
+            return self._entries.get(key)
+
+    def invalidate(self, *keys):
+        """Drop ``keys`` after a write to their data."""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
@@ -0,0 +1,61 @@
+"""Lookup indexes over the app catalog.
+
+Built once per catalog version alongside the cached ``Catalog`` so reruns reuse
+the same hash tables instead of scanning ``apps`` with boolean masks.
+"""
+import numpy as np
+import pandas as pd
+
+# App columns carried onto prescription rows by ``join_prescriptions``
+APP_FIELDS = ['id', 'description', 'category', 'fda_status']
+
+# Catalog sort options -> (sort column, ascending)
+SORT_KEYS = {
+    'Name': ('name', True),
+    'Clinical Score': ('clinical_score', False),
+    'Most Users': ('active_users', False),
+    'Success Rate': ('success_rate', False),
+}
+
+
+class CatalogIndex:
+    def __init__(self, apps):
+        self.by_name = apps.set_index('name', drop=False, verify_integrity=True)
+        # Right-hand side of the prescription join, keyed and column-renamed up front
+        self._join_frame = (
+            apps.set_index('name')[APP_FIELDS]
+            .rename(columns={'id': 'app_id'})
+        )
+        self._apps = apps
+        self._orders = {}
+
+    def sort_order(self, sort_key, subset=None):
+        """Row positions sorted by ``sort_key``, optionally limited to ``subset``.
+
+        The full order is computed once per key; a subset is ordered through the
+        cached ranks, so it costs O(k log k) in the subset size, not a re-sort.
+        """
+        if sort_key not in self._orders:
+            column, ascending = SORT_KEYS[sort_key]
+            order = np.argsort(self._apps[column].to_numpy(), kind='stable')
+            if not ascending:
+                order = order[::-1].copy()
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            self._orders[sort_key] = (order, rank)
+        order, rank = self._orders[sort_key]
+        if subset is None:
+            return order
+        return subset[np.argsort(rank[subset], kind='stable')]
+
+    def join_prescriptions(self, prescriptions):
+        """Attach app fields to each prescription in one vectorized join.
+
+        Prescriptions for apps no longer in the catalog are dropped, matching
+        what the dashboard can actually render.
+        """
+        if prescriptions.empty:
+            return prescriptions.assign(**{
+                column: pd.Series(dtype=object) for column in self._join_frame.columns
+            })
+        return prescriptions.join(self._join_frame, on='app_name', how='inner')
@@ -0,0 +1,235 @@
+"""Streaming import and export of the app library.
+
+Vendor catalogs arrive as CSV, JSON Lines or Parquet. They are read
+``chunk_size`` rows at a time. Each chunk is validated (see
+``schema.split_valid``) and its valid rows are upserted by app name, so
+memory stays bounded however large the feed is. Exports page through the
+repository the same way and write each chunk as soon as it is read.
+
+Run as a script to import or export from the command line::
+
+    python -m beacon.catalog_io import vendor-feed.parquet
+    python -m beacon.catalog_io export library.csv
+"""
+import argparse
+import json
+import os
+import secrets
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from beacon import schema
+from beacon.repository import open_repository
+
+# Format -> MIME type offered on download
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+# Columns a feed may leave out, and the value they default to
+OPTIONAL_COLUMNS = {'description': '', 'testimonial': '', 'active_users': 0, 'features': None}
+REQUIRED_COLUMNS = [
+    column for column in schema.APP_COLUMNS if column != 'id' and column not in OPTIONAL_COLUMNS
+]
+EXPORT_COLUMNS = schema.APP_COLUMNS[:4] + ['features'] + schema.APP_COLUMNS[4:]
+
+# Rejected rows reported back in full; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Exports left in a download directory are removed after this many seconds
+EXPORT_TTL_SECONDS = 60 * 60
+
+ImportResult = namedtuple('ImportResult', ['imported', 'rejected', 'errors'])
+
+
+def format_of(file_name):
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f"Unsupported catalog file type {extension!r}; use CSV, JSONL or Parquet")
+    return EXTENSIONS[extension]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet catalogs need pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def _size(source):
+    size = getattr(source, 'size', None)
+    if size is None:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+    return size
+
+
+def read_chunks(source, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield ``(frame, fraction read)`` for each chunk of a binary file."""
+    if fmt == 'parquet':
+        parquet = _pyarrow().parquet.ParquetFile(source)
+        total = parquet.metadata.num_rows
+        done = 0
+        for batch in parquet.iter_batches(batch_size=chunk_size):
+            done += batch.num_rows
+            yield batch.to_pandas(), done / max(1, total)
+        return
+    size = _size(source)
+    if fmt == 'csv':
+        # Features stay text here; _parse_features understands JSON or "a|b"
+        reader = pd.read_csv(source, chunksize=chunk_size, dtype={'features': str})
+    else:
+        reader = pd.read_json(source, lines=True, chunksize=chunk_size, dtype=False)
+    with reader:
+        for frame in reader:
+            yield frame, min(1.0, source.tell() / max(1, size))
+
+
+def _parse_features(value):
+    """A feature list from a list, JSON text or "a|b"; ``None`` if the JSON is malformed."""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(feature) for feature in value]
+    if not isinstance(value, str) or not value.strip():
+        return []
+    value = value.strip()
+    if value.startswith('['):
+        try:
+            return [str(feature) for feature in json.loads(value)]
+        except json.JSONDecodeError:
+            return None
+    return [feature.strip() for feature in value.split('|') if feature.strip()]
+
+
+def import_apps(repo, source, fmt, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Validate and upsert a catalog file chunk by chunk.
+
+    ``progress(fraction, text)`` is called after every chunk. Apps are matched
+    by name, so re-importing a feed updates it in place. Raises ``ValueError``
+    if the file lacks a required column; invalid rows are skipped and reported
+    in ``ImportResult.errors`` (by 1-based data row).
+    """
+    imported = rejected = rows = 0
+    errors = []
+    for frame, fraction in read_chunks(source, fmt, chunk_size):
+        missing = [column for column in REQUIRED_COLUMNS if column not in frame]
+        if missing:
+            raise ValueError(f"Catalog file is missing columns: {', '.join(missing)}")
+        for column, default in OPTIONAL_COLUMNS.items():
+            if column not in frame:
+                frame[column] = default
+        frame.index = pd.RangeIndex(rows + 1, rows + 1 + len(frame), name='row')
+        rows += len(frame)
+
+        frame['features'] = frame['features'].map(_parse_features)
+        valid, invalid = schema.split_valid(frame)
+        imported += repo.upsert_apps(valid.to_dict('records'))
+        rejected += len(invalid)
+        if len(errors) < MAX_REPORTED_ERRORS and len(invalid):
+            errors.append(invalid[['name', 'error']].head(MAX_REPORTED_ERRORS))
+        if progress:
+            progress(fraction, f"{imported:,} imported · {rejected:,} rejected")
+    errors = pd.concat(errors).head(MAX_REPORTED_ERRORS) if errors else pd.DataFrame(
+        columns=['name', 'error']
+    )
+    return ImportResult(imported, rejected, errors)
+
+
+def _arrow_schema(pyarrow):
+    types = {
+        'id': pyarrow.int64(), 'features': pyarrow.list_(pyarrow.string()),
+        'active_users': pyarrow.int64(), 'success_rate': pyarrow.int64(),
+        **{column: pyarrow.float64() for column in schema.SCORE_COLUMNS},
+    }
+    return pyarrow.schema([(column, types.get(column, pyarrow.string())) for column in EXPORT_COLUMNS])
+
+
+def write_export(repo, fmt, sink, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write the whole catalog to binary ``sink``, one chunk at a time."""
+    exported = 0
+    writer = None
+    for apps in repo.iter_apps(chunk_size):
+        apps = schema.coerce(apps)[EXPORT_COLUMNS]
+        if fmt == 'parquet':
+            pyarrow = _pyarrow()
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(sink, _arrow_schema(pyarrow))
+            writer.write_table(pyarrow.Table.from_pandas(
+                apps, schema=writer.schema, preserve_index=False
+            ))
+        elif fmt == 'csv':
+            apps = apps.assign(features=apps['features'].map(json.dumps))
+            sink.write(apps.to_csv(index=False, header=not exported).encode())
+        else:
+            sink.write(apps.to_json(orient='records', lines=True).rstrip('\n').encode() + b'\n')
+        exported += len(apps)
+    if writer is not None:
+        writer.close()
+    elif fmt == 'csv' and not exported:
+        sink.write((','.join(EXPORT_COLUMNS) + '\n').encode())
+    return exported
+
+
+def export_to(repo, fmt, directory, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Export the catalog as ``fmt`` to a new, unguessably named file in ``directory``.
+
+    Returns the file's name. The file only appears once complete, so it can
+    be served from ``directory`` as is. Exports there older than
+    ``EXPORT_TTL_SECONDS`` are removed first.
+    """
+    expired = time.time() - EXPORT_TTL_SECONDS
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < expired:
+                os.remove(entry.path)
+        except OSError:
+            pass
+    name = f'{secrets.token_urlsafe(16)}.{fmt}'
+    with tempfile.NamedTemporaryFile(dir=directory, suffix='.tmp', delete=False) as sink:
+        try:
+            write_export(repo, fmt, sink, chunk_size)
+        except BaseException:
+            os.remove(sink.name)
+            raise
+    os.replace(sink.name, os.path.join(directory, name))
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('path')
+    parser.add_argument('--url', help="repository URL (default: BEACON_DATABASE_URL)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    repo = open_repository(args.url)
+    fmt = format_of(args.path)
+    start = time.perf_counter()
+    if args.action == 'import':
+        with open(args.path, 'rb') as source:
+            result = import_apps(repo, source, fmt, args.chunk_size)
+        print(f"Imported {result.imported:,} apps, rejected {result.rejected:,}"
+              f" in {time.perf_counter() - start:.1f}s")
+        if len(result.errors):
+            print(result.errors.to_string())
+    else:
+        with open(args.path, 'wb') as sink:
+            exported = write_export(repo, fmt, sink, args.chunk_size)
+        print(f"Exported {exported:,} apps in {time.perf_counter() - start:.1f}s")
+    repo.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Demo records the platform is seeded with on first start."""
+import random
+from datetime import datetime, timedelta
+
+# Identities the demo dashboards render for
+DEMO_PATIENT = 'John Davis'
+DEMO_PROVIDER = 'Dr. Sarah Smith'
+
+# Apps data
+APPS = [
+    {
+        'id': 1,
+        'name': 'MindfulPath',
+        'category': 'Mental Health',
+        'description': '🧠 AI-powered CBT therapy platform with personalized interventions',
+        'features': ['Daily Mood Tracking', 'AI Therapy Sessions', 'Crisis Support', 'Progress Analytics'],
+        'clinical_score': 4.8,
+        'ux_score': 4.7,
+        'security_score': 4.9,
+        'integration_score': 4.6,
+        'fda_status': 'FDA Cleared',
+        'testimonial': "Life-changing app! Helped me manage anxiety effectively.",
+        'active_users': 15000,
+        'success_rate': 87
+    },
+    {
+        'id': 2,
+        'name': 'DiabetesGuard',
+        'category': 'Chronic Disease',
+        'description': '📊 Smart diabetes management with CGM integration',
+        'features': ['Glucose Monitoring', 'Medication Reminders', 'Diet Tracking', 'Doctor Connect'],
+        'clinical_score': 4.9,
+        'ux_score': 4.8,
+        'security_score': 4.9,
+        'integration_score': 4.7,
+        'fda_status': 'FDA Cleared',
+        'testimonial': "Revolutionized my diabetes care routine!",
+        'active_users': 25000,
+        'success_rate': 92
+    },
+    {
+        'id': 3,
+        'name': 'SleepHarmony',
+        'category': 'Sleep',
+        'description': '😴 Advanced sleep therapy and tracking',
+        'features': ['Sleep Analysis', 'Relaxation Exercises', 'Smart Alarm', 'Sleep Scores'],
+        'clinical_score': 4.7,
+        'ux_score': 4.9,
+        'security_score': 4.8,
+        'integration_score': 4.5,
+        'fda_status': 'FDA Registered',
+        'testimonial': "Finally getting quality sleep!",
+        'active_users': 10000,
+        'success_rate': 83
+    }
+]
+
+# Patients under the demo provider's care
+PATIENTS = [
+    {'id': 1, 'mrn': 'BH-000001', 'name': 'John Davis', 'age': 45, 'condition': 'Type 2 Diabetes',
+     'status': 'Active', 'adherence': 85, 'provider': DEMO_PROVIDER},
+    {'id': 2, 'mrn': 'BH-000002', 'name': 'Sarah Chen', 'age': 32, 'condition': 'Anxiety',
+     'status': 'Pending Review', 'adherence': 92, 'provider': DEMO_PROVIDER},
+    {'id': 3, 'mrn': 'BH-000003', 'name': 'Michael Brown', 'age': 58, 'condition': 'Hypertension',
+     'status': 'New', 'adherence': 78, 'provider': DEMO_PROVIDER},
+]
+
+
+def prescriptions():
+    # Prescriptions data, dated relative to the moment the store is built
+    now = datetime.now()
+    return [
+        {
+            'id': 1,
+            'app_name': 'DiabetesGuard',
+            'prescribed_by': 'Dr. Sarah Smith',
+            'prescribed_to': 'John Davis',
+            'status': 'Active',
+            'prescribed_date': now - timedelta(days=30),
+            'next_review': now + timedelta(days=60),
+            'adherence_rate': 85,
+            'progress_notes': 'Good progress in glucose management'
+        },
+        {
+            'id': 2,
+            'app_name': 'MindfulPath',
+            'prescribed_by': 'Dr. James Wilson',
+            'prescribed_to': 'Sarah Chen',
+            'status': 'Active',
+            'prescribed_date': now - timedelta(days=15),
+            'next_review': now + timedelta(days=75),
+            'adherence_rate': 92,
+            'progress_notes': 'Excellent engagement with daily exercises'
+        },
+        {
+            'id': 3,
+            'app_name': 'MindfulPath',
+            'prescribed_by': 'Dr. James Wilson',
+            'prescribed_to': 'John Davis',
+            'status': 'Active',
+            'prescribed_date': now - timedelta(days=10),
+            'next_review': now + timedelta(days=7),
+            'adherence_rate': 92,
+            'progress_notes': 'Excellent engagement with daily exercises'
+        }
+    ]
+
+
+def checkins(seed=0):
+    # A daily check-in for every day of each prescription so far, taken at its rate
+    rng = random.Random(seed)
+    today = datetime.now().date()
+    for prescription in prescriptions():
+        day = prescription['prescribed_date'].date()
+        while day < today:
+            yield prescription['id'], day, rng.random() * 100 < prescription['adherence_rate']
+            day += timedelta(days=1)
+
+
+def messages():
+    # Messages data
+    now = datetime.now()
+    return [
+        {
+            'id': 1,
+            'recipient': 'John Davis',
+            'sender': 'Dr. Smith',
+            'content': 'Great progress with your glucose management! Keep it up! 🌟',
+            'app': 'DiabetesGuard',
+            'date': now - timedelta(days=2),
+            'read': False
+        },
+        {
+            'id': 2,
+            'recipient': 'John Davis',
+            'sender': 'Dr. Wilson',
+            'content': 'Your meditation streak is impressive! How are you feeling?',
+            'app': 'MindfulPath',
+            'date': now - timedelta(days=1),
+            'read': True
+        }
+    ]
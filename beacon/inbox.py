@@ -0,0 +1,151 @@
+"""Per-recipient message inboxes with maintained unread counters.
+
+An inbox files its recipient's messages in lists kept sorted by
+``(date, id)``, one of all messages and one of the unread ones, and counts
+messages and unread messages per sender and per app. Dates are kept as the
+repository's ISO text, so comparisons need no date parsing. The unread badge
+is a counter read and the newest-N page a slice of N ids, however long the
+history grows; message bodies are only read for the page on screen.
+
+An inbox is loaded by one index-ordered scan the first time its recipient's
+dashboard reads it, then kept current by ``add`` and ``mark_read`` as
+messages are written through ``store``, and by ``refresh`` for writes made by
+other processes. Marking messages read moves them between counters rather
+than reloading anything.
+"""
+import bisect
+import threading
+from collections import Counter, namedtuple
+
+from beacon.caching import LoadingCache
+from beacon.repository import date_key
+
+# Recipients whose inboxes are kept; the least recently read are dropped first
+MAX_CACHED_INBOXES = 10_000
+
+Entry = namedtuple('Entry', ['id', 'sender', 'app', 'date', 'read'])
+
+
+def entry(message_id, sender, app, date, read):
+    return Entry(message_id, sender, app or None, date_key(date), bool(read))
+
+
+class Inbox:
+    def __init__(self, rows=()):
+        self._entries = {}
+        self._all = []
+        self._unread = []
+        # name -> [messages, unread]
+        self.senders = {}
+        self.apps = {}
+        self._lock = threading.Lock()
+        # Rows arrive ordered by date, so the lists are built by appending
+        for row in rows:
+            found = entry(*row)
+            self._entries[found.id] = found
+            self._all.append((found.date, found.id))
+            if not found.read:
+                self._unread.append((found.date, found.id))
+        for groups, field in ((self.senders, 'sender'), (self.apps, 'app')):
+            messages = Counter(getattr(found, field) for found in self._entries.values())
+            unread = Counter(
+                getattr(found, field) for found in self._entries.values() if not found.read
+            )
+            groups.update((name, [count, unread[name]]) for name, count in messages.items())
+
+    def __len__(self):
+        return len(self._all)
+
+    @property
+    def unread(self):
+        return len(self._unread)
+
+    def _count(self, found, step):
+        for groups, name in ((self.senders, found.sender), (self.apps, found.app)):
+            counts = groups.setdefault(name, [0, 0])
+            counts[0] += step
+            counts[1] += step if not found.read else 0
+            if not counts[0]:
+                del groups[name]
+
+    def _file(self, found):
+        position = (found.date, found.id)
+        self._entries[found.id] = found
+        bisect.insort(self._all, position)
+        if not found.read:
+            bisect.insort(self._unread, position)
+        self._count(found, 1)
+
+    def _unfile(self, found):
+        position = (found.date, found.id)
+        del self._entries[found.id]
+        del self._all[bisect.bisect_left(self._all, position)]
+        if not found.read:
+            del self._unread[bisect.bisect_left(self._unread, position)]
+        self._count(found, -1)
+
+    def add(self, found):
+        """File a new message, or re-file one whose read state changed."""
+        with self._lock:
+            if found.id in self._entries:
+                self._unfile(self._entries[found.id])
+            self._file(found)
+
+    def mark_read(self, message_ids):
+        """Mark messages read; returns the ids that were unread until now."""
+        changed = []
+        with self._lock:
+            for message_id in message_ids:
+                found = self._entries.get(message_id)
+                if found is None or found.read:
+                    continue
+                self._unfile(found)
+                self._file(found._replace(read=True))
+                changed.append(message_id)
+        return changed
+
+    @staticmethod
+    def _newest(positions, limit, offset):
+        stop = max(0, len(positions) - offset)
+        start = 0 if limit is None else max(0, stop - limit)
+        return [message_id for _, message_id in reversed(positions[start:stop])]
+
+    def newest(self, limit=None, offset=0):
+        """Ids of the newest messages, newest first, skipping ``offset``."""
+        with self._lock:
+            return self._newest(self._all, limit, offset)
+
+    def newest_unread(self, limit=None):
+        """Entries of the newest unread messages, newest first."""
+        with self._lock:
+            newest = self._newest(self._unread, limit, 0)
+            return [self._entries[message_id] for message_id in newest]
+
+
+class InboxCache:
+    def __init__(self, repo, max_entries=MAX_CACHED_INBOXES):
+        self.repo = repo
+        self._inboxes = LoadingCache('inboxes', max_entries)
+
+    def get(self, recipient):
+        """The recipient's inbox, loaded on first read."""
+        return self._inboxes.get(recipient, lambda: Inbox(self.repo.inbox_entries(recipient)))
+
+    def add(self, recipient, found):
+        """File a written message in its recipient's inbox, if that is loaded."""
+        inbox = self._inboxes.written(recipient)
+        if inbox is not None:
+            inbox.add(found)
+
+    def mark_read(self, recipient, message_ids):
+        """Apply messages marked read; returns the ids that were unread until now."""
+        inbox = self._inboxes.written(recipient)
+        return list(message_ids) if inbox is None else inbox.mark_read(message_ids)
+
+    def refresh(self, row):
+        """Re-file a message from its current ``message_entry`` row."""
+        if row is not None:
+            self.add(row[1], entry(row[0], *row[2:]))
+
+    def clear(self):
+        self._inboxes.clear()
@@ -0,0 +1,276 @@
+"""Lightweight in-process metrics for the platform dashboard.
+
+Histograms keep cumulative Prometheus buckets for export plus a fixed-size
+ring buffer of recent observations for live percentiles, so memory stays
+constant however long the process runs. Everything is process-wide and
+guarded by one lock; observing a value is a few array writes.
+"""
+import contextlib
+import http.server
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Upper bounds (seconds) of the exported latency buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Recent observations kept per histogram series for percentiles
+RING_SIZE = 1024
+
+# Sessions not seen for this long no longer count as active
+SESSION_IDLE_SECONDS = 5 * 60
+
+STARTED_AT = time.time()
+
+_lock = threading.Lock()
+
+
+class _HistogramSeries:
+    __slots__ = ('ring', 'position', 'filled', 'buckets', 'sum', 'count')
+
+    def __init__(self, bucket_count):
+        self.ring = np.zeros(RING_SIZE)
+        self.position = 0
+        self.filled = 0
+        self.buckets = np.zeros(bucket_count + 1, dtype=np.int64)
+        self.sum = 0.0
+        self.count = 0
+
+    def recent(self):
+        """Ring contents, oldest observation first."""
+        if self.filled < RING_SIZE:
+            return self.ring[:self.filled].copy()
+        return np.roll(self.ring, -self.position)
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.bounds = np.array(buckets)
+        self._series = {}
+
+    def _get(self, key):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.bounds))
+        return series
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with _lock:
+            series = self._get(key)
+            series.ring[series.position] = value
+            series.position = (series.position + 1) % RING_SIZE
+            series.filled = min(series.filled + 1, RING_SIZE)
+            series.buckets[np.searchsorted(self.bounds, value)] += 1
+            series.sum += value
+            series.count += 1
+
+    def series(self):
+        """{label values: recent observations} for every series seen so far."""
+        with _lock:
+            return {key: series.recent() for key, series in self._series.items()}
+
+    def percentiles(self, *quantiles, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with _lock:
+            series = self._series.get(key)
+            recent = series.recent() if series else None
+        if recent is None or not len(recent):
+            return [None] * len(quantiles)
+        return list(np.quantile(recent, quantiles))
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            for key, series in sorted(self._series.items()):
+                labels = _format_labels(self.labels, key)
+                cumulative = np.cumsum(series.buckets)
+                bounds = [repr(float(bound)) for bound in self.bounds] + ['+Inf']
+                for bound, count in zip(bounds, cumulative):
+                    bucket_labels = _format_labels(self.labels + ('le',), key + (bound,))
+                    lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+                lines.append(f"{self.name}_sum{labels} {series.sum}")
+                lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with _lock:
+            return dict(self._values)
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+RERUN_SECONDS = Histogram(
+    'beacon_rerun_seconds', "Wall time of one full script run.", labels=('role',)
+)
+SECTION_SECONDS = Histogram(
+    'beacon_section_render_seconds', "Wall time spent rendering one dashboard section.",
+    labels=('section',)
+)
+CACHE_REQUESTS = Counter(
+    'beacon_cache_requests_total', "Lookups against a process-wide cache.", labels=('cache',)
+)
+CACHE_MISSES = Counter(
+    'beacon_cache_misses_total', "Cache lookups that had to compute their value.",
+    labels=('cache',)
+)
+
+NOTIFICATIONS = Counter(
+    'beacon_notifications_total', "Message notifications by priority and outcome.",
+    labels=('priority', 'outcome')
+)
+
+LIVE_UPDATES = Counter(
+    'beacon_live_updates_total', "Fragment reruns pushed to sessions by writes, by channel.",
+    labels=('topic',)
+)
+
+HISTOGRAMS = [RERUN_SECONDS, SECTION_SECONDS]
+COUNTERS = [CACHE_REQUESTS, CACHE_MISSES, NOTIFICATIONS, LIVE_UPDATES]
+
+_sessions = {}
+
+
+@contextlib.contextmanager
+def timer(histogram, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def summarize(histogram):
+    """Per-series sample count and p50/p95/max (ms) over the recent window."""
+    rows = []
+    for key, recent in sorted(histogram.series().items()):
+        if not len(recent):
+            continue
+        p50, p95 = np.quantile(recent, (0.5, 0.95))
+        rows.append(dict(
+            zip(histogram.labels, key),
+            samples=len(recent),
+            p50_ms=round(p50 * 1000, 1),
+            p95_ms=round(p95 * 1000, 1),
+            max_ms=round(recent.max() * 1000, 1),
+        ))
+    return rows
+
+
+def overall_percentiles(histogram, *quantiles):
+    """Percentiles across every series of ``histogram``, ``None`` if empty."""
+    recent = [values for values in histogram.series().values() if len(values)]
+    if not recent:
+        return [None] * len(quantiles)
+    return list(np.quantile(np.concatenate(recent), quantiles))
+
+
+def track_session():
+    """Mark the session running the current script as active."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    now = time.monotonic()
+    with _lock:
+        _sessions[ctx.session_id] = now
+        # Forget sessions idle past the window so the table stays bounded
+        for session_id, seen in list(_sessions.items()):
+            if now - seen > SESSION_IDLE_SECONDS:
+                del _sessions[session_id]
+
+
+def active_sessions():
+    cutoff = time.monotonic() - SESSION_IDLE_SECONDS
+    with _lock:
+        return sum(1 for seen in _sessions.values() if seen >= cutoff)
+
+
+def cache_hit_rates():
+    """{cache name: (requests, hit rate)} for every cache looked up so far."""
+    requests = CACHE_REQUESTS.values()
+    misses = CACHE_MISSES.values()
+    return {
+        key[0]: (count, 1 - min(misses.get(key, 0), count) / count)
+        for key, count in requests.items()
+        if count
+    }
+
+
+def resident_memory_bytes():
+    """Current RSS of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_per_session_bytes():
+    return resident_memory_bytes() / max(1, active_sessions())
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.exposition()
+    for counter in COUNTERS:
+        lines += counter.exposition()
+    for name, help, value in (
+        ('beacon_active_sessions', "Sessions seen in the idle window.", active_sessions()),
+        ('beacon_resident_memory_bytes', "Resident memory of the process.", resident_memory_bytes()),
+        ('beacon_uptime_seconds', "Seconds since the process started.", time.time() - STARTED_AT),
+    ):
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port):
+    """Expose ``prometheus_text`` on ``port`` from a daemon thread."""
+    server = http.server.ThreadingHTTPServer(('', port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name='beacon-metrics').start()
+    return server
@@ -0,0 +1,185 @@
+"""Background delivery of message notifications.
+
+Sending a message stores it, then hands a ``Notification`` to the
+process-wide ``Dispatcher`` and returns at once. Worker threads deliver
+notifications in batches through a transport:
+
+* ``Urgent`` notifications have their own lane, which is always drained
+  first and sent without waiting for a batch to fill.
+* ``Normal`` notifications wait up to ``batch_wait`` seconds so they can
+  share a batch.
+* A failed batch is retried with exponential backoff. After
+  ``max_attempts`` tries a notification is parked in ``dead_letters``.
+
+``close`` delivers everything still queued before the workers stop.
+
+The default ``StubTransport`` delivers into memory, and can be told to fail
+a share of batches to exercise the retry path.
+"""
+import collections
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+from beacon import metrics
+
+PRIORITIES = ('Urgent', 'Normal')
+
+Notification = namedtuple(
+    'Notification', ['message_id', 'recipient', 'sender', 'app', 'priority', 'attempts']
+)
+
+# Delivered and dead-lettered notifications remembered for inspection
+HISTORY_SIZE = 1000
+
+
+class TransportError(Exception):
+    pass
+
+
+class StubTransport:
+    """Local transport that records deliveries instead of sending them."""
+
+    def __init__(self, fail_rate=0.0, latency=0.0, seed=None):
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.delivered = collections.deque(maxlen=HISTORY_SIZE)
+        self.batches = 0
+        self._random = random.Random(seed)
+
+    def send(self, batch):
+        if self.latency:
+            time.sleep(self.latency)
+        if self._random.random() < self.fail_rate:
+            raise TransportError("stub transport dropped the batch")
+        self.batches += 1
+        self.delivered.extend(batch)
+
+
+TRANSPORTS = {'stub': StubTransport}
+
+
+def open_transport(name=None):
+    name = name or os.environ.get('BEACON_NOTIFY_TRANSPORT', 'stub')
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unsupported notification transport: {name!r}")
+    return TRANSPORTS[name]()
+
+
+class Dispatcher:
+    def __init__(self, transport, workers=2, batch_size=50, batch_wait=0.5,
+                 max_attempts=5, backoff=0.5):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.dead_letters = collections.deque(maxlen=HISTORY_SIZE)
+
+        self._lanes = {priority: collections.deque() for priority in PRIORITIES}
+        # Retries wait here as (due time, sequence, notification) until due
+        self._retries = []
+        self._sequence = itertools.count()
+        self._ready = threading.Condition()
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._run, daemon=True, name=f'beacon-notify-{i}')
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, message_id, recipient, sender, app, priority='Normal'):
+        """Queue a notification; never blocks on delivery."""
+        priority = priority if priority in self._lanes else 'Normal'
+        notification = Notification(message_id, recipient, sender, app, priority, 0)
+        with self._ready:
+            if self._stopping:
+                raise RuntimeError("Dispatcher is closed")
+            # Entries remember when they were queued, for the batching window
+            self._lanes[priority].append((time.monotonic(), notification))
+            self._ready.notify()
+        metrics.NOTIFICATIONS.inc(priority=priority, outcome='queued')
+        return notification
+
+    def _promote_due_retries(self, now):
+        # Closing sends every retry at once instead of waiting out its backoff
+        while self._retries and (self._retries[0][0] <= now or self._stopping):
+            _, _, notification = heapq.heappop(self._retries)
+            self._lanes[notification.priority].appendleft((now, notification))
+
+    def _take(self, lane):
+        return [lane.popleft()[1] for _ in range(min(self.batch_size, len(lane)))]
+
+    def _next_batch(self):
+        """Block until a batch is due; ``None`` once stopping with nothing left."""
+        with self._ready:
+            while True:
+                now = time.monotonic()
+                self._promote_due_retries(now)
+                urgent, normal = self._lanes['Urgent'], self._lanes['Normal']
+                if urgent:
+                    return self._take(urgent)
+                if normal:
+                    window_ends = normal[0][0] + self.batch_wait
+                    if len(normal) >= self.batch_size or now >= window_ends or self._stopping:
+                        return self._take(normal)
+                    timeout = window_ends - now
+                elif self._stopping:
+                    return None
+                else:
+                    timeout = None
+                if self._retries:
+                    retry_in = self._retries[0][0] - now
+                    timeout = retry_in if timeout is None else min(timeout, retry_in)
+                self._ready.wait(timeout)
+
+    def _deliver(self, batch):
+        try:
+            self.transport.send(batch)
+        except Exception:
+            now = time.monotonic()
+            with self._ready:
+                for notification in batch:
+                    attempts = notification.attempts + 1
+                    if attempts >= self.max_attempts or self._stopping:
+                        self.dead_letters.append(notification._replace(attempts=attempts))
+                        metrics.NOTIFICATIONS.inc(priority=notification.priority, outcome='failed')
+                        continue
+                    due = now + self.backoff * 2 ** (attempts - 1)
+                    heapq.heappush(self._retries, (
+                        due, next(self._sequence), notification._replace(attempts=attempts)
+                    ))
+                    metrics.NOTIFICATIONS.inc(priority=notification.priority, outcome='retried')
+                self._ready.notify()
+            return
+        for priority in PRIORITIES:
+            sent = sum(1 for notification in batch if notification.priority == priority)
+            if sent:
+                metrics.NOTIFICATIONS.inc(sent, priority=priority, outcome='delivered')
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._deliver(batch)
+
+    def close(self, timeout=5.0):
+        """Deliver what is queued, retries included, then stop the workers.
+
+        Nothing waits for a batch window or a backoff any more, and a send that
+        fails while closing dead-letters its batch. Returns whether the workers
+        finished within ``timeout`` seconds.
+        """
+        with self._ready:
+            self._stopping = True
+            self._ready.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in self._threads)
@@ -0,0 +1,23 @@
+"""Paging over catalog frames so a rerun only renders one page of cards."""
+import math
+import os
+from collections import namedtuple
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('BEACON_PAGE_SIZE', 10))
+PAGE_SIZES = sorted({5, 10, 25, 50, DEFAULT_PAGE_SIZE})
+
+Page = namedtuple('Page', ['rows', 'number', 'pages', 'total', 'start'])
+
+
+def select_page(frame, order, number, page_size):
+    """Return page ``number`` (1-based) of ``frame`` in ``order``.
+
+    ``order`` holds the row positions to list, already sorted (see
+    ``CatalogIndex.sort_order``). Only the rows on the requested page are
+    materialised; out-of-range page numbers are clamped to the last page.
+    """
+    total = len(order)
+    pages = max(1, math.ceil(total / page_size))
+    number = min(max(1, number), pages)
+    start = (number - 1) * page_size
+    return Page(frame.iloc[order[start:start + page_size]], number, pages, total, start)
@@ -0,0 +1,140 @@
+"""Opt-in render timings and single-rerun profiles.
+
+Fine-grained timings around dashboard sections and the DataFrame work inside
+them are off by default. Turn them on for every session with
+``BEACON_TIMINGS=1``, or for one session with the ``?timings=1`` query
+parameter. While off, ``section`` hands back a shared no-op context manager
+and ``timed`` adds one attribute lookup per call.
+
+``?profile=cprofile`` (or ``?profile=pyinstrument`` when pyinstrument is
+installed) profiles the next full rerun and offers the result as a download.
+
+Any visitor can add a query parameter, so both are ignored unless the deploy
+opts in with ``BEACON_PROFILING=1`` in the server's environment, e.g.::
+
+    BEACON_PROFILING=1 streamlit run streamlit_app.py
+
+Leave it unset in production; the dev container sets it.
+"""
+import contextlib
+import cProfile
+import functools
+import marshal
+import os
+import threading
+import time
+from collections import namedtuple
+
+import streamlit as st
+
+from beacon import metrics
+
+ALWAYS_ON = os.environ.get('BEACON_TIMINGS') == '1'
+QUERY_PARAMS_ALLOWED = os.environ.get('BEACON_PROFILING', '0') == '1'
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+Capture = namedtuple('Capture', ['data', 'file_name', 'mime'])
+
+_local = threading.local()
+_NO_OP = contextlib.nullcontext()
+# cProfile cannot profile two threads' reruns at once, so captures take turns
+_capture_lock = threading.Lock()
+
+
+def begin_rerun():
+    """Decide whether this rerun records timings and reset its trace."""
+    requested = QUERY_PARAMS_ALLOWED and st.query_params.get('timings') == '1'
+    _local.enabled = ALWAYS_ON or requested
+    _local.trace = []
+    return _local.enabled
+
+
+def enabled():
+    return getattr(_local, 'enabled', False)
+
+
+def trace():
+    """(section, seconds) pairs recorded so far in this rerun."""
+    return list(getattr(_local, 'trace', ()))
+
+
+@contextlib.contextmanager
+def _timed_section(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.SECTION_SECONDS.observe(elapsed, section=name)
+        _local.trace.append((name, elapsed))
+
+
+def section(name):
+    """Time the enclosed block as ``name`` when timings are on."""
+    if not getattr(_local, 'enabled', False):
+        return _NO_OP
+    return _timed_section(name)
+
+
+def timed(name):
+    """Decorator form of ``section``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not getattr(_local, 'enabled', False):
+                return func(*args, **kwargs)
+            with _timed_section(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def requested_profiler():
+    if not QUERY_PARAMS_ALLOWED:
+        return None
+    profiler = st.query_params.get('profile')
+    return profiler if profiler in PROFILERS else None
+
+
+@contextlib.contextmanager
+def capture(profiler):
+    """Profile the enclosed block; yields a list that receives one ``Capture``.
+
+    Nothing is captured when ``profiler`` is ``None`` or another rerun is
+    already being profiled.
+    """
+    captured = []
+    if profiler is None or not _capture_lock.acquire(blocking=False):
+        yield captured
+        return
+    try:
+        if profiler == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                profiler = 'cprofile'
+        if profiler == 'pyinstrument':
+            sampler = Profiler()
+            sampler.start()
+            try:
+                yield captured
+            finally:
+                sampler.stop()
+                captured.append(Capture(
+                    sampler.output_html().encode(), 'beacon-rerun.html', 'text/html'
+                ))
+        else:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield captured
+            finally:
+                profile.disable()
+                profile.create_stats()
+                # Same bytes pstats.Stats.dump_stats writes, loadable by pstats/snakeviz
+                captured.append(Capture(
+                    marshal.dumps(profile.stats), 'beacon-rerun.prof', 'application/octet-stream'
+                ))
+    finally:
+        _capture_lock.release()
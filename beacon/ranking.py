@@ -0,0 +1,211 @@
+"""Weighted ranking and patient recommendations over the app catalog.
+
+Built once per catalog version. Each app's four scores, its user count and
+its success rate are normalised to 0-1 into one float32 matrix, so ranking
+the whole catalog under any weights is a single matrix-vector product. Worker
+processes can map the matrix from a catalog snapshot (see ``beacon.snapshots``).
+
+A recommendation adds a patient's affinity for each app's category. The
+affinity comes from the categories that treat their conditions and the
+categories of apps they were prescribed, weighted by adherence. Apps the
+patient is already on are left out. The top ``TOP_K`` apps per (patient,
+weights) are cached; the cache goes with the catalog version, and an entry
+is recomputed if the patient's conditions or prescriptions changed. Pages
+past the top ``TOP_K`` are served from a full sort of the catalog's scores.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from beacon.reviews import CLOSED_STATUSES
+from beacon.schema import MAX_SCORE, SCORE_COLUMNS
+
+# Ranked components, in matrix column order, with their labels and default weights
+WEIGHTS = {
+    'clinical': 'Clinical', 'ux': 'UX', 'security': 'Security', 'integration': 'Integration',
+    'popularity': 'Popularity', 'success': 'Success rate',
+}
+DEFAULT_WEIGHTS = {
+    'clinical': 4, 'ux': 2, 'security': 2, 'integration': 1, 'popularity': 1, 'success': 3,
+}
+
+# Catalog categories that treat each patient condition
+CONDITION_CATEGORIES = {
+    'Type 2 Diabetes': ('Chronic Disease', 'Nutrition'),
+    'Anxiety': ('Mental Health', 'Sleep'),
+    'Depression': ('Mental Health',),
+    'Hypertension': ('Cardiology', 'Chronic Disease', 'Nutrition'),
+    'Insomnia': ('Sleep', 'Mental Health'),
+    'Asthma': ('Respiratory',),
+    'COPD': ('Respiratory',),
+    'Chronic Pain': ('Pain Management', 'Physical Therapy'),
+    'Obesity': ('Nutrition', 'Chronic Disease'),
+    'Heart Failure': ('Cardiology',),
+}
+
+# Score added for a category of full affinity; a weighted score is at most 1
+AFFINITY_WEIGHT = 0.5
+
+# Share of a category's affinity that comes from the patient's conditions
+CONDITION_SHARE = 0.6
+
+# Ranked apps kept per cached (patient, weights) entry, and entries kept
+TOP_K = 1000
+MAX_CACHED_RANKINGS = 1024
+
+# ``history`` holds an ``(app_name, adherence_rate, status)`` tuple per prescription
+Profile = namedtuple('Profile', ['patient', 'conditions', 'history'])
+
+
+def normalize(weights):
+    """Weights as a tuple summing to 1, in ``WEIGHTS`` order; all zero means default."""
+    values = np.array([max(0.0, float(weights.get(name, 0))) for name in WEIGHTS])
+    if not values.sum():
+        values = np.array([DEFAULT_WEIGHTS[name] for name in WEIGHTS], dtype=float)
+    return tuple(np.round(values / values.sum(), 4).tolist())
+
+
+def build_arrays(apps):
+    """The ranked components as ``{'matrix': array}``, which ``Ranker`` reads back as-is."""
+    columns = [apps[column].to_numpy(np.float32) / MAX_SCORE for column in SCORE_COLUMNS]
+    users = np.log1p(apps['active_users'].to_numpy(np.float32))
+    columns.append(users / max(float(users.max(initial=0)), 1.0))
+    columns.append(apps['success_rate'].to_numpy(np.float32) / 100)
+    return {'matrix': np.ascontiguousarray(np.column_stack(columns), dtype=np.float32)}
+
+
+# Names of the arrays ``build_arrays`` returns
+ARRAYS = ('matrix',)
+
+
+class Ranker:
+    def __init__(self, apps, max_cached=MAX_CACHED_RANKINGS, arrays=None):
+        """Rank ``apps``; ``arrays`` from ``build_arrays`` (e.g. mapped) skips the build."""
+        self._matrix = (arrays or build_arrays(apps))['matrix']
+        category = apps['category'].astype('category')
+        self._categories = pd.Index(category.cat.categories)
+        self._category_codes = category.cat.codes.to_numpy()
+        self._names = pd.Index(apps['name'])
+        self.max_cached = max_cached
+        self._top = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._matrix)
+
+    def scores(self, weights):
+        """Weighted score of every app, in catalog row order."""
+        return self._matrix @ np.asarray(weights, dtype=np.float32)
+
+    def _affinity(self, profile):
+        """Per-category affinity in 0-1 from conditions and prescription history."""
+        affinity = np.zeros(len(self._categories), dtype=np.float32)
+        treats = [
+            category for condition in profile.conditions
+            for category in CONDITION_CATEGORIES.get(condition, ())
+        ]
+        codes = self._categories.get_indexer(treats)
+        affinity[codes[codes >= 0]] = CONDITION_SHARE
+        history = np.zeros_like(affinity)
+        if profile.history:
+            names, adherence, _ = zip(*profile.history)
+            positions = self._names.get_indexer(names)
+            found = positions >= 0
+            adherence = np.array([rate or 0 for rate in adherence], dtype=np.float32) / 100
+            np.add.at(history, self._category_codes[positions[found]], adherence[found])
+        if history.any():
+            affinity += (1 - CONDITION_SHARE) * history / history.max()
+        return affinity
+
+    def recommendation_scores(self, weights, profile):
+        """Weighted scores plus category affinity; apps the patient is on score -inf."""
+        scores = self.scores(weights)
+        scores += AFFINITY_WEIGHT * self._affinity(profile)[self._category_codes]
+        scores[self._current(profile)] = -np.inf
+        return scores
+
+    def _current(self, profile):
+        """Catalog rows of the apps the patient is on."""
+        current = [
+            app_name for app_name, _, status in profile.history if status not in CLOSED_STATUSES
+        ]
+        positions = self._names.get_indexer(current)
+        return np.unique(positions[positions >= 0])
+
+    def rankable(self, profile=None):
+        """How many apps a ranking lists."""
+        return len(self) - (0 if profile is None else len(self._current(profile)))
+
+    def _scores(self, weights, profile):
+        if profile is None:
+            return self.scores(weights)
+        return self.recommendation_scores(weights, profile)
+
+    def top(self, weights, profile=None, k=TOP_K):
+        """Row positions of the ``k`` best apps, best first, cached per (patient, weights)."""
+        key = (None if profile is None else profile.patient, weights, k)
+        signature = None if profile is None else (profile.conditions, profile.history)
+        with self._lock:
+            cached = self._top.get(key)
+            if cached is not None and cached[0] == signature:
+                self._top.move_to_end(key)
+                return cached[1]
+        scores = self._scores(weights, profile)
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if len(candidates) > k:
+            # Ties at the cut keep their lowest rows, as the full sort would
+            kth = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+            better = candidates[scores[candidates] > kth]
+            tied = candidates[scores[candidates] == kth]
+            candidates = np.concatenate([better, tied[:k - len(better)]])
+        top = self._sorted(candidates, scores)
+        with self._lock:
+            self._top[key] = (signature, top)
+            while len(self._top) > self.max_cached:
+                self._top.popitem(last=False)
+        return top
+
+    @staticmethod
+    def _sorted(candidates, scores):
+        # Best score first, ties by catalog row
+        return candidates[np.lexsort((candidates, -scores[candidates]))].astype(np.int32)
+
+    def ranked(self, weights, profile=None):
+        """Every rankable app, best first, as a full sort of the scores."""
+        scores = self._scores(weights, profile)
+        return self._sorted(np.flatnonzero(np.isfinite(scores)), scores)
+
+    def order(self, weights, positions=None, profile=None):
+        """Rank ``positions`` (the whole catalog when None), best first."""
+        if positions is None:
+            return Ranking(self, weights, profile)
+        scores = self._scores(weights, profile)[positions]
+        keep = np.isfinite(scores)
+        return positions[keep][np.argsort(-scores[keep], kind='stable')]
+
+
+class Ranking:
+    """The whole catalog in rank order, for ``paging.select_page``.
+
+    Slices within the cached top ``TOP_K`` come from ``Ranker.top``; only a
+    page past it pays for a full sort of the catalog's scores.
+    """
+
+    def __init__(self, ranker, weights, profile=None):
+        self.ranker, self.weights, self.profile = ranker, weights, profile
+        self._top = ranker.top(weights, profile)
+        # A top shorter than TOP_K already holds every rankable app
+        self._all = self._top if len(self._top) < TOP_K else None
+        self._total = len(self._top) if self._all is not None else ranker.rankable(profile)
+
+    def __len__(self):
+        return self._total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and index.stop is not None and index.stop <= len(self._top):
+            return self._top[index]
+        if self._all is None:
+            self._all = self.ranker.ranked(self.weights, self.profile)
+        return self._all[index]
@@ -0,0 +1,237 @@
+"""Storage backends for apps, prescriptions and messages.
+
+Dashboards talk to a ``Repository`` rather than to session-state DataFrames, so
+the data survives reruns and restarts and each view can ask for just the rows
+it renders. Backends are picked by URL scheme from ``BEACON_DATABASE_URL``.
+"""
+import importlib
+import os
+from pathlib import Path
+from urllib.parse import urlparse
+
+DEFAULT_DATABASE_URL = f"sqlite:///{Path(__file__).resolve().parent.parent / 'beacon.db'}"
+
+# URL scheme -> "module:class" of the backend implementing it
+BACKENDS = {
+    'sqlite': 'beacon.sqlite_repo:SQLiteRepository',
+}
+
+APP_COLUMNS = [
+    'id', 'name', 'category', 'description', 'features', 'clinical_score',
+    'ux_score', 'security_score', 'integration_score', 'fda_status',
+    'testimonial', 'active_users', 'success_rate',
+]
+PRESCRIPTION_COLUMNS = [
+    'id', 'app_name', 'prescribed_by', 'prescribed_to', 'status',
+    'prescribed_date', 'next_review', 'adherence_rate', 'progress_notes',
+]
+MESSAGE_COLUMNS = ['id', 'recipient', 'sender', 'content', 'app', 'date', 'read']
+PATIENT_COLUMNS = ['id', 'mrn', 'name', 'age', 'condition', 'status', 'adherence', 'provider']
+
+# Values of the patient ``status`` column
+PATIENT_STATUSES = ['Active', 'Pending Review', 'New']
+
+
+def date_key(value):
+    """A datetime as the repository's ISO text, which sorts chronologically."""
+    if isinstance(value, str):
+        return value
+    return value.isoformat(sep=' ', timespec='seconds')
+
+
+class Repository:
+    """Interface every storage backend implements.
+
+    Read methods return DataFrames with the columns above; ``limit``/``offset``
+    page through results so callers never materialise a whole table.
+    """
+
+    def is_empty(self):
+        raise NotImplementedError
+
+    def list_apps(self):
+        raise NotImplementedError
+
+    def prescriptions_for_patient(self, patient, limit=None, offset=0):
+        raise NotImplementedError
+
+    def prescriptions_for_provider(self, provider, limit=None, offset=0):
+        raise NotImplementedError
+
+    def reviews_due(self, before, limit=None):
+        raise NotImplementedError
+
+    def open_reviews(self, closed=('Completed',)):
+        """Yield ``(id, app_name, prescribed_by, prescribed_to, next_review)``
+        for prescriptions not in a ``closed`` status, ordered by ``next_review``."""
+        raise NotImplementedError
+
+    def open_review(self, prescription_id, closed=('Completed',)):
+        """The ``open_reviews`` row of one prescription, or None if it has none."""
+        raise NotImplementedError
+
+    def set_next_review(self, prescription_id, next_review):
+        raise NotImplementedError
+
+    def inbox_entries(self, recipient):
+        """Yield ``(id, sender, app, date, read)`` for every message to
+        ``recipient``, ordered by ``date``."""
+        raise NotImplementedError
+
+    def message_entry(self, message_id):
+        """``(id, recipient, sender, app, date, read)`` of one message, or None."""
+        raise NotImplementedError
+
+    def messages_by_id(self, message_ids):
+        """The messages with ``message_ids``, newest first."""
+        raise NotImplementedError
+
+    def patient_conditions(self, provider):
+        """``{condition: number of patients}`` over ``provider``'s patients."""
+        raise NotImplementedError
+
+    def conditions_of(self, patient):
+        """Distinct conditions recorded for patients named ``patient``."""
+        raise NotImplementedError
+
+    def providers_of(self, patients):
+        """The providers whose patient lists hold any of ``patients``."""
+        raise NotImplementedError
+
+    def cohort(self, provider, condition):
+        """Names of ``provider``'s patients with ``condition``, by name."""
+        raise NotImplementedError
+
+    def patients_on_app(self, app_name, patients, closed=('Completed',)):
+        """The subset of ``patients`` with a prescription of ``app_name`` not in
+        a ``closed`` status."""
+        raise NotImplementedError
+
+    def search_patients(self, provider, query='', status=None, limit=None, offset=0):
+        """Page of ``provider``'s patients matching ``query`` and ``status``.
+
+        ``query`` matches patient names and MRNs by prefix, or anywhere in
+        them once it is at least three characters long. Returns the page as a
+        DataFrame together with the total number of matches.
+        """
+        raise NotImplementedError
+
+    def refresh_rollups(self):
+        """Fold prescriptions added since the last refresh into the app usage rollup."""
+        raise NotImplementedError
+
+    def engagement(self, provider, granularity, since):
+        """Pre-aggregated (period, days, taken) check-ins of ``provider``'s patients from ``since`` on.
+
+        ``granularity`` is ``'day'`` or ``'week'``; a period counts the check-ins
+        made in it, whenever their prescriptions were written.
+        """
+        raise NotImplementedError
+
+    def app_usage(self, provider, limit=10):
+        """``provider``'s most prescribed apps with active and total counts."""
+        raise NotImplementedError
+
+    def record_checkins(self, rows, batch_size=50_000):
+        """Append ``(prescription_id, day, taken)`` check-ins; returns how many were new.
+
+        A prescription has at most one check-in per day; later ones for a day
+        already recorded are ignored. Each prescription's ``adherence_rate``
+        (and its patient's ``adherence``) is re-derived from the check-ins, and
+        the check-ins are folded into the prescriber's practice rollups.
+        """
+        raise NotImplementedError
+
+    def adherence_history(self, prescription_id, granularity, since):
+        """(period, days, taken) rows of a prescription's check-ins from ``since`` on.
+
+        ``granularity`` is ``'day'``, ``'week'`` or ``'month'``.
+        """
+        raise NotImplementedError
+
+    def patient_summary(self, patient, month):
+        """Dict of the patient dashboard's header figures for the month starting ``month``.
+
+        Keys: ``active`` and ``new_this_month`` prescriptions, mean ``adherence``
+        of the active ones, check-in adherence for ``this_month`` and
+        ``last_month`` (None without check-ins).
+        """
+        raise NotImplementedError
+
+    def provider_summary(self, provider, month):
+        """Dict of the provider dashboard's header figures for the month starting ``month``.
+
+        Keys: ``active_patients``, ``new_patients`` this month,
+        ``active_prescriptions`` and their mean adherence as ``engagement``.
+        """
+        raise NotImplementedError
+
+    def publish_changes(self, origin, changes):
+        """Append ``(topic, key)`` entries to the shared change log.
+
+        The log lets every app process sharing this repository learn what the
+        others wrote. Returns the sequence number of the last entry.
+        """
+        raise NotImplementedError
+
+    def changes_since(self, seq, limit=10_000):
+        """``(seq, origin, topic, key)`` log entries after ``seq``, oldest first."""
+        raise NotImplementedError
+
+    def last_change(self, topic=None):
+        """Sequence number of the newest log entry (of ``topic``), or 0."""
+        raise NotImplementedError
+
+    def add_prescriptions(self, records):
+        """Insert prescriptions in one transaction; returns their new ids in order."""
+        raise NotImplementedError
+
+    def add_new_prescriptions(self, app_name, records, closed=('Completed',)):
+        """Insert the ``app_name`` prescriptions whose patient is not already on
+        it (see ``patients_on_app``), checking and inserting in one transaction.
+
+        Returns the new ids in order, with None for each record skipped.
+        """
+        raise NotImplementedError
+
+    def add_message(self, record):
+        raise NotImplementedError
+
+    def mark_messages_read(self, message_ids):
+        raise NotImplementedError
+
+    def bulk_load(self, table, rows, batch_size=50_000):
+        raise NotImplementedError
+
+    def upsert_apps(self, rows):
+        """Insert apps, or update the existing app with the same name.
+
+        ``rows`` are dicts with every app column but ``id``; new apps get the
+        next free id. Returns the number of rows written.
+        """
+        raise NotImplementedError
+
+    def iter_apps(self, chunk_size=10_000):
+        """Yield the catalog as DataFrames of at most ``chunk_size`` apps, by id."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def seed(self, apps, prescriptions, messages, patients=(), checkins=()):
+        self.bulk_load('apps', apps)
+        self.bulk_load('prescriptions', prescriptions)
+        self.bulk_load('messages', messages)
+        self.bulk_load('patients', patients)
+        self.record_checkins(checkins)
+
+
+def open_repository(url=None):
+    """Instantiate the backend registered for ``url``'s scheme."""
+    url = url or os.environ.get('BEACON_DATABASE_URL', DEFAULT_DATABASE_URL)
+    scheme = urlparse(url).scheme
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unsupported database URL scheme: {scheme!r}")
+    module_name, class_name = BACKENDS[scheme].split(':')
+    backend = getattr(importlib.import_module(module_name), class_name)
+    return backend.from_url(url)
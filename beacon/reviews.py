@@ -0,0 +1,132 @@
+"""In-memory schedule of upcoming prescription reviews.
+
+Every open prescription (any status but ``Completed``) is filed under both
+its provider and its patient, in a list kept sorted by ``(next_review, id)``.
+Review dates are stored as the repository's ISO text, so comparisons need no
+date parsing. "Next due", "due within N days" and "overdue" are bisections:
+O(log n) to find, plus the size of the answer when rows are returned.
+
+The schedule is loaded once per process from one index-ordered scan, then
+kept current by ``add`` (``add_many`` for a batch) and ``reschedule`` as
+prescriptions are written through ``store``, and by ``refresh`` for writes
+made by other processes.
+"""
+import bisect
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from beacon.repository import date_key
+
+# Statuses that no longer need reviewing
+CLOSED_STATUSES = ('Completed',)
+
+# Days a review is pushed out by when it is marked done
+REVIEW_INTERVAL_DAYS = 30
+
+Review = namedtuple('Review', ['prescription_id', 'app_name', 'provider', 'patient', 'due'])
+
+
+class ReviewSchedule:
+    def __init__(self, rows=()):
+        self._by = {'provider': {}, 'patient': {}}
+        self._reviews = {}
+        self._lock = threading.Lock()
+        # Rows arrive ordered by next_review, so plain appends keep lists sorted
+        for prescription_id, app_name, provider, patient, due in rows:
+            review = Review(prescription_id, app_name, provider, patient, date_key(due))
+            self._reviews[prescription_id] = review
+            self._by['provider'].setdefault(provider, []).append((review.due, prescription_id))
+            self._by['patient'].setdefault(patient, []).append((review.due, prescription_id))
+
+    @classmethod
+    def load(cls, repo):
+        return cls(repo.open_reviews(CLOSED_STATUSES))
+
+    def __len__(self):
+        return len(self._reviews)
+
+    def _file(self, review):
+        entry = (review.due, review.prescription_id)
+        bisect.insort(self._by['provider'].setdefault(review.provider, []), entry)
+        bisect.insort(self._by['patient'].setdefault(review.patient, []), entry)
+
+    def _unfile(self, review):
+        entry = (review.due, review.prescription_id)
+        for kind, owner in (('provider', review.provider), ('patient', review.patient)):
+            entries = self._by[kind][owner]
+            del entries[bisect.bisect_left(entries, entry)]
+
+    def add_many(self, records):
+        """File a batch of prescription records, re-sorting each touched list once."""
+        batch = {}
+        for record in records:
+            if record.get('status') in CLOSED_STATUSES or record.get('next_review') is None:
+                continue
+            batch[record['id']] = Review(
+                record['id'], record['app_name'], record['prescribed_by'],
+                record['prescribed_to'], date_key(record['next_review'])
+            )
+        touched = {}
+        with self._lock:
+            for prescription_id in batch.keys() & self._reviews.keys():
+                self._unfile(self._reviews[prescription_id])
+            for review in batch.values():
+                self._reviews[review.prescription_id] = review
+                for kind, owner in (('provider', review.provider), ('patient', review.patient)):
+                    entries = self._by[kind].setdefault(owner, [])
+                    entries.append((review.due, review.prescription_id))
+                    touched[id(entries)] = entries
+            # A sorted list plus a sorted appended run re-sorts in linear time
+            for entries in touched.values():
+                entries.sort()
+
+    def reschedule(self, prescription_id, due):
+        with self._lock:
+            review = self._reviews.get(prescription_id)
+            if review is None:
+                return None
+            self._unfile(review)
+            review = self._reviews[prescription_id] = review._replace(due=date_key(due))
+            self._file(review)
+            return review
+
+    def refresh(self, prescription_id, row):
+        """Re-file a prescription from its current ``open_reviews`` row (None drops it)."""
+        with self._lock:
+            if prescription_id in self._reviews:
+                self._unfile(self._reviews.pop(prescription_id))
+            if row is not None:
+                review = Review(*row[:4], date_key(row[4]))
+                self._reviews[prescription_id] = review
+                self._file(review)
+
+    def _between(self, kind, owner, start=None, stop=None, limit=None):
+        with self._lock:
+            entries = self._by[kind].get(owner, ())
+            lo = 0 if start is None else bisect.bisect_left(entries, (date_key(start),))
+            hi = len(entries) if stop is None else bisect.bisect_left(entries, (date_key(stop),))
+            count = max(0, hi - lo)
+            if limit == 0:
+                return count, []
+            hi = hi if limit is None else min(hi, lo + limit)
+            return count, [self._reviews[prescription_id] for _, prescription_id in entries[lo:hi]]
+
+    def next_due(self, kind, owner, now=None):
+        """First review at or after ``now`` for a ``'provider'`` or ``'patient'``."""
+        _, found = self._between(kind, owner, start=now or datetime.now(), limit=1)
+        return found[0] if found else None
+
+    def overdue(self, kind, owner, now=None, limit=None):
+        """``(count, earliest reviews)`` of reviews already past ``now``."""
+        return self._between(kind, owner, stop=now or datetime.now(), limit=limit)
+
+    def due_within(self, kind, owner, days, now=None, limit=None):
+        """``(count, reviews)`` due from ``now`` up to ``days`` days ahead."""
+        now = now or datetime.now()
+        return self._between(kind, owner, start=now, stop=now + timedelta(days=days), limit=limit)
+
+
+def days_until(review, now=None):
+    due = datetime.fromisoformat(review.due)
+    return (due.date() - (now or datetime.now()).date()).days
@@ -0,0 +1,157 @@
+"""Typed, columnar schema for the app catalog.
+
+``load_apps`` validates raw app records (from the repository or an import) and
+returns a frame with native dtypes: categorical ``category`` and
+``fda_status``, float32 scores, and integer ``active_users`` and
+``success_rate`` (a whole percentage). Features are not kept as Python lists
+per row. They live in a ``FeatureTable``: one categorical code per
+(app, feature) pair, ordered by app, with per-app offsets into it.
+"""
+import numpy as np
+import pandas as pd
+
+SCORE_COLUMNS = ['clinical_score', 'ux_score', 'security_score', 'integration_score']
+MAX_SCORE = 5.0
+
+# Free-text columns keep the string dtype pandas reads them with
+TEXT_COLUMNS = ['name', 'description', 'testimonial']
+
+APP_DTYPES = {
+    'id': 'int32',
+    'category': 'category',
+    **{column: 'float32' for column in SCORE_COLUMNS},
+    'fda_status': 'category',
+    'active_users': 'int32',
+    'success_rate': 'int8',
+}
+
+APP_COLUMNS = [
+    'id', 'name', 'category', 'description', *SCORE_COLUMNS,
+    'fda_status', 'testimonial', 'active_users', 'success_rate',
+]
+
+
+class FeatureTable:
+    """Exploded app features: categorical codes grouped by catalog row."""
+
+    def __init__(self, vocabulary, codes, offsets):
+        self.vocabulary = vocabulary
+        self.codes = codes
+        self.offsets = offsets
+
+    @classmethod
+    def from_lists(cls, features):
+        lengths = np.fromiter((len(values) for values in features), dtype=np.int64,
+                              count=len(features))
+        offsets = np.zeros(len(features) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        exploded = pd.Categorical([value for values in features for value in values])
+        codes = exploded.codes.astype(np.int16 if len(exploded.categories) < 2 ** 15 else np.int32)
+        return cls(exploded.categories, codes, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def of(self, row):
+        """Feature names of the app at catalog row ``row``."""
+        return list(self.vocabulary[self.codes[self.offsets[row]:self.offsets[row + 1]]])
+
+    def rows(self):
+        """Catalog row of every (app, feature) pair, aligned with ``codes``."""
+        return np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.offsets))
+
+
+def _parse_success_rate(values):
+    if not pd.api.types.is_numeric_dtype(values):
+        values = values.astype(str).str.strip().str.rstrip('%')
+    return pd.to_numeric(values, errors='coerce')
+
+
+def coerce(apps):
+    """Convert the numeric columns in place; unparseable values become NaN."""
+    for column in SCORE_COLUMNS:
+        apps[column] = pd.to_numeric(apps[column], errors='coerce')
+    apps['success_rate'] = _parse_success_rate(apps['success_rate']).round()
+    apps['active_users'] = pd.to_numeric(apps['active_users'], errors='coerce').fillna(0)
+    return apps
+
+
+def problems(apps):
+    """``(message, bad rows mask)`` for every rule some coerced row breaks."""
+    checks = [
+        ("Apps without a name",
+         apps['name'].isna() | (apps['name'].astype(str).str.strip().str.len() == 0)),
+        ("Apps without a category", apps['category'].isna()),
+        ("Apps without an FDA status", apps['fda_status'].isna()),
+    ]
+    checks += [
+        (f"Apps with {column} outside 0-{MAX_SCORE:g}", ~apps[column].between(0, MAX_SCORE))
+        for column in SCORE_COLUMNS
+    ]
+    checks += [
+        ("Apps with success_rate outside 0-100%", ~apps['success_rate'].between(0, 100)),
+        ("Apps with negative active_users", apps['active_users'] < 0),
+    ]
+    return [(message, bad) for message, bad in checks if bad.any()]
+
+
+def _raise_for(message, bad, apps):
+    names = list(apps.loc[bad, 'name'].astype(str)[:5])
+    raise ValueError(f"{message}: {', '.join(names)}{' ...' if bad.sum() > 5 else ''}")
+
+
+def _features(values):
+    return list(values) if isinstance(values, (list, tuple, np.ndarray)) else []
+
+
+def load_apps(records):
+    """Validate app records and return ``(apps, features)``.
+
+    ``records`` is a DataFrame or an iterable of dicts with the repository's
+    app columns; ``features`` may be lists or JSON already decoded, and
+    ``success_rate`` either a number or a string like ``'87%'``. Raises
+    ``ValueError`` naming the offending apps when a record is invalid.
+    """
+    apps = records.copy() if isinstance(records, pd.DataFrame) else pd.DataFrame(list(records))
+    missing = [column for column in APP_COLUMNS + ['features'] if column not in apps]
+    if missing:
+        raise ValueError(f"App records are missing columns: {', '.join(missing)}")
+
+    coerce(apps)
+    checks = problems(apps) + [
+        (message, bad) for message, bad in (
+            ("Duplicate app names", apps['name'].duplicated()),
+            ("Duplicate app ids", apps['id'].duplicated()),
+        ) if bad.any()
+    ]
+    if checks:
+        _raise_for(*checks[0], apps)
+
+    features = apps['features'].map(_features)
+    apps = apps[APP_COLUMNS].astype(APP_DTYPES).reset_index(drop=True)
+    return apps, FeatureTable.from_lists(features.tolist())
+
+
+def split_valid(apps):
+    """Coerce a chunk of incoming app rows and set the invalid ones aside.
+
+    Returns ``(valid, rejected)``; ``rejected`` keeps the incoming columns
+    plus an ``error`` column naming the first rule each row broke.
+    """
+    apps = coerce(apps)
+    checks = problems(apps)
+    if 'features' in apps and apps['features'].isna().any():
+        # Set by the importer for features text that is not valid JSON
+        checks.append(("Apps with malformed features JSON", apps['features'].isna()))
+    error = pd.Series(None, index=apps.index, dtype=object)
+    for message, bad in checks:
+        error = error.mask(bad & error.isna(), message)
+    rejected = error.notna()
+    valid = apps.loc[~rejected].copy()
+    valid['success_rate'] = valid['success_rate'].astype('int64')
+    valid['active_users'] = valid['active_users'].astype('int64')
+    return valid, apps.loc[rejected].assign(error=error[rejected])
+
+
+def format_success_rate(value):
+    return f"{int(value)}%"
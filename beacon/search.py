@@ -0,0 +1,162 @@
+"""Inverted index over the app catalog for Discover's filters and search box.
+
+Built once per catalog version. Every facet value and every token from an
+app's ``features`` and ``description`` maps to a sorted array of catalog row
+positions, so a filtered search is an intersection of a few posting lists
+rather than a scan of the catalog.
+
+The posting lists are held as a few flat arrays (see ``build_arrays``) rather
+than one array per token, so worker processes can map them from a catalog
+snapshot (see ``beacon.snapshots``) instead of each building its own.
+"""
+import re
+from collections import defaultdict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+FACETS = ('category', 'fda_status')
+
+SearchResult = namedtuple('SearchResult', ['positions', 'facet_counts'])
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def _grouped(codes, groups):
+    """Rows sorted by code and each code's start in them, with a final end."""
+    order = np.argsort(codes, kind='stable').astype(np.int32)
+    bounds = np.zeros(groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=groups), out=bounds[1:])
+    return order, bounds
+
+
+def build_arrays(apps, features):
+    """The index as ``{name: array}``, which ``SearchIndex`` reads back as-is.
+
+    Tokens are a sorted string array; ``offsets[i]:offsets[i + 1]`` slices
+    token ``i``'s positions out of ``positions``. Each facet keeps its sorted
+    values, a code per catalog row and the rows grouped by code.
+    """
+    arrays = {}
+    for facet in FACETS:
+        codes, values = pd.factorize(apps[facet], sort=True)
+        order, bounds = _grouped(codes, len(values))
+        arrays[f'{facet}_values'] = np.array(list(values), dtype=str)
+        arrays[f'{facet}_codes'] = codes
+        arrays[f'{facet}_rows'] = order
+        arrays[f'{facet}_bounds'] = bounds
+
+    # Free text: token -> positions of apps mentioning it
+    postings = defaultdict(list)
+    for position, description in enumerate(apps['description']):
+        for token in set(tokenize(description or '')):
+            postings[token].append(position)
+    found = {token: [np.array(rows, dtype=np.int32)] for token, rows in postings.items()}
+    # Features are tokenized once per distinct feature, not once per app
+    order, bounds = _grouped(features.codes, len(features.vocabulary))
+    rows = features.rows()[order]
+    for code, feature in enumerate(features.vocabulary):
+        for token in set(tokenize(feature)):
+            found.setdefault(token, []).append(rows[bounds[code]:bounds[code + 1]])
+    tokens = sorted(found)
+    lists = [
+        found[token][0] if len(found[token]) == 1 else np.unique(np.concatenate(found[token]))
+        for token in tokens
+    ]
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(rows) for rows in lists], out=offsets[1:])
+    arrays['tokens'] = np.array(tokens, dtype=str)
+    arrays['offsets'] = offsets
+    arrays['positions'] = (
+        np.concatenate(lists).astype(np.int32) if lists else np.zeros(0, dtype=np.int32)
+    )
+    return arrays
+
+
+# Names of the arrays ``build_arrays`` returns
+ARRAYS = tuple(
+    f'{facet}_{part}' for facet in FACETS for part in ('values', 'codes', 'rows', 'bounds')
+) + ('tokens', 'offsets', 'positions')
+
+
+class SearchIndex:
+    def __init__(self, apps, features, arrays=None):
+        """Index ``apps``; ``arrays`` from ``build_arrays`` (e.g. mapped) skips the build."""
+        if arrays is None:
+            arrays = build_arrays(apps, features)
+        self.size = len(apps)
+        self._all = np.arange(self.size, dtype=np.int32)
+
+        # Facets: value -> positions, plus per-row codes for counting
+        self._facet_values = {}
+        self._facet_codes = {}
+        self._facet_postings = {}
+        for facet in FACETS:
+            values = arrays[f'{facet}_values'].tolist()
+            rows, bounds = arrays[f'{facet}_rows'], arrays[f'{facet}_bounds']
+            self._facet_values[facet] = values
+            self._facet_codes[facet] = arrays[f'{facet}_codes']
+            self._facet_postings[facet] = {
+                value: rows[bounds[code]:bounds[code + 1]] for code, value in enumerate(values)
+            }
+
+        self._tokens = arrays['tokens']
+        self._offsets = arrays['offsets']
+        self._positions = arrays['positions']
+
+    def facet_options(self, facet):
+        """Sorted distinct values of ``facet`` across the whole catalog."""
+        return self._facet_values[facet]
+
+    def _token_positions(self, token, prefix):
+        start = int(np.searchsorted(self._tokens, token))
+        if not prefix:
+            if start == len(self._tokens) or self._tokens[start] != token:
+                return self._all[:0]
+            return self._positions[self._offsets[start]:self._offsets[start + 1]]
+        # The token still being typed matches every vocabulary word it starts
+        stop = int(np.searchsorted(self._tokens, token + '\uffff'))
+        return np.unique(self._positions[self._offsets[start]:self._offsets[stop]])
+
+    def _text_positions(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return self._all
+        positions = None
+        for i, token in enumerate(tokens):
+            found = self._token_positions(token, prefix=i == len(tokens) - 1)
+            positions = found if positions is None else np.intersect1d(
+                positions, found, assume_unique=True
+            )
+        return positions
+
+    def search(self, query='', **filters):
+        """Positions matching ``query`` and facet ``filters`` plus facet counts.
+
+        ``filters`` maps facet names to a selected value (``None`` for any).
+        Each facet's counts honour the query and the *other* facets' filters,
+        so the options show how many results picking them would give.
+        """
+        base = self._text_positions(query)
+        selected = {
+            facet: self._facet_postings[facet].get(value, self._all[:0])
+            for facet, value in filters.items()
+            if value is not None
+        }
+
+        def narrow(positions, skip=None):
+            for facet, postings in selected.items():
+                if facet != skip:
+                    positions = np.intersect1d(positions, postings, assume_unique=True)
+            return positions
+
+        facet_counts = {}
+        for facet in FACETS:
+            codes = self._facet_codes[facet][narrow(base, skip=facet)]
+            counts = np.bincount(codes, minlength=len(self._facet_values[facet]))
+            facet_counts[facet] = dict(zip(self._facet_values[facet], counts.tolist()))
+        return SearchResult(narrow(base), facet_counts)
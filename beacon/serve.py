@@ -0,0 +1,166 @@
+"""Serve the app from several worker processes behind a sticky-session proxy.
+
+A Streamlit process runs every session's script in one interpreter, so it
+uses one core however busy it is. Run
+
+    python -m beacon.serve --workers 4 --port 8501
+
+to start ``--workers`` ``streamlit run`` processes on the ports after
+``--port``, and a proxy on ``--port`` itself. A Streamlit session lives in
+the worker that created it (its websocket, uploads and media), so the proxy
+pins each browser to one worker with a cookie, dealing new browsers out
+round robin. Workers that exit are restarted.
+
+The workers share the repository named by ``BEACON_DATABASE_URL``, see each
+other's writes through its change log (see ``store.sync``), and map one copy
+of the catalog from ``BEACON_SNAPSHOT_DIR`` (see ``beacon.snapshots``).
+Arguments the proxy does not know, e.g. ``--server.maxUploadSize 500``, are
+passed on to every ``streamlit run``.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from beacon import snapshots, store
+
+APP = Path(__file__).resolve().parent.parent / 'streamlit_app.py'
+
+COOKIE = 'beacon_worker'
+_WORKER_COOKIE = re.compile(rb'(?im)^cookie:[^\r\n]*\b' + COOKIE.encode() + rb'=(\d+)')
+
+# Largest request or response head the proxy reads before it starts relaying
+MAX_HEAD_BYTES = 64 * 1024
+
+BAD_GATEWAY = b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'
+
+# Seconds between checks that every worker is still running
+SUPERVISE_INTERVAL = 1.0
+
+
+async def _relay(reader, writer):
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, OSError):
+        pass
+
+
+class StickyProxy:
+    def __init__(self, ports, host='127.0.0.1'):
+        self.ports = ports
+        self.host = host
+        self._next = itertools.cycle(range(len(ports)))
+
+    def _pick(self, head):
+        """``(worker, new)`` for a request head; ``new`` when the browser had no worker yet."""
+        match = _WORKER_COOKIE.search(head)
+        if match and int(match.group(1)) < len(self.ports):
+            return int(match.group(1)), False
+        # The page load that picks a worker closes at once, so new browsers
+        # are dealt round robin rather than by open connections
+        return next(self._next), True
+
+    async def handle(self, client_reader, client_writer):
+        try:
+            head = await client_reader.readuntil(b'\r\n\r\n')
+            worker, new = self._pick(head)
+            upstream_reader, upstream_writer = await asyncio.open_connection(
+                self.host, self.ports[worker], limit=MAX_HEAD_BYTES
+            )
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            client_writer.close()
+            return
+        except OSError:
+            # The worker is down or still (re)starting
+            client_writer.write(BAD_GATEWAY)
+            client_writer.close()
+            return
+        try:
+            upstream_writer.write(head)
+            if new:
+                response = await upstream_reader.readuntil(b'\r\n\r\n')
+                cookie = f'Set-Cookie: {COOKIE}={worker}; Path=/; HttpOnly; SameSite=Lax\r\n'
+                client_writer.write(response[:-2] + cookie.encode() + b'\r\n')
+            await asyncio.gather(
+                _relay(client_reader, upstream_writer), _relay(upstream_reader, client_writer)
+            )
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            upstream_writer.close()
+            client_writer.close()
+
+
+def _worker_command(port, streamlit_args):
+    return [
+        sys.executable, '-m', 'streamlit', 'run', str(APP),
+        '--server.port', str(port), '--server.address', '127.0.0.1',
+        '--server.headless', 'true', '--server.enableStaticServing', 'true', *streamlit_args,
+    ]
+
+
+async def _supervise(commands, workers, env):
+    while True:
+        await asyncio.sleep(SUPERVISE_INTERVAL)
+        for index, worker in enumerate(workers):
+            if worker.poll() is not None:
+                print(f"Worker {index} exited with {worker.returncode}; restarting", flush=True)
+                workers[index] = subprocess.Popen(commands[index], env=env)
+
+
+async def serve(address, port, commands, ports, workers, env):
+    proxy = StickyProxy(ports)
+    server = await asyncio.start_server(proxy.handle, address, port, limit=MAX_HEAD_BYTES)
+    print(f"Serving {len(workers)} workers on http://{address}:{port}", flush=True)
+    async with server:
+        await asyncio.gather(server.serve_forever(), _supervise(commands, workers, env))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--port', type=int, default=8501)
+    parser.add_argument('--address', default='0.0.0.0')
+    parser.add_argument('--snapshot-dir', help="catalog snapshot directory (default: a new temp dir)")
+    parser.add_argument('--no-snapshots', action='store_true',
+                        help="have every worker load its own copy of the catalog")
+    args, streamlit_args = parser.parse_known_args()
+
+    env = dict(os.environ)
+    env[store.WORKERS_ENV] = str(args.workers)
+    if args.no_snapshots:
+        env.pop(snapshots.SNAPSHOT_DIR_ENV, None)
+    else:
+        env[snapshots.SNAPSHOT_DIR_ENV] = args.snapshot_dir or env.get(
+            snapshots.SNAPSHOT_DIR_ENV
+        ) or tempfile.mkdtemp(prefix='beacon-snapshots-')
+    # Seed and catch up the repository here, so the workers do not race to
+    store.open_seeded_repository().close()
+
+    ports = [args.port + 1 + index for index in range(args.workers)]
+    commands = [_worker_command(port, streamlit_args) for port in ports]
+    workers = [subprocess.Popen(command, env=env) for command in commands]
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(serve(args.address, args.port, commands, ports, workers, env))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Memory-mapped catalog snapshots shared by worker processes.
+
+When several app processes serve one host (see ``beacon.serve``), each would
+otherwise build and hold its own copy of the catalog frame. Instead, the
+first process to need a catalog version writes it once as an uncompressed
+Arrow IPC file, and every process maps that file read-only. The string and
+numeric columns of the frame it reads back, and the feature codes, point
+straight into the mapping, so the OS page cache keeps one copy for all
+processes. Only the small categorical codes are copied.
+
+The search index's posting lists and Discover's score matrix are shared the
+same way, each as a set of ``.npy`` files written by the first process to
+build them and mapped by the rest, since they take more memory per process
+than the frame itself.
+
+Snapshots are used when ``BEACON_SNAPSHOT_DIR`` names a directory.
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow
+import pyarrow.ipc
+
+from beacon.schema import FeatureTable
+
+SNAPSHOT_DIR_ENV = 'BEACON_SNAPSHOT_DIR'
+
+
+def snapshot_dir():
+    return os.environ.get(SNAPSHOT_DIR_ENV) or None
+
+
+def _path(directory, version):
+    return os.path.join(directory, f'catalog-{version}.arrow')
+
+
+def _arrays_path(directory, version, name, key):
+    return os.path.join(directory, f'catalog-{version}.{name}.{key}.npy')
+
+
+def _version_of(path):
+    return int(os.path.basename(path)[len('catalog-'):].split('.', 1)[0])
+
+
+def _drop_older(directory, version):
+    for old in glob.glob(os.path.join(directory, 'catalog-*')):
+        # Processes still mapping an old file keep it until they unmap it
+        try:
+            if _version_of(old) < version:
+                os.remove(old)
+        except (OSError, ValueError):
+            pass
+
+
+def write(directory, version, apps, features):
+    """Write catalog ``version`` (as returned by ``load_apps``) and drop older ones."""
+    feature_lists = pyarrow.LargeListArray.from_arrays(
+        pyarrow.array(features.offsets),
+        pyarrow.DictionaryArray.from_arrays(
+            pyarrow.array(features.codes), pyarrow.array(list(features.vocabulary), pyarrow.string())
+        ),
+    )
+    table = pyarrow.Table.from_pandas(apps, preserve_index=False)
+    table = table.append_column('features', feature_lists)
+    path = _path(directory, version)
+    # Written aside and renamed, so readers never map a partial file
+    partial = f'{path}.{os.getpid()}.tmp'
+    with pyarrow.OSFile(partial, 'wb') as sink:
+        with pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(partial, path)
+    _drop_older(directory, version)
+
+
+def read(directory, version):
+    """``(apps, features)`` mapped from the snapshot of ``version``; None if not written yet."""
+    try:
+        source = pyarrow.memory_map(_path(directory, version))
+    except FileNotFoundError:
+        return None
+    table = pyarrow.ipc.open_file(source).read_all()
+    feature_lists = table.column('features').combine_chunks()
+    apps = table.drop_columns(['features']).to_pandas(split_blocks=True)
+    features = FeatureTable(
+        pd.Index(feature_lists.values.dictionary.to_pylist()),
+        feature_lists.values.indices.to_numpy(),
+        feature_lists.offsets.to_numpy(),
+    )
+    return apps, features
+
+
+def write_arrays(directory, version, name, arrays):
+    """Write the ``{key: array}`` built for catalog ``version`` under ``name``."""
+    for key, array in arrays.items():
+        path = _arrays_path(directory, version, name, key)
+        partial = f'{path}.{os.getpid()}.tmp'
+        with open(partial, 'wb') as sink:
+            np.save(sink, np.ascontiguousarray(array), allow_pickle=False)
+        os.replace(partial, path)
+
+
+def read_arrays(directory, version, name, keys):
+    """``{key: array}`` mapped read-only; None until every one of ``keys`` is written."""
+    try:
+        return {
+            key: np.load(_arrays_path(directory, version, name, key), mmap_mode='r')
+            for key in keys
+        }
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,819 @@
+"""SQLite implementation of the storage ``Repository``.
+
+The database runs in WAL mode so dashboard reads never wait on writers, and
+connections are pooled across Streamlit's script threads. All SQL is kept as
+module constants with ``?`` placeholders (paging included), so every query
+text is compiled once per connection and then served from sqlite3's
+statement cache.
+"""
+import contextlib
+import itertools
+import json
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from beacon.repository import (
+    APP_COLUMNS,
+    MESSAGE_COLUMNS,
+    PATIENT_COLUMNS,
+    PRESCRIPTION_COLUMNS,
+    Repository,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS apps (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL,
+    description TEXT,
+    features TEXT NOT NULL DEFAULT '[]',
+    clinical_score REAL,
+    ux_score REAL,
+    security_score REAL,
+    integration_score REAL,
+    fda_status TEXT,
+    testimonial TEXT,
+    active_users INTEGER,
+    success_rate INTEGER
+);
+CREATE TABLE IF NOT EXISTS prescriptions (
+    id INTEGER PRIMARY KEY,
+    app_name TEXT NOT NULL,
+    prescribed_by TEXT NOT NULL,
+    prescribed_to TEXT NOT NULL,
+    status TEXT NOT NULL,
+    prescribed_date TEXT NOT NULL,
+    next_review TEXT,
+    adherence_rate INTEGER,
+    progress_notes TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_prescriptions_to
+    ON prescriptions (prescribed_to, prescribed_date);
+CREATE INDEX IF NOT EXISTS ix_prescriptions_by
+    ON prescriptions (prescribed_by, prescribed_date);
+CREATE INDEX IF NOT EXISTS ix_prescriptions_next_review
+    ON prescriptions (next_review);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    recipient TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    content TEXT NOT NULL,
+    app TEXT,
+    date TEXT NOT NULL,
+    read INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_messages_recipient_date
+    ON messages (recipient, date);
+-- Unread counts are kept by the inboxes (see beacon.inbox) now
+DROP INDEX IF EXISTS ix_messages_recipient_read;
+-- Practice rollups of adherence rates by prescription date, replaced by the
+-- check-in rollups below
+DROP TABLE IF EXISTS rollup_daily;
+DROP TABLE IF EXISTS rollup_weekly;
+CREATE TABLE IF NOT EXISTS practice_daily (
+    provider TEXT NOT NULL,
+    period TEXT NOT NULL,
+    days INTEGER NOT NULL,
+    taken INTEGER NOT NULL,
+    PRIMARY KEY (provider, period)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS practice_weekly (
+    provider TEXT NOT NULL,
+    period TEXT NOT NULL,
+    days INTEGER NOT NULL,
+    taken INTEGER NOT NULL,
+    PRIMARY KEY (provider, period)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_app_usage (
+    provider TEXT NOT NULL,
+    app_name TEXT NOT NULL,
+    prescriptions INTEGER NOT NULL,
+    active INTEGER NOT NULL,
+    PRIMARY KEY (provider, app_name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_rollup_app_usage_top
+    ON rollup_app_usage (provider, prescriptions);
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS adherence_checkins (
+    prescription_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    taken INTEGER NOT NULL,
+    PRIMARY KEY (prescription_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS adherence_weekly (
+    prescription_id INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    days INTEGER NOT NULL,
+    taken INTEGER NOT NULL,
+    PRIMARY KEY (prescription_id, period)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS adherence_monthly (
+    prescription_id INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    days INTEGER NOT NULL,
+    taken INTEGER NOT NULL,
+    PRIMARY KEY (prescription_id, period)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS adherence_totals (
+    prescription_id INTEGER PRIMARY KEY,
+    days INTEGER NOT NULL,
+    taken INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY,
+    origin TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    key TEXT
+);
+CREATE TABLE IF NOT EXISTS patients (
+    id INTEGER PRIMARY KEY,
+    mrn TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    age INTEGER,
+    condition TEXT,
+    status TEXT NOT NULL,
+    adherence INTEGER,
+    provider TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_patients_provider_name
+    ON patients (provider, name);
+CREATE INDEX IF NOT EXISTS ix_patients_name
+    ON patients (name);
+CREATE INDEX IF NOT EXISTS ix_patients_provider_condition
+    ON patients (provider, condition, name);
+CREATE INDEX IF NOT EXISTS ix_patients_provider_status_name
+    ON patients (provider, status, name);
+CREATE INDEX IF NOT EXISTS ix_patients_provider_mrn
+    ON patients (provider, mrn);
+CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+    name, mrn, content='patients', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS patients_fts_insert AFTER INSERT ON patients BEGIN
+    INSERT INTO patients_fts (rowid, name, mrn) VALUES (new.id, new.name, new.mrn);
+END;
+CREATE TRIGGER IF NOT EXISTS patients_fts_delete AFTER DELETE ON patients BEGIN
+    INSERT INTO patients_fts (patients_fts, rowid, name, mrn)
+        VALUES ('delete', old.id, old.name, old.mrn);
+END;
+CREATE TRIGGER IF NOT EXISTS patients_fts_update AFTER UPDATE OF name, mrn ON patients BEGIN
+    INSERT INTO patients_fts (patients_fts, rowid, name, mrn)
+        VALUES ('delete', old.id, old.name, old.mrn);
+    INSERT INTO patients_fts (rowid, name, mrn) VALUES (new.id, new.name, new.mrn);
+END;
+"""
+
+TABLE_COLUMNS = {
+    'apps': APP_COLUMNS,
+    'prescriptions': PRESCRIPTION_COLUMNS,
+    'messages': MESSAGE_COLUMNS,
+    'patients': PATIENT_COLUMNS,
+}
+DATE_COLUMNS = {
+    'apps': [],
+    'prescriptions': ['prescribed_date', 'next_review'],
+    'messages': ['date'],
+    'patients': [],
+}
+
+_PRESCRIPTION_SELECT = f"SELECT {', '.join(PRESCRIPTION_COLUMNS)} FROM prescriptions"
+_MESSAGE_SELECT = f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM messages"
+
+SQL_LIST_APPS = f"SELECT {', '.join(APP_COLUMNS)} FROM apps ORDER BY id"
+SQL_ANY_APP = "SELECT 1 FROM apps LIMIT 1"
+UPSERT_APP_COLUMNS = [column for column in APP_COLUMNS if column != 'id']
+SQL_UPSERT_APP = (
+    f"INSERT INTO apps ({', '.join(UPSERT_APP_COLUMNS)})"
+    f" VALUES ({', '.join('?' * len(UPSERT_APP_COLUMNS))})"
+    " ON CONFLICT (name) DO UPDATE SET "
+    + ', '.join(f"{column} = excluded.{column}" for column in UPSERT_APP_COLUMNS if column != 'name')
+)
+SQL_PATIENT_PRESCRIPTIONS = (
+    f"{_PRESCRIPTION_SELECT} WHERE prescribed_to = ?"
+    " ORDER BY prescribed_date DESC, id DESC LIMIT ? OFFSET ?"
+)
+SQL_PROVIDER_PRESCRIPTIONS = (
+    f"{_PRESCRIPTION_SELECT} WHERE prescribed_by = ?"
+    " ORDER BY prescribed_date DESC, id DESC LIMIT ? OFFSET ?"
+)
+SQL_REVIEWS_DUE = (
+    f"{_PRESCRIPTION_SELECT} WHERE next_review <= ?"
+    " ORDER BY next_review LIMIT ?"
+)
+SQL_OPEN_REVIEWS = (
+    "SELECT id, app_name, prescribed_by, prescribed_to, next_review FROM prescriptions"
+    " WHERE status != ? AND next_review IS NOT NULL ORDER BY next_review, id"
+)
+SQL_OPEN_REVIEW = (
+    "SELECT id, app_name, prescribed_by, prescribed_to, next_review FROM prescriptions"
+    " WHERE id = ? AND status != ? AND next_review IS NOT NULL"
+)
+SQL_PATIENT_CONDITIONS = (
+    "SELECT condition, COUNT(*) FROM patients WHERE provider = ? AND condition IS NOT NULL"
+    " GROUP BY condition ORDER BY condition"
+)
+SQL_CONDITIONS_OF = (
+    "SELECT DISTINCT condition FROM patients WHERE name = ? AND condition IS NOT NULL"
+    " ORDER BY condition"
+)
+SQL_PROVIDERS_OF = (
+    "SELECT DISTINCT provider FROM patients WHERE name IN (SELECT value FROM json_each(?))"
+)
+SQL_COHORT = "SELECT name FROM patients WHERE provider = ? AND condition = ? ORDER BY name"
+SQL_PATIENTS_ON_APP = (
+    "SELECT DISTINCT prescribed_to FROM prescriptions"
+    " WHERE prescribed_to IN (SELECT value FROM json_each(?)) AND app_name = ? AND status != ?"
+)
+SQL_SET_NEXT_REVIEW = "UPDATE prescriptions SET next_review = ? WHERE id = ?"
+SQL_INBOX_ENTRIES = (
+    "SELECT id, sender, app, date, read FROM messages WHERE recipient = ? ORDER BY date, id"
+)
+SQL_MESSAGE_ENTRY = "SELECT id, recipient, sender, app, date, read FROM messages WHERE id = ?"
+# Ids are passed as one JSON array, which keeps the SQL text constant
+SQL_MESSAGES_BY_ID = (
+    f"{_MESSAGE_SELECT} WHERE id IN (SELECT value FROM json_each(?))"
+    " ORDER BY date DESC, id DESC"
+)
+SQL_MARK_READ = "UPDATE messages SET read = 1 WHERE id = ?"
+
+# Dashboard header aggregates; each reads one owner's rows through its index
+SQL_PATIENT_SUMMARY = """SELECT
+    COALESCE(SUM(status = 'Active'), 0),
+    COALESCE(SUM(status = 'Active' AND prescribed_date >= ?), 0),
+    AVG(CASE WHEN status = 'Active' THEN adherence_rate END)
+FROM prescriptions WHERE prescribed_to = ?"""
+SQL_PATIENT_MONTHLY_ADHERENCE = """SELECT m.period, 100.0 * SUM(m.taken) / SUM(m.days)
+FROM prescriptions AS p JOIN adherence_monthly AS m ON m.prescription_id = p.id
+WHERE p.prescribed_to = ? AND m.period >= ? GROUP BY m.period"""
+SQL_PROVIDER_SUMMARY = """SELECT
+    COUNT(DISTINCT CASE WHEN status = 'Active' THEN prescribed_to END),
+    COUNT(DISTINCT CASE WHEN status = 'Active' AND prescribed_date >= ? THEN prescribed_to END),
+    COALESCE(SUM(status = 'Active'), 0),
+    AVG(CASE WHEN status = 'Active' THEN adherence_rate END)
+FROM prescriptions WHERE prescribed_by = ?"""
+
+# Rollups fold in prescriptions with last_id < id <= the current max id
+SQL_ROLLUP_WATERMARK = "SELECT last_id FROM rollup_watermarks WHERE name = 'prescriptions'"
+SQL_MAX_PRESCRIPTION_ID = "SELECT MAX(id) FROM prescriptions"
+SQL_SET_ROLLUP_WATERMARK = (
+    "INSERT INTO rollup_watermarks (name, last_id) VALUES ('prescriptions', ?)"
+    " ON CONFLICT (name) DO UPDATE SET last_id = excluded.last_id"
+)
+PRACTICE_ROLLUPS = (
+    ('practice_daily', "c.day"),
+    # Weeks are keyed by their Monday
+    ('practice_weekly', "date(c.day, '-6 days', 'weekday 1')"),
+)
+SQL_REFRESH_ROLLUPS = [
+    """INSERT INTO rollup_app_usage (provider, app_name, prescriptions, active)
+    SELECT prescribed_by, app_name, COUNT(*), SUM(status = 'Active')
+    FROM prescriptions WHERE id > ? AND id <= ? GROUP BY 1, 2
+    ON CONFLICT (provider, app_name) DO UPDATE SET
+        prescriptions = prescriptions + excluded.prescriptions,
+        active = active + excluded.active"""
+]
+SQL_ENGAGEMENT = {
+    granularity: (
+        f"SELECT period, days, taken FROM {table}"
+        " WHERE provider = ? AND period >= ? ORDER BY period"
+    )
+    for granularity, table in (('day', 'practice_daily'), ('week', 'practice_weekly'))
+}
+SQL_APP_USAGE = (
+    "SELECT app_name, prescriptions, active FROM rollup_app_usage"
+    " WHERE provider = ? ORDER BY prescriptions DESC, app_name LIMIT ?"
+)
+
+# Change log entries are numbered by rowid, which only ever grows while the
+# newest entry is kept. Catalog entries are kept, as they number catalog versions
+SQL_PUBLISH_CHANGE = "INSERT INTO changes (origin, topic, key) VALUES (?, ?, ?)"
+SQL_CHANGES_SINCE = (
+    "SELECT seq, origin, topic, key FROM changes WHERE seq > ? ORDER BY seq LIMIT ?"
+)
+SQL_LAST_CHANGE = "SELECT COALESCE(MAX(seq), 0) FROM changes"
+SQL_LAST_CHANGE_OF = "SELECT COALESCE(MAX(seq), 0) FROM changes WHERE topic = ?"
+SQL_PRUNE_CHANGES = "DELETE FROM changes WHERE seq <= ? AND topic != 'catalog'"
+
+# Check-ins are staged per batch; rows already recorded are dropped, so the
+# log stays append-only and every rollup counts each day once
+SQL_STAGE_CHECKINS = [
+    """CREATE TEMP TABLE IF NOT EXISTS new_checkins (
+        prescription_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        taken INTEGER NOT NULL,
+        PRIMARY KEY (prescription_id, day)
+    ) WITHOUT ROWID""",
+]
+SQL_INSERT_STAGED_CHECKIN = "INSERT OR IGNORE INTO temp.new_checkins VALUES (?, ?, ?)"
+SQL_DROP_RECORDED_CHECKINS = """DELETE FROM temp.new_checkins WHERE EXISTS (
+    SELECT 1 FROM adherence_checkins AS c
+    WHERE c.prescription_id = new_checkins.prescription_id AND c.day = new_checkins.day
+)"""
+SQL_APPEND_CHECKINS = """INSERT INTO adherence_checkins (prescription_id, day, taken)
+SELECT prescription_id, day, taken FROM temp.new_checkins"""
+SQL_FOLD_CHECKINS = [
+    f"""INSERT INTO {table} (prescription_id, period, days, taken)
+    SELECT prescription_id, {period}, COUNT(*), SUM(taken) FROM temp.new_checkins GROUP BY 1, 2
+    ON CONFLICT (prescription_id, period) DO UPDATE SET
+        days = days + excluded.days, taken = taken + excluded.taken"""
+    for table, period in (
+        ('adherence_weekly', "date(day, '-6 days', 'weekday 1')"),
+        ('adherence_monthly', "date(day, 'start of month')"),
+    )
+] + [
+    """INSERT INTO adherence_totals (prescription_id, days, taken)
+    SELECT prescription_id, COUNT(*), SUM(taken) FROM temp.new_checkins GROUP BY 1
+    ON CONFLICT (prescription_id) DO UPDATE SET
+        days = days + excluded.days, taken = taken + excluded.taken""",
+    # adherence_rate is derived from the running totals, never set by hand
+    """UPDATE prescriptions SET adherence_rate = (
+        SELECT CAST(ROUND(100.0 * taken / days) AS INTEGER) FROM adherence_totals
+        WHERE prescription_id = prescriptions.id
+    )
+    WHERE id IN (SELECT prescription_id FROM temp.new_checkins)""",
+    """UPDATE patients SET adherence = (
+        SELECT CAST(ROUND(AVG(adherence_rate)) AS INTEGER) FROM prescriptions
+        WHERE prescribed_to = patients.name
+    )
+    WHERE name IN (
+        SELECT prescribed_to FROM prescriptions
+        WHERE id IN (SELECT prescription_id FROM temp.new_checkins)
+    )""",
+] + [
+    # Practice rollups count check-in days by the prescriber and the day taken
+    f"""INSERT INTO {table} (provider, period, days, taken)
+    SELECT p.prescribed_by, {period}, COUNT(*), SUM(c.taken)
+    FROM temp.new_checkins AS c JOIN prescriptions AS p ON p.id = c.prescription_id
+    GROUP BY 1, 2
+    ON CONFLICT (provider, period) DO UPDATE SET
+        days = days + excluded.days, taken = taken + excluded.taken"""
+    for table, period in PRACTICE_ROLLUPS
+] + [
+    "DELETE FROM temp.new_checkins",
+]
+# Databases made before the practice rollups counted check-ins fill them from the log once
+SQL_BACKFILL_PRACTICE = [
+    f"""INSERT INTO {table} (provider, period, days, taken)
+    SELECT p.prescribed_by, {period}, COUNT(*), SUM(c.taken)
+    FROM adherence_checkins AS c JOIN prescriptions AS p ON p.id = c.prescription_id
+    WHERE NOT EXISTS (SELECT 1 FROM {table})
+    GROUP BY 1, 2"""
+    for table, period in PRACTICE_ROLLUPS
+]
+SQL_ADHERENCE_HISTORY = {
+    'day': (
+        "SELECT day AS period, 1 AS days, taken FROM adherence_checkins"
+        " WHERE prescription_id = ? AND day >= ? ORDER BY day"
+    ),
+    **{
+        granularity: (
+            f"SELECT period, days, taken FROM {table}"
+            " WHERE prescription_id = ? AND period >= ? ORDER BY period"
+        )
+        for granularity, table in (('week', 'adherence_weekly'), ('month', 'adherence_monthly'))
+    },
+}
+
+# Change log entries kept for processes catching up; older ones are pruned
+CHANGE_LOG_SIZE = 10_000
+
+# Bytes of the database file read through a shared memory map. Worker
+# processes then share its pages (rollups, indexes) in the OS page cache
+# instead of each copying them into a private page cache.
+MMAP_BYTES = 256 * 1024 * 1024
+
+# Shortest query the trigram index can answer; shorter ones match by prefix
+TRIGRAM_MIN_LENGTH = 3
+# The highest code point, which sorts after any character a name can continue with
+PREFIX_END = '\U0010ffff'
+
+
+def _patient_search_sql(match, with_status):
+    """Patient search statement; the window count returns the total with each row."""
+    where = ["provider = ?"]
+    if match == 'prefix':
+        # A prefix is a range on each NOCASE column. Written out as two range
+        # scans, of the (provider, name) and (provider, mrn) indexes, so only
+        # the matches are read and sorted, not every patient of the provider
+        where = ["id IN (SELECT id FROM patients WHERE provider = ? AND name BETWEEN ? AND ?"
+                 " UNION SELECT id FROM patients WHERE provider = ? AND mrn BETWEEN ? AND ?)"]
+    elif match == 'trigram':
+        # The IN subquery runs the trigram match once up front; a join would let
+        # the planner re-probe the FTS index for every patient of the provider
+        where.append("id IN (SELECT rowid FROM patients_fts WHERE patients_fts MATCH ?)")
+    if with_status:
+        where.append("status = ?")
+    return (
+        f"SELECT {', '.join(PATIENT_COLUMNS)}, COUNT(*) OVER () AS total FROM patients"
+        f" WHERE {' AND '.join(where)} ORDER BY name, id LIMIT ? OFFSET ?"
+    )
+
+
+SQL_SEARCH_PATIENTS = {
+    (match, with_status): _patient_search_sql(match, with_status)
+    for match in ('all', 'prefix', 'trigram')
+    for with_status in (False, True)
+}
+
+
+def _insert_sql(table):
+    columns = TABLE_COLUMNS[table]
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)})"
+        f" VALUES ({', '.join('?' * len(columns))})"
+    )
+
+
+SQL_INSERT = {table: _insert_sql(table) for table in TABLE_COLUMNS}
+
+
+def _to_sql_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ', timespec='seconds')
+    if isinstance(value, (list, tuple)):
+        return json.dumps(list(value))
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _to_sql_day(value):
+    return value if isinstance(value, str) else value.strftime('%Y-%m-%d')
+
+
+def _to_row(table, record):
+    """Convert a record dict (or an already ordered tuple) into insert params."""
+    if isinstance(record, dict):
+        return tuple(_to_sql_value(record.get(column)) for column in TABLE_COLUMNS[table])
+    return tuple(_to_sql_value(value) for value in record)
+
+
+def _chunks(cursor, size=10_000):
+    """``cursor``'s rows, ``size`` at a time, so a scan never holds the whole result."""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def _limit(limit):
+    # SQLite treats a negative LIMIT as "no limit", which keeps the SQL text constant
+    return -1 if limit is None else limit
+
+
+def _read_frame(conn, sql, params, dates=()):
+    """Query result as a DataFrame, parsing the ``dates`` columns."""
+    # Imported with the first frame rather than the module (see ``store``)
+    import pandas as pd
+
+    frame = pd.read_sql_query(sql, conn, params=params)
+    for column in dates:
+        frame[column] = pd.to_datetime(frame[column])
+    return frame
+
+
+class SQLiteRepository(Repository):
+    _memory_ids = itertools.count(1)
+
+    def __init__(self, path, pool_size=8):
+        self.path = path
+        self.pool_size = pool_size
+        if path == ':memory:':
+            # A named shared-cache database lets every pooled connection see the same data
+            self._target = f"file:beacon-mem-{next(self._memory_ids)}?mode=memory&cache=shared"
+            self._uri = True
+        else:
+            self._target = path
+            self._uri = False
+        self._pool = queue.LifoQueue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for sql in SQL_BACKFILL_PRACTICE:
+                    conn.execute(sql)
+
+    @classmethod
+    def from_url(cls, url):
+        # sqlite:///relative.db, sqlite:////absolute.db or sqlite:///:memory:
+        return cls(url.split('://', 1)[1][1:] or ':memory:')
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self._target,
+            uri=self._uri,
+            timeout=30,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        if not self._uri:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrow a pooled connection, opening a new one while under ``pool_size``."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                create = self._created < self.pool_size
+                if create:
+                    self._created += 1
+            conn = self._connect() if create else self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _query(self, table, sql, params):
+        with self.connection() as conn:
+            return _read_frame(conn, sql, params, DATE_COLUMNS[table])
+
+    def is_empty(self):
+        with self.connection() as conn:
+            return conn.execute(SQL_ANY_APP).fetchone() is None
+
+    def list_apps(self):
+        apps = self._query('apps', SQL_LIST_APPS, ())
+        apps['features'] = apps['features'].map(json.loads)
+        return apps
+
+    def iter_apps(self, chunk_size=10_000):
+        import pandas as pd
+
+        with self.connection() as conn:
+            for rows in _chunks(conn.execute(SQL_LIST_APPS), chunk_size):
+                apps = pd.DataFrame.from_records(rows, columns=APP_COLUMNS)
+                apps['features'] = apps['features'].map(json.loads)
+                yield apps
+
+    def upsert_apps(self, rows):
+        params = [
+            tuple(_to_sql_value(record.get(column)) for column in UPSERT_APP_COLUMNS)
+            for record in rows
+        ]
+        with self.connection() as conn, conn:
+            conn.executemany(SQL_UPSERT_APP, params)
+        return len(params)
+
+    def prescriptions_for_patient(self, patient, limit=None, offset=0):
+        return self._query(
+            'prescriptions', SQL_PATIENT_PRESCRIPTIONS, (patient, _limit(limit), offset)
+        )
+
+    def prescriptions_for_provider(self, provider, limit=None, offset=0):
+        return self._query(
+            'prescriptions', SQL_PROVIDER_PRESCRIPTIONS, (provider, _limit(limit), offset)
+        )
+
+    def reviews_due(self, before, limit=None):
+        return self._query(
+            'prescriptions', SQL_REVIEWS_DUE, (_to_sql_value(before), _limit(limit))
+        )
+
+    def open_reviews(self, closed=('Completed',)):
+        # One status keeps the SQL text constant; the schedule only ever closes one
+        (closed_status,) = closed
+        with self.connection() as conn:
+            for rows in _chunks(conn.execute(SQL_OPEN_REVIEWS, (closed_status,))):
+                yield from rows
+
+    def open_review(self, prescription_id, closed=('Completed',)):
+        (closed_status,) = closed
+        with self.connection() as conn:
+            return conn.execute(SQL_OPEN_REVIEW, (prescription_id, closed_status)).fetchone()
+
+    def set_next_review(self, prescription_id, next_review):
+        with self.connection() as conn, conn:
+            conn.execute(SQL_SET_NEXT_REVIEW, (_to_sql_value(next_review), prescription_id))
+
+    def inbox_entries(self, recipient):
+        with self.connection() as conn:
+            for rows in _chunks(conn.execute(SQL_INBOX_ENTRIES, (recipient,))):
+                yield from rows
+
+    def message_entry(self, message_id):
+        with self.connection() as conn:
+            return conn.execute(SQL_MESSAGE_ENTRY, (message_id,)).fetchone()
+
+    def messages_by_id(self, message_ids):
+        messages = self._query('messages', SQL_MESSAGES_BY_ID, (json.dumps(list(message_ids)),))
+        messages['read'] = messages['read'].astype(bool)
+        return messages
+
+    def patient_conditions(self, provider):
+        with self.connection() as conn:
+            return dict(conn.execute(SQL_PATIENT_CONDITIONS, (provider,)).fetchall())
+
+    def conditions_of(self, patient):
+        with self.connection() as conn:
+            return [condition for condition, in conn.execute(SQL_CONDITIONS_OF, (patient,))]
+
+    def providers_of(self, patients):
+        with self.connection() as conn:
+            rows = conn.execute(SQL_PROVIDERS_OF, (json.dumps(list(patients)),))
+            return {provider for provider, in rows}
+
+    def cohort(self, provider, condition):
+        with self.connection() as conn:
+            return [name for name, in conn.execute(SQL_COHORT, (provider, condition))]
+
+    def patients_on_app(self, app_name, patients, closed=('Completed',)):
+        (closed_status,) = closed
+        with self.connection() as conn:
+            rows = conn.execute(
+                SQL_PATIENTS_ON_APP, (json.dumps(list(patients)), app_name, closed_status)
+            )
+            return {patient for patient, in rows}
+
+    def search_patients(self, provider, query='', status=None, limit=None, offset=0):
+        query = query.strip()
+        params = [provider]
+        if not query:
+            match = 'all'
+        elif len(query) < TRIGRAM_MIN_LENGTH:
+            match = 'prefix'
+            # Every string starting with the query sorts between these two
+            bounds = [query, query + PREFIX_END]
+            params += bounds + [provider] + bounds
+        else:
+            match = 'trigram'
+            params.append('"' + query.replace('"', '""') + '"')
+        if status is not None:
+            params.append(status)
+        params += [_limit(limit), offset]
+        patients = self._query(
+            'patients', SQL_SEARCH_PATIENTS[match, status is not None], params
+        )
+        total = int(patients['total'].iloc[0]) if len(patients) else 0
+        return patients.drop(columns='total'), total
+
+    def refresh_rollups(self):
+        with self.connection() as conn, conn:
+            # Hold the write lock from the watermark read on, so two processes
+            # never fold the same prescriptions
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(SQL_ROLLUP_WATERMARK).fetchone()
+            last_id = row[0] if row else 0
+            max_id = conn.execute(SQL_MAX_PRESCRIPTION_ID).fetchone()[0] or 0
+            if max_id <= last_id:
+                return 0
+            for sql in SQL_REFRESH_ROLLUPS:
+                conn.execute(sql, (last_id, max_id))
+            conn.execute(SQL_SET_ROLLUP_WATERMARK, (max_id,))
+        return max_id - last_id
+
+    def engagement(self, provider, granularity, since):
+        with self.connection() as conn:
+            return _read_frame(
+                conn, SQL_ENGAGEMENT[granularity],
+                (provider, since.strftime('%Y-%m-%d')), dates=('period',),
+            )
+
+    def app_usage(self, provider, limit=10):
+        with self.connection() as conn:
+            return _read_frame(conn, SQL_APP_USAGE, (provider, limit))
+
+    def record_checkins(self, rows, batch_size=50_000):
+        rows = iter(rows)
+        recorded = 0
+        with self.connection() as conn, conn:
+            # The duplicate check reads what another process may be writing
+            conn.execute("BEGIN IMMEDIATE")
+            for sql in SQL_STAGE_CHECKINS:
+                conn.execute(sql)
+            while True:
+                batch = [
+                    (prescription_id, _to_sql_day(day), int(taken))
+                    for prescription_id, day, taken in itertools.islice(rows, batch_size)
+                ]
+                if not batch:
+                    break
+                conn.executemany(SQL_INSERT_STAGED_CHECKIN, batch)
+                conn.execute(SQL_DROP_RECORDED_CHECKINS)
+                recorded += conn.execute(SQL_APPEND_CHECKINS).rowcount
+                for sql in SQL_FOLD_CHECKINS:
+                    conn.execute(sql)
+        return recorded
+
+    def adherence_history(self, prescription_id, granularity, since):
+        with self.connection() as conn:
+            return _read_frame(
+                conn, SQL_ADHERENCE_HISTORY[granularity],
+                (prescription_id, since.strftime('%Y-%m-%d')), dates=('period',),
+            )
+
+    def patient_summary(self, patient, month):
+        previous = (month.replace(day=1) - timedelta(days=1)).replace(day=1)
+        with self.connection() as conn:
+            active, new, adherence = conn.execute(
+                SQL_PATIENT_SUMMARY, (month.strftime('%Y-%m-%d'), patient)
+            ).fetchone()
+            monthly = dict(conn.execute(
+                SQL_PATIENT_MONTHLY_ADHERENCE, (patient, previous.strftime('%Y-%m-%d'))
+            ).fetchall())
+        return {
+            'active': active, 'new_this_month': new, 'adherence': adherence,
+            'this_month': monthly.get(month.strftime('%Y-%m-%d')),
+            'last_month': monthly.get(previous.strftime('%Y-%m-%d')),
+        }
+
+    def provider_summary(self, provider, month):
+        with self.connection() as conn:
+            patients, new, active, engagement = conn.execute(
+                SQL_PROVIDER_SUMMARY, (month.strftime('%Y-%m-%d'), provider)
+            ).fetchone()
+        return {
+            'active_patients': patients, 'new_patients': new,
+            'active_prescriptions': active, 'engagement': engagement,
+        }
+
+    def publish_changes(self, origin, changes):
+        with self.connection() as conn, conn:
+            first = seq = None
+            for topic, key in changes:
+                seq = conn.execute(SQL_PUBLISH_CHANGE, (origin, topic, key)).lastrowid
+                first = first or seq
+            # Prune once every 1000 entries; a batch may step over the multiple itself
+            if seq is not None and (first - 1) // 1000 != seq // 1000:
+                conn.execute(SQL_PRUNE_CHANGES, (seq - CHANGE_LOG_SIZE,))
+        return seq
+
+    def changes_since(self, seq, limit=CHANGE_LOG_SIZE):
+        with self.connection() as conn:
+            return conn.execute(SQL_CHANGES_SINCE, (seq, limit)).fetchall()
+
+    def last_change(self, topic=None):
+        with self.connection() as conn:
+            if topic is None:
+                return conn.execute(SQL_LAST_CHANGE).fetchone()[0]
+            return conn.execute(SQL_LAST_CHANGE_OF, (topic,)).fetchone()[0]
+
+    def _insert(self, table, record):
+        with self.connection() as conn, conn:
+            return conn.execute(SQL_INSERT[table], _to_row(table, record)).lastrowid
+
+    def add_prescriptions(self, records):
+        sql = SQL_INSERT['prescriptions']
+        with self.connection() as conn, conn:
+            return [
+                conn.execute(sql, _to_row('prescriptions', record)).lastrowid
+                for record in records
+            ]
+
+    def add_new_prescriptions(self, app_name, records, closed=('Completed',)):
+        (closed_status,) = closed
+        sql = SQL_INSERT['prescriptions']
+        with self.connection() as conn, conn:
+            # Hold the write lock from the check on, so two prescribers never
+            # both find a patient free and prescribe the app twice
+            conn.execute("BEGIN IMMEDIATE")
+            patients = json.dumps([record['prescribed_to'] for record in records])
+            on_app = {
+                patient for patient, in
+                conn.execute(SQL_PATIENTS_ON_APP, (patients, app_name, closed_status))
+            }
+            return [
+                None if record['prescribed_to'] in on_app
+                else conn.execute(sql, _to_row('prescriptions', record)).lastrowid
+                for record in records
+            ]
+
+    def add_message(self, record):
+        return self._insert('messages', record)
+
+    def mark_messages_read(self, message_ids):
+        with self.connection() as conn, conn:
+            conn.executemany(SQL_MARK_READ, [(message_id,) for message_id in message_ids])
+
+    def bulk_load(self, table, rows, batch_size=50_000):
+        """Insert an iterable of records in one transaction, ``batch_size`` at a time."""
+        sql = SQL_INSERT[table]
+        rows = iter(rows)
+        loaded = 0
+        with self.connection() as conn, conn:
+            while True:
+                batch = [_to_row(table, record) for record in itertools.islice(rows, batch_size)]
+                if not batch:
+                    break
+                conn.executemany(sql, batch)
+                loaded += len(batch)
+        return loaded
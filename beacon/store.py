@@ -0,0 +1,565 @@
+"""Process-wide data store shared by every Streamlit session.
+
+The app catalog is loaded once per process and handed to all sessions
+read-only. Prescriptions and messages live in the persistent repository and
+are queried per user, so a session only ever holds the rows it renders.
+
+The modules that build pandas frames (the catalog, its indexes, charts and
+file formats) are imported where first used, so a session's sidebar and
+header render before pandas has loaded.
+
+Several processes may serve the same repository (see ``beacon.serve``). Each
+write is applied to this process's caches at once and published to the
+repository's change log. ``sync``, called at the start of every script run
+and, when ``WORKERS_ENV`` says several workers share the repository, by the
+live update listener, applies the entries other processes published.
+
+Writes are also pushed to the open sessions that show them (see
+``beacon.bus``): the inbox, My Apps and patient list fragments follow their
+user's channels and rerun as soon as a write to them is applied here.
+"""
+import atexit
+import math
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from beacon import bus, demo_data, inbox, metrics, notifications, paging, reviews, summaries
+from beacon.repository import open_repository
+
+# Cached catalogs are rebuilt after this many seconds, or on a version bump
+CATALOG_TTL_SECONDS = 60 * 60
+
+# Cached per-query results (e.g. patient searches) expire after this many seconds
+QUERY_TTL_SECONDS = 60
+
+# Owners whose query versions are kept; past this, every cached query lapses at once
+MAX_QUERY_VERSIONS = 100_000
+
+# How many workers share the repository; ``beacon.serve`` sets it for its workers
+WORKERS_ENV = 'BEACON_WORKERS'
+
+# Marks this process's own entries in the shared change log
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_version_lock = threading.Lock()
+# The change log entry of the newest catalog write, so every process agrees on it
+_catalog_version = 0
+# Versions of the cached queries over one owner's data, as {(query, owner): version}.
+# Every version is drawn from _data_version, so none is ever reused
+_data_version = 0
+_query_versions = {}
+# Version of the queries not in _query_versions
+_query_floor = 0
+# Newest change log entry this process has applied
+_last_change = 0
+
+
+class Catalog:
+    """Immutable snapshot of the app catalog at one catalog version.
+
+    The search index takes most of the build time and only Discover uses it,
+    so it is built on first use, as is Discover's ranking.
+    """
+
+    __slots__ = ('version', 'apps', 'features', 'index', '_search', '_ranking', '_lock')
+
+    def __init__(self, version, apps, features):
+        from beacon.catalog_index import CatalogIndex
+
+        self.version = version
+        self.apps, self.features = apps, features
+        self.index = CatalogIndex(self.apps)
+        self._search = self._ranking = None
+        self._lock = threading.Lock()
+
+    @property
+    def search(self):
+        with self._lock:
+            if self._search is None:
+                from beacon import search
+
+                arrays = self._shared('search', search.ARRAYS, lambda: search.build_arrays(
+                    self.apps, self.features
+                ))
+                self._search = search.SearchIndex(self.apps, self.features, arrays)
+            return self._search
+
+    @property
+    def ranking(self):
+        with self._lock:
+            if self._ranking is None:
+                from beacon import ranking
+
+                arrays = self._shared(
+                    'ranking', ranking.ARRAYS, lambda: ranking.build_arrays(self.apps)
+                )
+                self._ranking = ranking.Ranker(self.apps, arrays=arrays)
+            return self._ranking
+
+    def _shared(self, name, keys, build):
+        """``build()``'s arrays, mapped from the catalog snapshot when there is one."""
+        from beacon import snapshots
+
+        directory = snapshots.snapshot_dir()
+        if directory is None:
+            return build()
+        # Map the shared arrays, writing them first if no process has yet
+        arrays = snapshots.read_arrays(directory, self.version, name, keys)
+        if arrays is None:
+            snapshots.write_arrays(directory, self.version, name, build())
+            arrays = snapshots.read_arrays(directory, self.version, name, keys)
+        return arrays
+
+
+def catalog_version():
+    return _catalog_version
+
+
+def _set_catalog_version(version):
+    global _catalog_version
+    with _version_lock:
+        _catalog_version = max(_catalog_version, version)
+
+
+def invalidate_catalog():
+    """Drop the cached catalog in every session of every process on their next rerun."""
+    _set_catalog_version(_publish(('catalog', None)))
+
+
+def _publish(*changes):
+    """Log ``(topic, key)`` writes this process has applied, for the others to apply."""
+    return get_repository().publish_changes(ORIGIN, changes)
+
+
+def sync():
+    """Apply the writes other processes logged since the last call.
+
+    Costs one indexed query when there are none. A process that fell behind
+    the pruned log drops all its caches instead.
+    """
+    global _last_change
+    repo = get_repository()
+    with _version_lock:
+        changes = repo.changes_since(_last_change)
+        if not changes:
+            return 0
+        missed = changes[0][0] != _last_change + 1
+        _last_change = changes[-1][0]
+    foreign = [change for change in changes if change[1] != ORIGIN]
+    channels = set()
+    queries = []
+    if missed:
+        _set_catalog_version(repo.last_change('catalog'))
+        get_review_schedule.clear()
+        get_summaries().clear()
+        get_inboxes().clear()
+        _bump_all_queries()
+    else:
+        for seq, _, topic, key in foreign:
+            if topic == 'catalog':
+                _set_catalog_version(seq)
+            elif topic == 'review':
+                get_review_schedule().refresh(int(key), repo.open_review(int(key)))
+            elif topic == 'summary':
+                kind, owner = key.split(':', 1)
+                get_summaries().invalidate((kind, owner))
+                channels.add((kind, owner))
+            elif topic == 'message':
+                row = repo.message_entry(int(key))
+                get_inboxes().refresh(row)
+                if row is not None:
+                    channels.add(('inbox', row[1]))
+            elif topic == 'query':
+                queries.append(tuple(key.split(':', 1)))
+    _bump_queries(*queries)
+    if missed:
+        get_bus().publish_all()
+    elif channels:
+        get_bus().publish(*channels)
+    return len(foreign)
+
+
+def _query_version(query, owner):
+    return _query_versions.get((query, str(owner)), _query_floor)
+
+
+def _bump_queries(*keys):
+    """Move on the versions of ``(query, owner)`` keys, so their cached results lapse."""
+    global _data_version
+    with _version_lock:
+        for query, owner in keys:
+            _data_version += 1
+            _query_versions[query, str(owner)] = _data_version
+        overflow = len(_query_versions) > MAX_QUERY_VERSIONS
+    if overflow:
+        _bump_all_queries()
+
+
+def _bump_all_queries():
+    global _data_version, _query_floor
+    with _version_lock:
+        _data_version += 1
+        _query_floor = _data_version
+        _query_versions.clear()
+
+
+def _changed(*keys):
+    """Lapse the cached queries a write changed, here and in the other processes."""
+    _bump_queries(*keys)
+    _publish(*[('query', f"{query}:{owner}") for query, owner in keys])
+
+
+def open_seeded_repository():
+    """Open the configured repository, seeding the demo data into an empty one."""
+    repo = open_repository()
+    if repo.is_empty():
+        repo.seed(
+            demo_data.APPS, demo_data.prescriptions(), demo_data.messages(), demo_data.PATIENTS,
+            demo_data.checkins(),
+        )
+    # Catch the rollups up with anything written while no app process was running
+    repo.refresh_rollups()
+    return repo
+
+
+@st.cache_resource(show_spinner=False)
+def get_repository():
+    repo = open_seeded_repository()
+    global _last_change
+    _last_change = repo.last_change()
+    _set_catalog_version(repo.last_change('catalog'))
+    return repo
+
+
+@st.cache_resource(show_spinner=False)
+def get_review_schedule():
+    return reviews.ReviewSchedule.load(get_repository())
+
+
+@st.cache_resource(show_spinner=False)
+def get_summaries():
+    return summaries.SummaryCache(get_repository())
+
+
+@st.cache_resource(show_spinner=False)
+def get_inboxes():
+    return inbox.InboxCache(get_repository())
+
+
+def patient_summary(patient):
+    return get_summaries().get('patient', patient)
+
+
+def provider_summary(provider):
+    return get_summaries().get('provider', provider)
+
+
+def _touched(patients=(), providers=(), review_ids=()):
+    """Drop the summaries a write changed, here and in the other processes.
+
+    ``review_ids`` names prescriptions whose review the other processes must
+    re-read. Returns the summary keys, which are also their owners' ``bus``
+    channels.
+    """
+    keys = [('patient', patient) for patient in patients]
+    keys += [('provider', provider) for provider in providers]
+    get_summaries().invalidate(*keys)
+    changes = [('summary', f"{kind}:{owner}") for kind, owner in keys]
+    changes += [('review', str(prescription_id)) for prescription_id in review_ids]
+    _publish(*changes)
+    return keys
+
+
+@st.cache_resource(show_spinner=False)
+def get_bus():
+    live = bus.Bus()
+    # Pushes other workers' writes without waiting for a session to rerun
+    if int(os.environ.get(WORKERS_ENV, 1)) > 1:
+        live.listen(sync)
+    return live
+
+
+def follow(*channels):
+    """Rerun the fragment being rendered whenever a write touches ``channels``."""
+    return get_bus().follow(*channels)
+
+
+@st.cache_resource(show_spinner=False)
+def get_dispatcher():
+    dispatcher = notifications.Dispatcher(notifications.open_transport())
+    # Deliver what is still queued when the server shuts down
+    atexit.register(dispatcher.close)
+    return dispatcher
+
+
+@st.cache_resource(ttl=CATALOG_TTL_SECONDS, max_entries=2, show_spinner=False)
+def _load_catalog(version):
+    from beacon import snapshots
+    from beacon.schema import load_apps
+
+    metrics.CACHE_MISSES.inc(cache='catalog')
+    directory = snapshots.snapshot_dir()
+    if directory is None:
+        return Catalog(version, *load_apps(get_repository().list_apps()))
+    # Map the shared snapshot, writing it first if no process has yet
+    mapped = snapshots.read(directory, version)
+    if mapped is None:
+        snapshots.write(directory, version, *load_apps(get_repository().list_apps()))
+        mapped = snapshots.read(directory, version)
+    return Catalog(version, *mapped)
+
+
+def get_catalog():
+    metrics.CACHE_REQUESTS.inc(cache='catalog')
+    return _load_catalog(_catalog_version)
+
+
+def current_patient():
+    return st.query_params.get('patient', demo_data.DEMO_PATIENT)
+
+
+def current_provider():
+    return st.query_params.get('provider', demo_data.DEMO_PROVIDER)
+
+
+def prescriptions(patient, limit=None, offset=0):
+    return get_repository().prescriptions_for_patient(patient, limit, offset)
+
+
+def get_inbox(recipient):
+    """The recipient's ``inbox.Inbox``: counters and ordering, no message bodies."""
+    return get_inboxes().get(recipient)
+
+
+def patient_profile(patient):
+    """``ranking.Profile`` of the conditions and prescriptions recommendations use."""
+    from beacon.ranking import Profile
+
+    history = get_repository().prescriptions_for_patient(patient)
+    return Profile(
+        patient,
+        tuple(get_repository().conditions_of(patient)),
+        tuple(zip(
+            history['app_name'], history['adherence_rate'].fillna(0).astype(int),
+            history['status'],
+        )),
+    )
+
+
+def unread_count(recipient):
+    return get_inbox(recipient).unread
+
+
+def message_page(recipient, number=1, page_size=10):
+    """One page of the recipient's messages, newest first."""
+    messages = get_inbox(recipient)
+    total = len(messages)
+    pages = max(1, math.ceil(total / page_size))
+    number = min(max(1, number), pages)
+    ids = messages.newest(page_size, (number - 1) * page_size)
+    rows = get_repository().messages_by_id(ids)
+    return paging.Page(rows, number, pages, total, (number - 1) * page_size)
+
+
+@st.cache_data(ttl=QUERY_TTL_SECONDS, max_entries=1024, show_spinner=False)
+def _search_patients(provider, query, status, page_size, offset, version):
+    metrics.CACHE_MISSES.inc(cache='patient_search')
+    return get_repository().search_patients(provider, query, status, page_size, offset)
+
+
+def search_patients(provider, query='', status=None, number=1, page_size=10):
+    """One page of a provider's patient search, cached per normalised query."""
+    query = ' '.join(query.split()).lower()
+    number = max(1, number)
+    metrics.CACHE_REQUESTS.inc(cache='patient_search')
+    rows, total = _search_patients(
+        provider, query, status, page_size, (number - 1) * page_size,
+        _query_version('search', provider),
+    )
+    if not len(rows) and number > 1:
+        # The requested page ran past the results; fall back to the first one
+        return search_patients(provider, query, status, 1, page_size)
+    pages = max(1, math.ceil(total / page_size))
+    return paging.Page(rows, number, pages, total, (number - 1) * page_size)
+
+
+@st.cache_data(ttl=QUERY_TTL_SECONDS, max_entries=256, show_spinner=False)
+def _practice_analytics(provider, granularity, version):
+    from beacon import analytics
+
+    metrics.CACHE_MISSES.inc(cache='practice_analytics')
+    repo = get_repository()
+    return (
+        analytics.engagement_series(repo, provider, granularity),
+        analytics.app_usage(repo, provider),
+    )
+
+
+def practice_analytics(provider, granularity='week'):
+    """(engagement, app usage) chart frames for ``provider``."""
+    metrics.CACHE_REQUESTS.inc(cache='practice_analytics')
+    return _practice_analytics(provider, granularity, _query_version('analytics', provider))
+
+
+@st.cache_data(ttl=QUERY_TTL_SECONDS, max_entries=256, show_spinner=False)
+def _adherence_progress(prescription_id, since, version):
+    from beacon import adherence
+
+    metrics.CACHE_MISSES.inc(cache='adherence_progress')
+    return adherence.progress_series(get_repository(), prescription_id, since)
+
+
+def adherence_progress(prescription_id, since):
+    """``(granularity, chart frame)`` of a prescription's adherence since ``since``."""
+    metrics.CACHE_REQUESTS.inc(cache='adherence_progress')
+    return _adherence_progress(
+        prescription_id, since, _query_version('progress', prescription_id)
+    )
+
+
+def check_in(prescription, taken=True, day=None):
+    """Record today's (or ``day``'s) check-in; False if that day was already recorded."""
+    day = day or datetime.now().date()
+    repo = get_repository()
+    recorded = repo.record_checkins([(prescription['id'], day, taken)])
+    if recorded:
+        touched = _touched([prescription['prescribed_to']], [prescription['prescribed_by']])
+        # The patient's adherence shows in their providers' patient searches
+        providers = repo.providers_of([prescription['prescribed_to']])
+        _changed(
+            ('progress', prescription['id']), ('analytics', prescription['prescribed_by']),
+            *[('search', provider) for provider in providers],
+        )
+        get_bus().publish(*touched)
+    return bool(recorded)
+
+
+def add_prescriptions(records):
+    """Write prescriptions in one transaction and apply them to the caches once."""
+    records = [dict(fields, id=None) for fields in records]
+    if not records:
+        return records
+    for record, prescription_id in zip(records, get_repository().add_prescriptions(records)):
+        record['id'] = prescription_id
+    return _prescribed(records)
+
+
+def _prescribed(records):
+    """Apply just-written prescriptions to the rollups and caches, and push them."""
+    get_repository().refresh_rollups()
+    get_review_schedule().add_many(records)
+    touched = _touched(
+        patients={record['prescribed_to'] for record in records},
+        providers={record['prescribed_by'] for record in records},
+        review_ids=[record['id'] for record in records],
+    )
+    _changed(*[('analytics', owner) for kind, owner in touched if kind == 'provider'])
+    get_bus().publish(*touched)
+    return records
+
+
+def patient_conditions(provider):
+    return get_repository().patient_conditions(provider)
+
+
+def cohort(provider, condition):
+    return get_repository().cohort(provider, condition)
+
+
+def prescribe(provider, app_name, patients, review_days=reviews.REVIEW_INTERVAL_DAYS, notes=''):
+    """Prescribe a library app to ``patients`` as one batch.
+
+    Patients already on an open prescription of the app are skipped. Returns
+    ``(written records, skipped patients)``; raises ValueError for an app
+    that is not in the catalog.
+    """
+    if app_name not in get_catalog().index.by_name.index:
+        raise ValueError(f"No app named {app_name!r} in the library")
+    now = datetime.now().replace(microsecond=0)
+    records = [
+        {
+            'id': None, 'app_name': app_name, 'prescribed_by': provider,
+            'prescribed_to': patient, 'status': 'Active', 'prescribed_date': now,
+            'next_review': now + timedelta(days=review_days),
+            # No check-ins yet, so no rate for the averages to count
+            'adherence_rate': None, 'progress_notes': notes,
+        }
+        for patient in dict.fromkeys(patients)
+    ]
+    if not records:
+        return [], []
+    # The check and the insert are one transaction, so concurrent prescribers
+    # of the same app to the same patient write it once
+    ids = get_repository().add_new_prescriptions(app_name, records, reviews.CLOSED_STATUSES)
+    skipped = []
+    for record, prescription_id in zip(records, ids):
+        record['id'] = prescription_id
+        if prescription_id is None:
+            skipped.append(record['prescribed_to'])
+    written = [record for record in records if record['id'] is not None]
+    if written:
+        _prescribed(written)
+    return written, sorted(skipped)
+
+
+def renew_review(prescription_id, days=reviews.REVIEW_INTERVAL_DAYS):
+    """Mark a review done and schedule the next one ``days`` from now."""
+    next_review = datetime.now().replace(microsecond=0) + timedelta(days=days)
+    get_repository().set_next_review(prescription_id, next_review)
+    get_review_schedule().reschedule(prescription_id, next_review)
+    _publish(('review', str(prescription_id)))
+    return next_review
+
+
+def send_message(sender, recipient, content, app=None, priority='Normal', notify=True):
+    """Store a message and, if ``notify``, queue its notification for delivery."""
+    record = {
+        'recipient': recipient, 'sender': sender, 'content': content,
+        'app': app, 'date': datetime.now(), 'read': False,
+    }
+    record['id'] = get_repository().add_message(record)
+    get_inboxes().add(recipient, inbox.entry(record['id'], sender, app, record['date'], False))
+    _publish(('message', str(record['id'])))
+    get_bus().publish(('inbox', recipient))
+    if notify:
+        get_dispatcher().submit(record['id'], recipient, sender, app, priority)
+    return record
+
+
+def mark_messages_read(recipient, message_ids):
+    """Mark messages read, moving just them between the inbox counters."""
+    get_repository().mark_messages_read(message_ids)
+    changed = get_inboxes().mark_read(recipient, message_ids)
+    if changed:
+        _publish(*[('message', str(message_id)) for message_id in changed])
+        get_bus().publish(('inbox', recipient))
+    return len(changed)
+
+
+def mark_all_read(recipient):
+    unread = get_inbox(recipient).newest_unread()
+    return mark_messages_read(recipient, [found.id for found in unread])
+
+
+def import_apps(source, fmt, progress=None):
+    """Import a vendor catalog file; every session sees the new catalog next rerun."""
+    from beacon import catalog_io
+
+    try:
+        return catalog_io.import_apps(get_repository(), source, fmt, progress=progress)
+    finally:
+        # Chunks commit as they go, so even a failed import may have changed the library
+        invalidate_catalog()
+
+
+def export_apps(fmt, directory):
+    """Export the library as ``fmt`` into ``directory``; returns the file's name."""
+    from beacon import catalog_io
+
+    os.makedirs(directory, exist_ok=True)
+    return catalog_io.export_to(get_repository(), fmt, directory)
@@ -0,0 +1,70 @@
+"""Per-patient and per-provider dashboard header summaries.
+
+A summary is built by one indexed aggregate query the first time its owner's
+dashboard reads it, then served from memory. Writes that change it (a new
+prescription or adherence check-in) drop just the owners they touch
+(see ``store``), and every summary lapses when the month turns, because the
+"new this month" figures count from the first of the month.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+from beacon.caching import LoadingCache
+
+# Owners whose summaries are kept; the least recently read are dropped first
+MAX_CACHED_SUMMARIES = 10_000
+
+PatientSummary = namedtuple(
+    'PatientSummary', ['active', 'new_this_month', 'adherence', 'adherence_change']
+)
+ProviderSummary = namedtuple(
+    'ProviderSummary',
+    ['active_patients', 'new_patients', 'active_prescriptions', 'engagement'],
+)
+
+
+def _percent(value):
+    return None if value is None else round(value)
+
+
+def load_patient(repo, patient, month):
+    figures = repo.patient_summary(patient, month)
+    this_month, last_month = figures['this_month'], figures['last_month']
+    change = None if this_month is None or last_month is None else round(this_month - last_month)
+    return PatientSummary(
+        figures['active'], figures['new_this_month'], _percent(figures['adherence']),
+        change,
+    )
+
+
+def load_provider(repo, provider, month):
+    figures = repo.provider_summary(provider, month)
+    return ProviderSummary(
+        figures['active_patients'], figures['new_patients'], figures['active_prescriptions'],
+        _percent(figures['engagement']),
+    )
+
+
+LOADERS = {'patient': load_patient, 'provider': load_provider}
+
+
+class SummaryCache:
+    def __init__(self, repo, max_entries=MAX_CACHED_SUMMARIES):
+        self.repo = repo
+        # Entries are (month, summary)
+        self._summaries = LoadingCache('summaries', max_entries)
+
+    def get(self, kind, owner, now=None):
+        """Summary of a ``'patient'`` or ``'provider'``, loaded on first read."""
+        month = (now or datetime.now()).date().replace(day=1)
+        return self._summaries.get(
+            (kind, owner), lambda: (month, LOADERS[kind](self.repo, owner, month)),
+            fresh=lambda entry: entry[0] == month,
+        )[1]
+
+    def invalidate(self, *keys):
+        """Drop the summaries of ``(kind, owner)`` keys after a write to their data."""
+        self._summaries.invalidate(*keys)
+
+    def clear(self):
+        self._summaries.clear()
@@ -0,0 +1,221 @@
+"""Synthetic data for seeding a repository at realistic scale.
+
+Run as a script to fill a database and time the dashboard queries against it::
+
+    python -m beacon.synthetic --url sqlite:///bench.db --prescriptions 1000000
+
+Rows are generated lazily, so seeding a million prescriptions never holds them
+all in memory at once.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from beacon.repository import PATIENT_STATUSES, open_repository
+
+CATEGORIES = [
+    'Mental Health', 'Chronic Disease', 'Sleep', 'Cardiology', 'Respiratory',
+    'Pain Management', 'Substance Use', 'Physical Therapy', 'Nutrition',
+]
+FDA_STATUSES = ['FDA Cleared', 'FDA Registered', 'Pending']
+FEATURES = [
+    'Daily Mood Tracking', 'AI Therapy Sessions', 'Crisis Support', 'Progress Analytics',
+    'Glucose Monitoring', 'Medication Reminders', 'Diet Tracking', 'Doctor Connect',
+    'Sleep Analysis', 'Relaxation Exercises', 'Smart Alarm', 'Sleep Scores',
+    'Wearable Sync', 'Symptom Journal', 'Care Team Chat', 'Guided Breathing',
+]
+FIRST_NAMES = [
+    'John', 'Sarah', 'Michael', 'Emily', 'David', 'Priya', 'Carlos', 'Aisha',
+    'Wei', 'Olivia', 'Noah', 'Fatima', 'Liam', 'Sofia', 'Mateo', 'Hana',
+]
+LAST_NAMES = [
+    'Davis', 'Chen', 'Brown', 'Smith', 'Wilson', 'Patel', 'Garcia', 'Khan',
+    'Nguyen', 'Johnson', 'Lee', 'Martinez', 'Okafor', 'Rossi', 'Kim', 'Silva',
+]
+STATUSES = ['Active', 'Active', 'Active', 'Completed', 'Paused']
+CONDITIONS = [
+    'Type 2 Diabetes', 'Anxiety', 'Depression', 'Hypertension', 'Insomnia',
+    'Asthma', 'COPD', 'Chronic Pain', 'Obesity', 'Heart Failure',
+]
+
+
+def person_name(index):
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return f"{first} {last} #{index}"
+
+
+def provider_name(index):
+    return f"Dr. {person_name(index)}"
+
+
+def generate_apps(count, seed=0):
+    rng = random.Random(seed)
+    for app_id in range(1, count + 1):
+        category = rng.choice(CATEGORIES)
+        yield {
+            'id': app_id,
+            'name': f"{category.split()[0]}App {app_id}",
+            'category': category,
+            'description': f"Digital therapy for {category.lower()} (synthetic #{app_id})",
+            'features': rng.sample(FEATURES, 4),
+            'clinical_score': round(rng.uniform(3.0, 5.0), 1),
+            'ux_score': round(rng.uniform(3.0, 5.0), 1),
+            'security_score': round(rng.uniform(3.0, 5.0), 1),
+            'integration_score': round(rng.uniform(3.0, 5.0), 1),
+            'fda_status': rng.choice(FDA_STATUSES),
+            'testimonial': "Synthetic testimonial.",
+            'active_users': rng.randint(100, 50_000),
+            'success_rate': rng.randint(60, 98),
+        }
+
+
+def generate_patients(count, providers, seed=0):
+    rng = random.Random(seed)
+    for index in range(count):
+        yield (
+            index + 1,
+            f"BH-{index + 1:06d}",
+            person_name(index),
+            rng.randint(18, 90),
+            rng.choice(CONDITIONS),
+            rng.choice(PATIENT_STATUSES),
+            rng.randint(40, 100),
+            # Patients are spread evenly so every provider has a panel to search
+            provider_name(index % providers),
+        )
+
+
+def generate_prescriptions(count, app_names, patients, providers, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now()
+    for prescription_id in range(1, count + 1):
+        prescribed = now - timedelta(days=rng.randint(0, 3 * 365))
+        # Tuples in PRESCRIPTION_COLUMNS order skip the per-row dict lookup on load
+        yield (
+            prescription_id,
+            rng.choice(app_names),
+            provider_name(rng.randrange(providers)),
+            person_name(rng.randrange(patients)),
+            rng.choice(STATUSES),
+            prescribed,
+            prescribed + timedelta(days=rng.randint(7, 120)),
+            rng.randint(40, 100),
+            'Synthetic progress note',
+        )
+
+
+def generate_checkins(prescriptions, app_names, patients, providers, seed=0):
+    """Daily check-ins from the prescribed date until today for the first ``prescriptions``."""
+    rng = random.Random(seed)
+    today = datetime.now().date()
+    # Replaying the prescription stream recovers each one's date and rate
+    for row in generate_prescriptions(prescriptions, app_names, patients, providers, seed):
+        prescription_id, day, rate = row[0], row[5].date(), row[7]
+        while day < today:
+            yield prescription_id, day, rng.randrange(100) < rate
+            day += timedelta(days=1)
+
+
+def generate_messages(count, app_names, patients, providers, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now()
+    for message_id in range(1, count + 1):
+        yield (
+            message_id,
+            person_name(rng.randrange(patients)),
+            provider_name(rng.randrange(providers)),
+            'Synthetic check-in message',
+            rng.choice(app_names),
+            now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60)),
+            rng.random() < 0.7,
+        )
+
+
+def seed_repository(repo, apps=1_000, prescriptions=1_000_000, messages=200_000,
+                    patients=50_000, providers=500, seed=0, checkin_history=100):
+    app_names = [app['name'] for app in generate_apps(apps, seed)]
+    counts = {
+        'apps': repo.bulk_load('apps', generate_apps(apps, seed)),
+        'prescriptions': repo.bulk_load(
+            'prescriptions',
+            generate_prescriptions(prescriptions, app_names, patients, providers, seed),
+        ),
+        'messages': repo.bulk_load(
+            'messages', generate_messages(messages, app_names, patients, providers, seed)
+        ),
+        'patients': repo.bulk_load('patients', generate_patients(patients, providers, seed)),
+        'checkins': repo.record_checkins(generate_checkins(
+            min(checkin_history, prescriptions), app_names, patients, providers, seed
+        )),
+    }
+    repo.refresh_rollups()
+    return counts
+
+
+def measure_queries(repo, patients, providers, samples=200, seed=1, checkin_history=100):
+    """Time the per-dashboard queries and return p50/p95 latencies in ms."""
+    rng = random.Random(seed)
+    queries = {
+        'prescriptions_for_patient':
+            lambda: repo.prescriptions_for_patient(person_name(rng.randrange(patients)), 50),
+        'prescriptions_for_provider':
+            lambda: repo.prescriptions_for_provider(provider_name(rng.randrange(providers)), 50),
+        'inbox_entries':
+            lambda: list(repo.inbox_entries(person_name(rng.randrange(patients)))),
+        'reviews_due':
+            lambda: repo.reviews_due(datetime.now() + timedelta(days=7), 50),
+        'adherence_history':
+            lambda: repo.adherence_history(
+                rng.randint(1, max(1, checkin_history)), 'week', datetime.now() - timedelta(days=365)
+            ),
+        'search_patients':
+            lambda: repo.search_patients(
+                provider_name(rng.randrange(providers)), rng.choice(FIRST_NAMES)[:4], limit=20
+            ),
+    }
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = (timings[len(timings) // 2], timings[int(len(timings) * 0.95)])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='sqlite:///beacon-synthetic.db')
+    parser.add_argument('--apps', type=int, default=1_000)
+    parser.add_argument('--prescriptions', type=int, default=1_000_000)
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--patients', type=int, default=50_000)
+    parser.add_argument('--providers', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkin-history', type=int, default=100,
+                        help="prescriptions given a daily check-in history")
+    parser.add_argument('--skip-seed', action='store_true', help="only run the latency checks")
+    args = parser.parse_args()
+
+    repo = open_repository(args.url)
+    if not args.skip_seed:
+        start = time.perf_counter()
+        counts = seed_repository(
+            repo, args.apps, args.prescriptions, args.messages,
+            args.patients, args.providers, args.seed, args.checkin_history,
+        )
+        print(f"Seeded {counts} in {time.perf_counter() - start:.1f}s")
+    latencies = measure_queries(
+        repo, args.patients, args.providers, checkin_history=args.checkin_history
+    )
+    for name, (p50, p95) in latencies.items():
+        print(f"{name:<28} p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+    repo.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Precompiled HTML card templates with per-record memoization.
+
+Each template's markup is prepared once at import. A rendered card is cached
+under ``(record id, record version)``, where the version is whatever changes
+the record (the catalog version for apps, the read state for messages), so on
+a rerun an unchanged card costs one dictionary lookup, whatever else was
+written meanwhile. Every record field is HTML-escaped before it is
+substituted, because the cards go through ``unsafe_allow_html`` and fields
+like message content are user-supplied.
+"""
+import html
+import string
+import threading
+from collections import OrderedDict
+
+from beacon import metrics
+
+# Rendered cards kept per template; the least recently used are dropped first
+MAX_CACHED_CARDS = 4096
+
+
+class Markup(str):
+    """Trusted markup built from escaped parts; substituted without escaping."""
+
+
+class CardTemplate:
+    def __init__(self, markup, max_entries=MAX_CACHED_CARDS):
+        self.template = string.Template(markup)
+        self.max_entries = max_entries
+        self._rendered = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, record_id, version, fields):
+        """Markup for one record; ``fields()`` is only called on a cache miss.
+
+        ``fields`` returns the substitutions as raw text, which is escaped here.
+        Values already wrapped in ``Markup`` are inserted as-is.
+        """
+        key = (record_id, version)
+        metrics.CACHE_REQUESTS.inc(cache='cards')
+        with self._lock:
+            rendered = self._rendered.get(key)
+            if rendered is not None:
+                self._rendered.move_to_end(key)
+                return rendered
+        metrics.CACHE_MISSES.inc(cache='cards')
+        rendered = self.template.substitute({
+            name: value if isinstance(value, Markup) else html.escape(str(value))
+            for name, value in fields().items()
+        })
+        with self._lock:
+            self._rendered[key] = rendered
+            while len(self._rendered) > self.max_entries:
+                self._rendered.popitem(last=False)
+        return rendered
+
+
+def _badges(values):
+    return Markup(''.join(
+        f'<span class="feature-badge">{html.escape(str(value))}</span>' for value in values
+    ))
+
+
+APP_CARD = CardTemplate("""
+    <div class="card">
+        <div style="display: flex; justify-content: space-between; align-items: center;">
+            <h3>$name $icon</h3>
+            <div class="status-badge status-active">$fda_status</div>
+        </div>
+        <p style="color: #666; margin-bottom: 1rem;">$category</p>
+        <p>$description</p>
+        <div style="margin-top: 1rem;">
+            $badges
+        </div>
+    </div>
+""")
+
+# (label, app column) of the scores drawn as bars on each app card
+SCORES = [
+    ('Clinical', 'clinical_score'),
+    ('UX', 'ux_score'),
+    ('Security', 'security_score'),
+    ('Integration', 'integration_score'),
+]
+
+SCORE_BARS = CardTemplate("""
+    <div class="score-bars">$bars</div>
+""")
+
+SUCCESS_RATE = CardTemplate("""
+    <div class="metric-container">
+        <div class="big-number">$success_rate</div>
+        <div class="metric-label">Success Rate</div>
+    </div>
+""")
+
+PRESCRIPTION_SUMMARY = CardTemplate("""
+    <div style="padding: 1rem; background: linear-gradient(135deg, #F8F9FE 0%, #E8EAF6 100%); border-radius: 10px;">
+        <h4>$description</h4>
+        <p>Prescribed: $prescribed_date</p>
+        <p>Next Review: $next_review</p>
+        <div style="margin-top: 1rem;">
+            <span style="color: #4CAF50;">●</span> $progress_notes
+        </div>
+    </div>
+""")
+
+MESSAGE_CARD = CardTemplate("""
+    <div class="message-card" style="border-left-color: $border">
+        <div style="display: flex; justify-content: space-between; align-items: center;">
+            <h4>$sender</h4>
+            <small>$date</small>
+        </div>
+        <p>$content</p>
+        <div style="display: flex; gap: 10px; margin-top: 10px;">
+            <span class="feature-badge">$app</span>
+            <span class="status-badge status-$state">$label</span>
+        </div>
+    </div>
+""")
+
+
+def app_card(app, version):
+    return APP_CARD.render(app['id'], version, lambda: {
+        'name': app['name'],
+        'icon': '✨' if app['fda_status'] == 'FDA Cleared' else '🔄',
+        'fda_status': app['fda_status'],
+        'category': app['category'],
+        'description': app['description'],
+        'badges': _badges(app['features']),
+    })
+
+
+def _score_bars(app):
+    # schema loads pandas, which only catalog cards (drawn from a frame) need
+    from beacon.schema import MAX_SCORE
+
+    return Markup(''.join(
+        f'<div class="score-row"><span>{label}</span>'
+        f'<div class="score-track"><div class="score-fill" style="width: '
+        f'{min(float(app[column]) / MAX_SCORE, 1) * 100:.0f}%"></div></div>'
+        f'<b>{float(app[column]):.1f}</b></div>'
+        for label, column in SCORES
+    ))
+
+
+def score_bars(app, version):
+    """Inline CSS bars for the app's scores, in place of a per-card chart."""
+    return SCORE_BARS.render(app['id'], version, lambda: {'bars': _score_bars(app)})
+
+
+def success_rate(app, version):
+    from beacon.schema import format_success_rate
+
+    return SUCCESS_RATE.render(app['id'], version, lambda: {
+        'success_rate': format_success_rate(app['success_rate']),
+    })
+
+
+def prescription_summary(prescription, catalog_version):
+    # The description comes from the catalog, which an import can change; of the
+    # prescription's own fields only next_review changes once prescribed
+    version = (catalog_version, prescription['next_review'])
+    return PRESCRIPTION_SUMMARY.render(prescription['id'], version, lambda: {
+        'description': prescription['description'],
+        'prescribed_date': prescription['prescribed_date'].strftime('%Y-%m-%d'),
+        'next_review': prescription['next_review'].strftime('%Y-%m-%d'),
+        'progress_notes': prescription['progress_notes'],
+    })
+
+
+def message_card(message):
+    # A message only changes when it is read
+    return MESSAGE_CARD.render(message['id'], bool(message['read']), lambda: {
+        'border': '#4CAF50' if message['read'] else '#FF9800',
+        'sender': message['sender'],
+        'date': message['date'].strftime('%Y-%m-%d %H:%M'),
+        'content': message['content'],
+        'app': message['app'] if isinstance(message['app'], str) and message['app'] else 'General',
+        'state': 'active' if message['read'] else 'pending',
+        'label': 'Read' if message['read'] else 'New',
+    })
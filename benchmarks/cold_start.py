@@ -0,0 +1,122 @@
+"""Cold-start and per-rerun payload of the app served by ``streamlit run``.
+
+Seeds a synthetic SQLite database, then for each of ``--runs`` trials starts
+a fresh ``streamlit run`` process, opens the app websocket the way a browser
+does and records:
+
+* first paint: time from requesting the first run to the first element
+* first run: time until the worker reports that run finished
+* first run / rerun KiB: bytes of the messages sent for the first run and
+  for the next rerun of the same page
+
+Each trial starts a new process, so its first run pays for every import,
+cache fill and index build the page needs.
+
+    python benchmarks/cold_start.py --apps 100000 --runs 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from beacon.repository import open_repository  # noqa: E402
+from beacon.synthetic import person_name, seed_repository  # noqa: E402
+
+DATASET = dict(apps=1_000, prescriptions=10_000, messages=10_000, patients=1_000, providers=10)
+
+
+def wait_until_healthy(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"app on port {port} did not start")
+            time.sleep(0.1)
+
+
+async def run_page(socket, query_string):
+    """``(seconds to first element, seconds to finish, bytes received)`` of one run."""
+    message = BackMsg()
+    message.rerun_script.query_string = query_string
+    message.rerun_script.page_script_hash = ''
+    started = time.perf_counter()
+    await socket.send(message.SerializeToString())
+    first_paint, received = None, 0
+    while True:
+        data = await socket.recv()
+        received += len(data)
+        forward = ForwardMsg()
+        forward.ParseFromString(data)
+        kind = forward.WhichOneof('type')
+        if kind == 'delta' and first_paint is None:
+            first_paint = time.perf_counter() - started
+        if kind == 'script_finished':
+            return first_paint, time.perf_counter() - started, received
+
+
+async def trial(port, query_string):
+    async with websockets.connect(
+        f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'], max_size=None
+    ) as socket:
+        first_paint, first_run, first_bytes = await run_page(socket, query_string)
+        _, _, rerun_bytes = await run_page(socket, query_string)
+    return first_paint, first_run, first_bytes, rerun_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apps', type=int, default=DATASET['apps'], help="catalog size")
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes to time")
+    parser.add_argument('--port', type=int, default=8611)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f'sqlite:///{tmp}/cold_start.db'
+        repo = open_repository(url)
+        seed_repository(repo, seed=0, **dict(DATASET, apps=args.apps))
+        repo.close()
+        env = dict(os.environ, BEACON_DATABASE_URL=url)
+        query_string = f'patient={person_name(0)}'
+
+        results = []
+        for _ in range(args.runs):
+            app = subprocess.Popen(
+                [sys.executable, '-m', 'streamlit', 'run', str(ROOT / 'streamlit_app.py'),
+                 '--server.port', str(args.port), '--server.headless', 'true'],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_until_healthy(args.port)
+                results.append(asyncio.run(trial(args.port, query_string)))
+            finally:
+                app.terminate()
+                app.wait()
+
+    first_paint, first_run, first_bytes, rerun_bytes = (
+        statistics.median(column) for column in zip(*results)
+    )
+    print(f"{args.apps} apps, median of {args.runs} fresh processes")
+    print(f"  first paint    {first_paint * 1000:7.0f} ms")
+    print(f"  first run      {first_run * 1000:7.0f} ms")
+    print(f"  first run      {first_bytes / 1024:7.1f} KiB")
+    print(f"  rerun          {rerun_bytes / 1024:7.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Compare full-script reruns with fragment-scoped reruns on a large inbox.
+
+Before fragments, sending a message or pressing any button re-executed the
+whole script. With ``show_messages`` as an ``st.fragment`` only that function
+reruns. AppTest always drives full script runs, so the fragment case is timed
+by running a script that calls nothing but the fragment function, which is
+exactly the work Streamlit does for a fragment rerun.
+
+    python benchmarks/fragment_reruns.py --messages 5000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from beacon import demo_data  # noqa: E402
+from beacon.repository import open_repository  # noqa: E402
+
+FRAGMENT_SCRIPT = f"""
+import sys
+sys.path.insert(0, {str(ROOT)!r})
+import streamlit_app
+streamlit_app.show_messages({demo_data.DEMO_PATIENT!r})
+"""
+
+
+def seed_inbox(url, count):
+    repo = open_repository(url)
+    repo.seed(demo_data.APPS, demo_data.prescriptions(), demo_data.messages(), demo_data.PATIENTS)
+    now = datetime.now()
+    repo.bulk_load('messages', (
+        {
+            'recipient': demo_data.DEMO_PATIENT,
+            'sender': 'Dr. Smith',
+            'content': f'Check-in #{i}: how is the new routine going?',
+            'app': 'DiabetesGuard',
+            'date': now - timedelta(minutes=i),
+            'read': i % 3 == 0,
+        }
+        for i in range(count)
+    ))
+    repo.close()
+
+
+def time_runs(app_test, runs, state=None):
+    app_test.run()  # warm caches and imports
+    timings = []
+    for _ in range(runs):
+        # Applied before every run, as AppTest reports the first tab selected
+        for key, value in (state or {}).items():
+            app_test.session_state[key] = value
+        start = time.perf_counter()
+        app_test.run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2_000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['BEACON_DATABASE_URL'] = f"sqlite:///{tmp}/inbox.db"
+        seed_inbox(os.environ['BEACON_DATABASE_URL'], args.messages)
+
+        full = AppTest.from_file(str(ROOT / 'streamlit_app.py'), default_timeout=600)
+        fragment = AppTest.from_string(FRAGMENT_SCRIPT, default_timeout=600)
+        full_ms = time_runs(full, args.runs, {'patient_tab': "💌 Messages"})
+        fragment_ms = time_runs(fragment, args.runs)
+
+    print(f"inbox size: {args.messages + len(demo_data.messages())} messages")
+    print(f"full script rerun (before): {full_ms:8.1f} ms  ({len(full.markdown)} markdown elements)")
+    print(f"messages fragment rerun:    {fragment_ms:8.1f} ms  ({len(fragment.markdown)} markdown elements)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Latency of live updates pushed to open sessions, and how many sessions wake.
+
+Seeds a synthetic SQLite database, starts ``python -m beacon.serve`` on it
+and opens ``--sessions`` patient sessions the way browsers do, each on its
+own synthetic patient's My Apps tab. Then, ``--writes`` times, this process
+prescribes an app to one of those patients or sends them a message, through
+``store`` like any other worker, and times how long the write takes to reach
+the patient's open session as a fragment rerun. It also counts the runs
+every other session made meanwhile, which should be none.
+
+    python benchmarks/live_updates.py --workers 2 --sessions 20 --writes 40
+
+The write is made in another process than the sessions' workers, so every
+push crosses processes through the change log and the workers' listeners.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+from streamlit import logger
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from beacon.repository import open_repository  # noqa: E402
+from beacon.synthetic import person_name, provider_name, seed_repository  # noqa: E402
+
+DATASET = dict(apps=1_000, prescriptions=10_000, messages=10_000, patients=1_000, providers=10)
+
+# Seconds to wait for a push before counting it as missed
+PUSH_TIMEOUT = 10
+
+
+def wait_until_healthy(ports, timeout=60):
+    deadline = time.monotonic() + timeout
+    for port in ports:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"worker on port {port} did not start")
+                time.sleep(0.2)
+
+
+class Session:
+    def __init__(self, patient):
+        self.patient = patient
+        self.runs = 0
+        self.finished = asyncio.Event()
+
+    async def open(self, port):
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=10) as response:
+            cookie = '; '.join(
+                header.split(';')[0] for header in response.headers.get_all('Set-Cookie', [])
+            )
+        self.socket = await websockets.connect(
+            f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'],
+            additional_headers={'Cookie': cookie}, max_size=None,
+        )
+        message = BackMsg()
+        message.rerun_script.query_string = f'patient={self.patient}'
+        message.rerun_script.page_script_hash = ''
+        await self.socket.send(message.SerializeToString())
+        self.reader = asyncio.create_task(self._read())
+        await asyncio.wait_for(self.finished.wait(), 60)
+
+    async def _read(self):
+        async for data in self.socket:
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            if forward.WhichOneof('type') == 'script_finished':
+                self.runs += 1
+                self.finished.set()
+
+    async def close(self):
+        self.reader.cancel()
+        await self.socket.close()
+
+
+def write(kind, patient, provider, app_name):
+    from beacon import store
+
+    if kind == 'prescription':
+        written, _ = store.prescribe(provider, app_name, [patient])
+        return bool(written)
+    store.send_message(provider, patient, "How are you getting on?", notify=False)
+    return True
+
+
+async def drive(port, patients, provider, app_names, writes, seed):
+    sessions = [Session(patient) for patient in patients]
+    for session in sessions:
+        await session.open(port)
+    await asyncio.sleep(1)
+    rng = random.Random(seed)
+    latencies, missed, woken = {'prescription': [], 'message': []}, 0, 0
+    for index in range(writes):
+        kind = ('prescription', 'message')[index % 2]
+        target = rng.choice(sessions)
+        runs = {session: session.runs for session in sessions}
+        target.finished.clear()
+        started = time.perf_counter()
+        if not write(kind, target.patient, provider, app_names[index]):
+            continue
+        try:
+            await asyncio.wait_for(target.finished.wait(), PUSH_TIMEOUT)
+            latencies[kind].append(time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            missed += 1
+        # Leave time for any stray push to land before counting the others
+        await asyncio.sleep(0.5)
+        woken += sum(
+            session.runs > runs[session] for session in sessions if session is not target
+        )
+    for session in sessions:
+        await session.close()
+    return latencies, missed, woken
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--writes', type=int, default=40)
+    parser.add_argument('--port', type=int, default=8701)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f'sqlite:///{tmp}/live.db'
+        repo = open_repository(url)
+        seed_repository(repo, seed=0, **DATASET)
+        repo.close()
+        env = dict(os.environ, BEACON_DATABASE_URL=url, PYTHONPATH=str(ROOT))
+        os.environ['BEACON_DATABASE_URL'] = url
+        # This process writes through ``store`` outside a Streamlit server
+        logger.set_log_level('error')
+        from beacon import store
+
+        names = list(store.get_catalog().apps['name'])
+        random.Random(args.seed).shuffle(names)
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'beacon.serve', '--workers', str(args.workers),
+             '--port', str(args.port), '--address', '127.0.0.1', '--snapshot-dir', tmp],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_healthy([args.port + 1 + index for index in range(args.workers)])
+            patients = [person_name(index) for index in range(args.sessions)]
+            latencies, missed, woken = asyncio.run(drive(
+                args.port, patients, provider_name(0), names, args.writes, args.seed
+            ))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{os.cpu_count()} CPU(s), {args.workers} worker(s), {args.sessions} open sessions")
+    for kind, values in latencies.items():
+        if values:
+            values.sort()
+            print(
+                f"{kind:>12}: {len(values)} pushed  p50 {1000 * statistics.median(values):6.1f} ms"
+                f"  p95 {1000 * values[int(0.95 * (len(values) - 1))]:6.1f} ms"
+            )
+    print(f"missed pushes: {missed}  other sessions woken: {woken}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""Headless rerun benchmarks for every role and tab, driven through AppTest.
+
+Each dataset size seeds a fresh SQLite database with synthetic apps,
+prescriptions, messages and patients. The sessions point at a synthetic
+patient and provider (via the ``?patient=`` / ``?provider=`` query
+parameters), so their per-user load grows with the dataset. Every scenario
+then replays one scripted interaction and records:
+
+* best and median rerun wall time over ``--runs`` reruns (regressions are
+  judged on the best, which is the least sensitive to a noisy machine)
+* peak Python heap allocated during one rerun (tracemalloc, measured in a
+  separate rerun so tracing does not skew the timings)
+* the number of elements the rerun rendered
+
+Results are compared against ``baselines.json`` next to this file::
+
+    python benchmarks/reruns.py --sizes small,1k              # report only
+    python benchmarks/reruns.py --sizes small,1k --compare    # exit 1 on regression
+    python benchmarks/reruns.py --sizes small,1k,100k --update-baseline
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from beacon.repository import open_repository  # noqa: E402
+from beacon.synthetic import person_name, provider_name, seed_repository  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baselines.json'
+
+# Rows per table, and how many patients/providers share them (which sets the
+# load on the benchmarked patient and provider)
+SIZES = {
+    'small': dict(apps=10, prescriptions=10, messages=10, patients=5, providers=2),
+    '1k': dict(apps=1_000, prescriptions=1_000, messages=1_000, patients=100, providers=10),
+    '100k': dict(
+        apps=100_000, prescriptions=100_000, messages=100_000, patients=1_000, providers=10
+    ),
+}
+
+ROLES = {'patient': "👤 Patient", 'provider': "👩‍⚕️ Provider", 'admin': "⚙️ Admin"}
+
+# Session state key of each role's tabs; only the open tab is built
+TAB_KEYS = {'patient': 'patient_tab', 'provider': 'provider_tab', 'admin': 'admin_tab'}
+
+
+def _click_if_enabled(key):
+    def interact(at):
+        button = at.button(key=key)
+        if not button.disabled:
+            button.click()
+    return interact
+
+
+def _prescription_button(at, prefix):
+    # The first prescription card's button; keys end in the prescription id
+    return next(button for button in at.button if (button.key or '').startswith(prefix))
+
+
+def _check_in(at):
+    # The first click records today; later ones hit "already checked in"
+    _prescription_button(at, 'checkin_').click()
+
+
+def _view_progress(at):
+    # Open the progress chart once and keep it open, rather than toggling it
+    button = _prescription_button(at, 'progress_')
+    key = f"progress_open_{button.key.removeprefix('progress_')}"
+    if key not in at.session_state or not at.session_state[key]:
+        button.click()
+
+
+def _send_message(at):
+    at.text_area[0].input("Benchmark check-in")
+    at.button[[b.label for b in at.button].index("Send Message")].click()
+
+
+# (scenario name, role, open tab or None for the first, interaction applied
+# before each timed rerun)
+SCENARIOS = [
+    ('patient.rerun', 'patient', None, lambda at: None),
+    ('patient.check_in', 'patient', "📱 My Apps", _check_in),
+    ('patient.view_progress', 'patient', "📱 My Apps", _view_progress),
+    ('patient.discover_search', 'patient', "🔍 Discover",
+     lambda at: at.text_input(key='discover_query').input('sleep')),
+    ('patient.discover_filter', 'patient', "🔍 Discover",
+     lambda at: at.selectbox(key='discover_category').select_index(1)),
+    ('patient.discover_next_page', 'patient', "🔍 Discover", _click_if_enabled('discover_next')),
+    ('patient.send_message', 'patient', "💌 Messages", _send_message),
+    ('provider.rerun', 'provider', None, lambda at: None),
+    ('provider.patient_search', 'provider', None,
+     lambda at: at.text_input(key='patient_query').input('john')),
+    ('provider.patient_filter', 'provider', None,
+     lambda at: at.selectbox(key='patient_status').select('Active')),
+    ('provider.library_next_page', 'provider', "📱 Prescribe Apps",
+     _click_if_enabled('library_next')),
+    ('provider.analytics_daily', 'provider', "📊 Analytics",
+     lambda at: at.radio(key='analytics_granularity').set_value('day')),
+    ('admin.rerun', 'admin', None, lambda at: None),
+    ('admin.caches', 'admin', "🗄️ Caches", lambda at: None),
+    ('admin.prometheus', 'admin', "📤 Prometheus", lambda at: None),
+    ('admin.library', 'admin', "📚 Library",
+     lambda at: at.selectbox(key='catalog_export_format').select_index(1)),
+]
+
+
+def seed_dataset(url, size):
+    repo = open_repository(url)
+    seed_repository(repo, seed=0, **SIZES[size])
+    repo.close()
+
+
+def count_elements(node):
+    children = getattr(node, 'children', None)
+    if children is None:
+        return 1
+    return sum(count_elements(child) for child in children.values())
+
+
+def open_tab(at, role, tab):
+    # AppTest reports the first tab as selected on every run, so the tab is
+    # chosen again through session state before each one
+    if tab is not None:
+        at.session_state[TAB_KEYS[role]] = tab
+
+
+def start_session(role, tab=None):
+    at = AppTest.from_file(str(ROOT / 'streamlit_app.py'), default_timeout=600)
+    at.query_params['patient'] = person_name(0)
+    at.query_params['provider'] = provider_name(0)
+    at.run()
+    open_tab(at, role, tab)
+    at.selectbox(key='role_selector').select(ROLES[role]).run()
+    return at
+
+
+def run_scenario(role, tab, interact, runs):
+    at = start_session(role, tab)
+    timings = []
+    for _ in range(runs):
+        open_tab(at, role, tab)
+        interact(at)
+        # Keep collections of earlier scenarios' garbage out of the timing
+        gc.collect()
+        start = time.perf_counter()
+        at.run()
+        timings.append((time.perf_counter() - start) * 1000)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    open_tab(at, role, tab)
+    interact(at)
+    tracemalloc.start()
+    try:
+        at.run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'best_ms': round(min(timings), 1),
+        'median_ms': round(statistics.median(timings), 1),
+        'peak_kib': round(peak / 1024),
+        'elements': count_elements(at.main) + count_elements(at.sidebar),
+    }
+
+
+def run_size(size, runs, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['BEACON_DATABASE_URL'] = f"sqlite:///{tmp}/{size}.db"
+        seed_dataset(os.environ['BEACON_DATABASE_URL'], size)
+        # Repositories and catalogs are process-wide caches; start each dataset cold
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        for name, role, tab, interact in SCENARIOS:
+            if only and not name.startswith(only):
+                continue
+            results[f"{size}/{name}"] = run_scenario(role, tab, interact, runs)
+            print(f"{size:>6}  {name:<30} {results[f'{size}/{name}']}", flush=True)
+    return results
+
+
+def compare(results, baselines, tolerance):
+    """Scenarios slower, heavier or larger than their baseline beyond ``tolerance``."""
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        for metric, slack in (('best_ms', tolerance), ('peak_kib', tolerance), ('elements', 0)):
+            limit = baseline[metric] * (1 + slack)
+            if result[metric] > limit:
+                regressions.append(
+                    f"{name}: {metric} {result[metric]} > baseline {baseline[metric]}"
+                    f" (+{slack:.0%} allowed)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='small,1k', help="comma-separated: " + ','.join(SIZES))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--only', help="run scenarios whose name starts with this prefix")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="allowed relative slowdown / memory growth before failing")
+    parser.add_argument('--compare', action='store_true', help="fail on regressions vs baseline")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes.split(','):
+        results.update(run_size(size, args.runs, args.only))
+
+    baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    if args.update_baseline:
+        baselines.update(results)
+        BASELINE_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+        print(f"Updated {BASELINE_PATH.name} with {len(results)} scenarios")
+    if args.compare:
+        regressions = compare(results, baselines, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
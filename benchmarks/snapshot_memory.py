@@ -0,0 +1,101 @@
+"""Per-process memory (PSS) of the catalog with and without shared snapshots.
+
+Seeds a synthetic SQLite database, then starts ``--processes`` worker-like
+processes at once. Each loads the catalog through ``store`` and builds what
+Discover uses: the search index and the ranking. Once all of them hold it,
+their proportional set size is read, which counts pages the processes share
+(the mapped snapshot files) once between them. The same is then done with
+``BEACON_SNAPSHOT_DIR`` unset, so every process builds its own copy.
+
+    python benchmarks/snapshot_memory.py --apps 100000 --processes 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from beacon import snapshots  # noqa: E402
+from beacon.repository import open_repository  # noqa: E402
+from beacon.synthetic import seed_repository  # noqa: E402
+
+DATASET = dict(apps=100_000, prescriptions=1_000, messages=100, patients=100, providers=5)
+
+
+def pss_mb(pid):
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines():
+        if line.startswith('Pss:'):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def child():
+    from streamlit import logger
+
+    logger.set_log_level('error')
+    from beacon import ranking, store
+
+    started = time.perf_counter()
+    catalog = store.get_catalog()
+    catalog.search.search('he')
+    catalog.ranking.order(ranking.normalize(ranking.DEFAULT_WEIGHTS))[:20]
+    print(f'{time.perf_counter() - started:.3f}', flush=True)
+    # Hold the catalog until the parent has read this process's memory
+    sys.stdin.read()
+
+
+def measure(processes, env):
+    # One process first, so the others find the snapshot written, as workers would
+    children, seconds = [], []
+    for _ in range(processes):
+        process = subprocess.Popen(
+            [sys.executable, __file__, '--child'], cwd=ROOT, env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        seconds.append(float(process.stdout.readline()))
+        children.append(process)
+    sizes = [pss_mb(process.pid) for process in children]
+    for process in children:
+        process.stdin.close()
+        process.wait()
+    return sizes, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apps', type=int, default=DATASET['apps'], help="catalog size")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f'sqlite:///{tmp}/catalog.db'
+        repo = open_repository(url)
+        seed_repository(repo, seed=0, **dict(DATASET, apps=args.apps))
+        repo.close()
+        env = dict(os.environ, BEACON_DATABASE_URL=url, PYTHONPATH=str(ROOT))
+        env.pop(snapshots.SNAPSHOT_DIR_ENV, None)
+        runs = {'own copies': measure(args.processes, env)}
+        snapshot_dir = os.path.join(tmp, 'snapshots')
+        os.mkdir(snapshot_dir)
+        env[snapshots.SNAPSHOT_DIR_ENV] = snapshot_dir
+        runs['snapshots'] = measure(args.processes, env)
+
+    print(f"{args.apps} apps, {args.processes} processes")
+    for label, (sizes, seconds) in runs.items():
+        print(
+            f"{label:>11}: PSS MB [{', '.join(f'{size:.0f}' for size in sizes)}]"
+            f"  total {sum(sizes):.0f}"
+            f"  catalog ready s [{', '.join(f'{value:.2f}' for value in seconds)}]"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Rerun throughput of ``beacon.serve`` with 1, 2, 4... worker processes.
+
+Seeds a synthetic SQLite database, then for each worker count starts
+``python -m beacon.serve`` on it and drives ``--sessions`` concurrent
+browser-like sessions through the proxy for ``--duration`` seconds. Each
+session loads the page (picking up its worker cookie), opens the app
+websocket and requests back-to-back reruns as a different synthetic patient,
+timing each until the worker reports the script finished. Reports reruns per
+second, rerun latency and each worker's proportional memory (PSS), which
+counts the catalog snapshot pages the workers share only once between them.
+
+    python benchmarks/workers.py --workers 1,2,4 --sessions 8 --duration 20
+
+Workers only run in parallel on separate cores, so the speedup is bounded by
+``os.cpu_count()``.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from beacon.repository import open_repository  # noqa: E402
+from beacon.synthetic import person_name, seed_repository  # noqa: E402
+
+DATASET = dict(apps=1_000, prescriptions=10_000, messages=10_000, patients=1_000, providers=10)
+
+# Reruns each session makes before timing starts (imports, cache fills)
+WARMUP_RERUNS = 2
+
+
+def wait_until_healthy(ports, timeout=60):
+    deadline = time.monotonic() + timeout
+    for port in ports:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"worker on port {port} did not start")
+                time.sleep(0.2)
+
+
+def worker_pss_mb(pid):
+    """PSS of each child process of ``pid``, in MB."""
+    children = Path(f'/proc/{pid}/task/{pid}/children').read_text().split()
+    sizes = []
+    for child in children:
+        for line in Path(f'/proc/{child}/smaps_rollup').read_text().splitlines():
+            if line.startswith('Pss:'):
+                sizes.append(int(line.split()[1]) / 1024)
+    return sizes
+
+
+async def session(port, index, deadline, latencies):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=10) as response:
+        cookie = '; '.join(
+            header.split(';')[0] for header in response.headers.get_all('Set-Cookie', [])
+        )
+    async with websockets.connect(
+        f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'],
+        additional_headers={'Cookie': cookie}, max_size=None,
+    ) as socket:
+        reruns = 0
+        while time.monotonic() < deadline:
+            message = BackMsg()
+            message.rerun_script.query_string = f'patient={person_name(index)}'
+            message.rerun_script.page_script_hash = ''
+            started = time.perf_counter()
+            await socket.send(message.SerializeToString())
+            while True:
+                forward = ForwardMsg()
+                forward.ParseFromString(await socket.recv())
+                if forward.WhichOneof('type') == 'script_finished':
+                    break
+            reruns += 1
+            if reruns > WARMUP_RERUNS:
+                latencies.append(time.perf_counter() - started)
+
+
+async def drive(port, sessions, duration):
+    latencies = []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(session(port, index, deadline, latencies) for index in range(sessions)))
+    return latencies
+
+
+def run(workers, sessions, duration, port, env, serve_args):
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'beacon.serve', '--workers', str(workers), '--port', str(port),
+         '--address', '127.0.0.1', *serve_args],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_healthy([port + 1 + index for index in range(workers)])
+        started = time.monotonic()
+        latencies = asyncio.run(drive(port, sessions, duration))
+        elapsed = time.monotonic() - started
+        memory = worker_pss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    return {
+        'reruns_per_s': len(latencies) / elapsed,
+        'p50_ms': 1000 * statistics.median(latencies),
+        'p95_ms': 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        'pss_mb': memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help="comma-separated worker counts")
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20, help="seconds per worker count")
+    parser.add_argument('--apps', type=int, default=DATASET['apps'], help="catalog size")
+    parser.add_argument('--port', type=int, default=8601)
+    parser.add_argument('--no-snapshots', action='store_true',
+                        help="have every worker load its own catalog instead of mapping one snapshot")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f'sqlite:///{tmp}/workers.db'
+        repo = open_repository(url)
+        seed_repository(repo, seed=0, **dict(DATASET, apps=args.apps))
+        repo.close()
+        env = dict(os.environ, BEACON_DATABASE_URL=url, PYTHONPATH=str(ROOT))
+        serve_args = ['--no-snapshots'] if args.no_snapshots else ['--snapshot-dir', tmp]
+
+        print(f"{os.cpu_count()} CPU(s), {args.sessions} sessions, {args.duration:g}s per run")
+        baseline = None
+        for workers in [int(count) for count in args.workers.split(',')]:
+            result = run(workers, args.sessions, args.duration, args.port, env, serve_args)
+            baseline = baseline or result['reruns_per_s']
+            pss = ', '.join(f'{size:.0f}' for size in result['pss_mb'])
+            print(
+                f"{workers} worker(s): {result['reruns_per_s']:6.1f} reruns/s "
+                f"(x{result['reruns_per_s'] / baseline:.2f})  p50 {result['p50_ms']:6.1f} ms  "
+                f"p95 {result['p95_ms']:6.1f} ms  worker PSS MB [{pss}]"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,30 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
+import html
+import math
+import os
 import random
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Modules that load pandas are imported in the tabs that use them, so the
+# sidebar and header are on screen before it loads (see ``store``)
+from beacon import metrics, paging, profiling, reviews, store, templates
+
+# Reviews listed per section of the review popovers
+REVIEWS_SHOWN = 10
+
+# Unread messages listed in the notifications popover
+NOTIFICATIONS_SHOWN = 5
+
+THEME_CSS = Path(__file__).parent / "static" / "theme.css"
+
+# Library exports are written here and downloaded through Streamlit's static
+# file server, which streams them from disk instead of holding them in memory
+EXPORT_DIR = Path(__file__).parent / "static" / "exports"
+
+# Largest file the static file server will serve
+STATIC_FILE_LIMIT = 200 * 1024 * 1024
 
 # Page config
 st.set_page_config(
@@ -11,611 +34,776 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS with modern, dreamy colors
-st.markdown("""
-    <style>
-    /* Modern color palette with improved contrast */
-    :root {
-        --primary-color: #4A3AFF;      /* Darker purple */
-        --secondary-color: #0076E3;    /* Darker blue */
-        --accent-color: #00B8D4;       /* Darker cyan */
-        --success-color: #2E7D32;      /* Darker green */
-        --warning-color: #E65100;      /* Darker orange */
-        --error-color: #C62828;        /* Darker red */
-        --background-light: #FFFFFF;   /* Pure white */
-        --text-primary: #1A237E;       /* Very dark blue */
-        --text-secondary: #283593;     /* Dark indigo */
-        --text-body: #1F1F1F;          /* Near black */
-        --card-background: #FFFFFF;    /* White */
-    }
+# Custom CSS with modern, dreamy colors, fetched and cached by the browser
+# once instead of sent with every run when static serving is on
+if st.get_option("server.enableStaticServing"):
+    st.markdown('<link rel="stylesheet" href="app/static/theme.css">', unsafe_allow_html=True)
+else:
+    st.html(THEME_CSS)
 
-    .stApp {
-        background: linear-gradient(135deg, #F8F9FE 0%, #E8EAF6 100%);
-    }
+@st.fragment
+@profiling.timed("app_card")
+def show_app_card(app):
+    with st.container():
+        # Main app card
+        st.markdown(templates.app_card(app, store.catalog_version()), unsafe_allow_html=True)
+        
+        # Metrics and actions
+        col1, col2 = st.columns([3,1])
+        
+        with col1:
+            # Score bars are plain markup, so a card ships no chart spec
+            st.markdown(templates.score_bars(app, store.catalog_version()), unsafe_allow_html=True)
+            
+        with col2:
+            st.markdown(templates.success_rate(app, store.catalog_version()), unsafe_allow_html=True)
+            
+            if st.button("✨ Try Now", key=f"try_{app['id']}"):
+                st.balloons()
+                st.success(f"Starting your journey with {app['name']}!")
+            
+            if st.button("📋 More Info", key=f"info_{app['id']}"):
+                st.info("Detailed information coming soon!")
 
-    .main {
-        padding: 1rem 2rem;
-    }
+def _turn_page(state_key, step):
+    st.session_state[state_key] += step
 
-    /* Modern card styling */
-    .card {
-        background: var(--card-background);
-        padding: 1.5rem;
-        border-radius: 15px;
-        box-shadow: 0 4px 20px rgba(26, 35, 126, 0.1);
-        margin-bottom: 1.5rem;
-        border: 1px solid rgba(26, 35, 126, 0.1);
-        transition: transform 0.2s ease, box-shadow 0.2s ease;
-        color: var(--text-body);
-    }
+def show_pager(key, page, noun):
+    state_key = f"{key}_page"
+    col1, col2, col3 = st.columns([1,2,1])
+    with col1:
+        st.button("◀ Previous", key=f"{key}_prev", disabled=page.number <= 1,
+                  on_click=_turn_page, args=(state_key, -1))
+    with col2:
+        shown = f"{page.start + 1}–{page.start + len(page.rows)}" if page.total else "0"
+        st.caption(f"Page {page.number} of {page.pages} · showing {shown} of {page.total} {noun}")
+    with col3:
+        st.button("Next ▶", key=f"{key}_next", disabled=page.number >= page.pages,
+                  on_click=_turn_page, args=(state_key, 1))
+
+@st.fragment
+@profiling.timed("app_catalog")
+def show_app_catalog(key, positions=None, filters=(), rankings=None):
+    """One page of catalog cards; ``rankings`` adds ``{label: order(positions)}`` sorts."""
+    from beacon.catalog_index import SORT_KEYS
+
+    catalog = store.get_catalog()
+    state_key = f"{key}_page"
+    rankings = rankings or {}
     
-    .card h3, .card h4 {
-        color: var(--text-primary);
-        margin-bottom: 1rem;
-    }
+    # Sorting and page size
+    col1, col2 = st.columns([3,1])
+    with col1:
+        sort_key = st.selectbox("Sort By", list(rankings) + list(SORT_KEYS), key=f"{key}_sort")
+    with col2:
+        page_size = st.selectbox(
+            "Per Page",
+            paging.PAGE_SIZES,
+            index=paging.PAGE_SIZES.index(paging.DEFAULT_PAGE_SIZE),
+            key=f"{key}_page_size"
+        )
     
-    .card p {
-        color: var(--text-body);
-        line-height: 1.6;
-    }
+    # Start from the first page whenever the listing itself changes
+    view = (sort_key, page_size, filters, catalog.version)
+    if st.session_state.get(f"{key}_view") != view:
+        st.session_state[f"{key}_view"] = view
+        st.session_state[state_key] = 1
+    
+    with profiling.section("catalog.sort_page"):
+        if sort_key in rankings:
+            order = rankings[sort_key](positions)
+        else:
+            order = catalog.index.sort_order(sort_key, positions)
+        page = paging.select_page(catalog.apps, order, st.session_state[state_key], page_size)
+    st.session_state[state_key] = page.number
+    
+    # One chart for the whole page instead of one per card
+    if st.toggle("Compare scores", key=f"{key}_compare"):
+        columns = [column for _, column in templates.SCORES]
+        scores = page.rows.set_index('name')[columns]
+        scores.columns = [label for label, _ in templates.SCORES]
+        st.bar_chart(scores, stack=False, horizontal=True)
+    
+    # Only the visible page is rendered
+    for position, app in zip(page.rows.index, page.rows.to_dict('records')):
+        app['features'] = catalog.features.of(position)
+        show_app_card(app)
+    
+    show_pager(key, page, "apps")
 
-    .card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 8px 25px rgba(108, 99, 255, 0.15);
-    }
+def _toggle(key):
+    st.session_state[key] = not st.session_state.get(key, False)
 
-    /* Gradient buttons */
-    .stButton > button {
-        background: linear-gradient(45deg, var(--primary-color), var(--secondary-color)) !important;
-        color: white !important;
-        border: none !important;
-        padding: 0.5rem 1rem !important;
-        border-radius: 25px !important;
-        font-weight: 500 !important;
-        transition: all 0.3s ease !important;
-        width: 100% !important;
-    }
+def show_tabs(key, tabs):
+    """Lay out ``{label: show}`` tabs, running only the open tab's ``show``.
 
-    .stButton > button:hover {
-        transform: translateY(-2px) !important;
-        box-shadow: 0 4px 15px rgba(79, 172, 254, 0.4) !important;
-    }
+    Switching tabs reruns the script, so a tab's queries and elements are only
+    built while it is the one on screen.
+    """
+    for tab, show in zip(st.tabs(list(tabs), key=key, on_change="rerun"), tabs.values()):
+        if tab.open:
+            with tab:
+                show()
 
-    /* Metric container with gradients */
-    .metric-container {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 15px;
-        box-shadow: 0 4px 20px rgba(108, 99, 255, 0.1);
-        border: 1px solid rgba(108, 99, 255, 0.1);
-        text-align: center;
-        transition: transform 0.2s ease;
-    }
+def show_adherence_progress(prescription):
+    from beacon import adherence
 
-    .metric-container:hover {
-        transform: translateY(-5px);
-    }
+    span = st.segmented_control(
+        "Range", list(adherence.RANGES), default="30 days",
+        key=f"progress_range_{prescription['id']}"
+    ) or "30 days"
+    days = adherence.RANGES[span]
+    since = prescription['prescribed_date'].date() if days is None else (
+        date.today() - timedelta(days=days - 1)
+    )
+    granularity, series = store.adherence_progress(prescription['id'], since)
+    if series.empty:
+        st.caption("No check-ins recorded in this range yet.")
+    else:
+        st.line_chart(series, y_label=f"Adherence % per {granularity}")
 
-    /* Big numbers with gradients */
-    .big-number {
-        font-size: 2.5rem;
-        font-weight: bold;
-        background: linear-gradient(45deg, var(--primary-color), var(--secondary-color));
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin-bottom: 0.5rem;
-    }
+@st.fragment
+@profiling.timed("prescription_card")
+def show_prescription(prescription):
+    with st.expander(f"✨ {prescription['app_name']} - Prescribed by {prescription['prescribed_by']}"):
+        col1, col2 = st.columns([2,1])
 
-    .metric-label {
-        font-size: 1rem;
-        color: var(--text-primary);
-        font-weight: 600;
-    }
-    
-    /* Enhanced text contrast for all text elements */
-    p, li, span:not(.status-badge):not(.feature-badge) {
-        color: var(--text-body);
-    }
-    
-    h1, h2, h3, h4, h5, h6 {
-        color: var(--text-primary);
-    }
-    
-    .feature-badge {
-        background: linear-gradient(45deg, #E8EAF6, #C5CAE9);
-        color: var(--text-primary);
-        font-weight: 600;
-    }
-    
-    /* Improved contrast for messages */
-    .message-card {
-        color: var(--text-body);
-    }
-    
-    .message-card h4 {
-        color: var(--text-primary);
-    }
+        with col1:
+            st.markdown(
+                templates.prescription_summary(prescription, store.catalog_version()),
+                unsafe_allow_html=True
+            )
+
+            # Adherence progress bar; a new prescription has no rate until its first check-in
+            st.write("Adherence Rate")
+            rate = prescription['adherence_rate']
+            if rate is None or math.isnan(rate):
+                st.caption("No check-ins yet")
+            else:
+                st.progress(int(rate) / 100)
+                st.write(f"{int(rate)}% adherence")
+
+            if st.session_state.get(f"progress_open_{prescription['id']}"):
+                show_adherence_progress(prescription)
+
+        with col2:
+            if st.button("📱 Launch App", key=f"launch_{prescription['id']}"):
+                st.success(f"Launching {prescription['app_name']}...")
+
+            if st.button("💬 Message Provider", key=f"msg_{prescription['id']}"):
+                st.info(f"Opening message composer for {prescription['app_name']}...")
+
+            st.button("📊 View Progress", key=f"progress_{prescription['id']}",
+                      on_click=_toggle, args=(f"progress_open_{prescription['id']}",))
+
+            if st.button("✅ Check In Today", key=f"checkin_{prescription['id']}"):
+                if store.check_in(prescription):
+                    # The rate shown above was passed in by the full run, so refresh it
+                    st.rerun()
+                st.info("You've already checked in today.")
+
+            st.markdown("""
+                <div style="margin-top: 1rem; padding: 1rem; background-color: #E3F2FD; border-radius: 10px;">
+                    <h5>🎯 Next Goals</h5>
+                    <ul style="list-style-type: none; padding-left: 0;">
+                        <li>✓ Complete daily check-in</li>
+                        <li>◯ Review weekly progress</li>
+                        <li>◯ Schedule provider chat</li>
+                    </ul>
+                </div>
+            """, unsafe_allow_html=True)
+
+@st.fragment
+@profiling.timed("messages")
+def show_messages(recipient):
+    # Reruns on its own when someone messages the recipient
+    store.follow(("inbox", recipient))
+    # Messages are about one of the recipient's own apps, not the whole catalog
+    prescriptions = store.prescriptions(recipient, limit=50)
     
-    /* Better contrast for expandable sections */
-    div[data-testid="stExpander"] {
-        color: var(--text-body);
-    }
+    # New message composer
+    with st.expander("✏️ New Message"):
+        with st.form("new_message"):
+            app_name = st.selectbox(
+                "Select App", options=[None] + list(prescriptions['app_name'].unique())
+            )
+            message = st.text_area("Your Message")
 
-    /* Status badges */
-    .status-badge {
-        padding: 6px 12px;
-        border-radius: 20px;
-        font-weight: 600;
-        display: inline-block;
-        margin: 4px;
-        text-shadow: 0px 1px 2px rgba(0,0,0,0.2);
-    }
+            col1, col2 = st.columns(2)
+            with col1:
+                priority = st.selectbox("Priority", ["Normal", "Urgent"])
+            with col2:
+                notify = st.checkbox("Send notification", value=True)
 
-    .status-active {
-        background: linear-gradient(45deg, #2E7D32, #388E3C);
-        color: white;
-    }
+            if st.form_submit_button("Send Message"):
+                if not message.strip():
+                    st.warning("Write a message before sending.")
+                else:
+                    # Reply to whoever prescribed the app, else the latest prescriber
+                    for_app = prescriptions[prescriptions['app_name'] == app_name]
+                    provider = (for_app if len(for_app) else prescriptions)['prescribed_by']
+                    store.send_message(
+                        sender=recipient,
+                        recipient=provider.iloc[0] if len(provider) else store.current_provider(),
+                        content=message.strip(),
+                        app=app_name,
+                        priority=priority,
+                        notify=notify
+                    )
+                    queued = f" · {priority.lower()} notification queued" if notify else ""
+                    st.success(f"Message sent successfully!{queued}")
+                    st.balloons()
 
-    .status-pending {
-        background: linear-gradient(45deg, #E65100, #EF6C00);
-        color: white;
-    }
+    # Message inbox, newest first, one page of bodies read at a time
+    unread = store.unread_count(recipient)
+    if unread and st.button(f"✓ Mark all {unread} as read", key="inbox_read_all"):
+        store.mark_all_read(recipient)
+        st.rerun()
 
-    /* Navigation tabs */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 24px;
-        background: white;
-        padding: 1rem;
-        border-radius: 15px;
-        box-shadow: 0 4px 20px rgba(108, 99, 255, 0.1);
-        margin-bottom: 2rem;
-    }
+    st.session_state.setdefault("inbox_page", 1)
+    with profiling.section("inbox.query"):
+        page = store.message_page(recipient, st.session_state.inbox_page, paging.DEFAULT_PAGE_SIZE)
+    st.session_state.inbox_page = page.number
+    for msg in page.rows.to_dict('records'):
+        st.markdown(templates.message_card(msg), unsafe_allow_html=True)
+        if not msg['read'] and st.button("✓ Mark as read", key=f"read_{msg['id']}"):
+            store.mark_messages_read(recipient, [msg['id']])
+            # Full rerun, so the sidebar badge drops too
+            st.rerun()
 
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        padding: 0px 24px;
-        background: white;
-        border-radius: 25px;
-        border: 1px solid rgba(108, 99, 255, 0.1);
-        transition: all 0.3s ease;
-    }
+    show_pager("inbox", page, "messages")
 
-    .stTabs [data-baseweb="tab-list"] button[aria-selected="true"] {
-        background: linear-gradient(45deg, var(--primary-color), var(--secondary-color));
-        color: white;
-        border: none;
-    }
+@st.fragment
+def show_notifications(recipient):
+    store.follow(("inbox", recipient))
+    # Counters and the newest entries come from the inbox index, not a query
+    inbox = store.get_inbox(recipient)
+    label = "🔔 Check Notifications" + (f" ({inbox.unread})" if inbox.unread else "")
+    with st.popover(label, width="stretch"):
+        if not inbox.unread:
+            st.caption("You're all caught up.")
+            return
+        senders = sorted(
+            ((sender, unread) for sender, (_, unread) in inbox.senders.items() if unread),
+            key=lambda item: -item[1]
+        )
+        st.caption("New from " + ", ".join(f"{sender} ({unread})" for sender, unread in senders))
+        for found in inbox.newest_unread(NOTIFICATIONS_SHOWN):
+            about = f" about {found.app}" if found.app else ""
+            st.write(f"**{found.sender}**{about} · {found.date[:16]}")
+        if inbox.unread > NOTIFICATIONS_SHOWN:
+            st.caption(f"and {inbox.unread - NOTIFICATIONS_SHOWN} more in Messages")
+        if st.button("✓ Mark all as read", key="notifications_read_all"):
+            store.mark_all_read(recipient)
+            st.rerun()
 
-    /* Feature badges */
-    .feature-badge {
-        background: linear-gradient(45deg, #E3F2FD, #BBDEFB);
-        padding: 8px 12px;
-        border-radius: 10px;
-        color: #1976D2;
-        margin: 4px;
-        display: inline-block;
-        font-weight: 500;
-    }
+def _percent(value):
+    return "–" if value is None else f"{value}%"
 
-    /* Timeline styles */
-    .timeline-card {
-        border-left: 4px solid var(--primary-color);
-        padding-left: 1rem;
-        margin-bottom: 1rem;
-    }
+def _change(points, arrow=True):
+    """Month-on-month adherence change, for a card note or an ``st.metric`` delta."""
+    if points is None:
+        return "Check in daily to track" if arrow else None
+    if not arrow:
+        return f"{points:+d}% vs last month"
+    return f"{'↑' if points >= 0 else '↓'} {abs(points)}% vs last month"
 
-    /* Message styles */
-    .message-card {
-        background: white;
-        padding: 1rem;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-        border-left: 4px solid var(--primary-color);
-    }
+@st.fragment
+@profiling.timed("my_apps")
+def show_my_apps():
+    catalog = store.get_catalog()
+    patient = store.current_patient()
+    # Reruns on its own when the patient is prescribed an app
+    store.follow(("patient", patient))
+    st.header("Your Digital Therapies")
 
-    /* Progress bar enhancements */
-    .stProgress > div > div > div > div {
-        background: linear-gradient(45deg, var(--primary-color), var(--secondary-color));
-        border-radius: 10px;
+    # One join against the cached catalog index instead of a mask scan per row
+    with profiling.section("my_apps.query"):
+        prescriptions = store.prescriptions(patient)
+    with profiling.section("my_apps.join"):
+        my_apps = catalog.index.join_prescriptions(prescriptions)
+    for prescription in my_apps.to_dict('records'):
+        show_prescription(prescription)
+
+def show_discover():
+    catalog = store.get_catalog()
+    st.header("Discover Digital Therapies")
+
+    # Search and facet filters, answered from the cached catalog search index
+    query = st.text_input(
+        "🔎 Search",
+        placeholder="Search features and descriptions",
+        key="discover_query"
+    )
+    filters = {
+        facet: None if st.session_state.get(f"discover_{facet}", "All") == "All"
+        else st.session_state[f"discover_{facet}"]
+        for facet in ("category", "fda_status")
     }
-    </style>
-""", unsafe_allow_html=True)
-
-# Initialize session state with demo data
-if 'initialized' not in st.session_state:
-    # Apps data
-    st.session_state.apps = pd.DataFrame([
-        {
-            'id': 1,
-            'name': 'MindfulPath',
-            'category': 'Mental Health',
-            'description': '🧠 AI-powered CBT therapy platform with personalized interventions',
-            'features': ['Daily Mood Tracking', 'AI Therapy Sessions', 'Crisis Support', 'Progress Analytics'],
-            'clinical_score': 4.8,
-            'ux_score': 4.7,
-            'security_score': 4.9,
-            'integration_score': 4.6,
-            'fda_status': 'FDA Cleared',
-            'testimonial': "Life-changing app! Helped me manage anxiety effectively.",
-            'active_users': 15000,
-            'success_rate': '87%'
-        },
-        {
-            'id': 2,
-            'name': 'DiabetesGuard',
-            'category': 'Chronic Disease',
-            'description': '📊 Smart diabetes management with CGM integration',
-            'features': ['Glucose Monitoring', 'Medication Reminders', 'Diet Tracking', 'Doctor Connect'],
-            'clinical_score': 4.9,
-            'ux_score': 4.8,
-            'security_score': 4.9,
-            'integration_score': 4.7,
-            'fda_status': 'FDA Cleared',
-            'testimonial': "Revolutionized my diabetes care routine!",
-            'active_users': 25000,
-            'success_rate': '92%'
-        },
-        {
-            'id': 3,
-            'name': 'SleepHarmony',
-            'category': 'Sleep',
-            'description': '😴 Advanced sleep therapy and tracking',
-            'features': ['Sleep Analysis', 'Relaxation Exercises', 'Smart Alarm', 'Sleep Scores'],
-            'clinical_score': 4.7,
-            'ux_score': 4.9,
-            'security_score': 4.8,
-            'integration_score': 4.5,
-            'fda_status': 'FDA Registered',
-            'testimonial': "Finally getting quality sleep!",
-            'active_users': 10000,
-            'success_rate': '83%'
-        }
-    ])
-    
-    # Prescriptions data
-    st.session_state.prescriptions = pd.DataFrame([
-        {
-            'id': 1,
-            'app_name': 'DiabetesGuard',
-            'prescribed_by': 'Dr. Sarah Smith',
-            'prescribed_to': 'John Davis',
-            'status': 'Active',
-            'prescribed_date': datetime.now() - timedelta(days=30),
-            'next_review': datetime.now() + timedelta(days=60),
-            'adherence_rate': 85,
-            'progress_notes': 'Good progress in glucose management'
-        },
-        {
-            'id': 2,
-            'app_name': 'MindfulPath',
-            'prescribed_by': 'Dr. James Wilson',
-            'prescribed_to': 'Sarah Chen',
-            'status': 'Active',
-            'prescribed_date': datetime.now() - timedelta(days=15),
-            'next_review': datetime.now() + timedelta(days=75),
-            'adherence_rate': 92,
-            'progress_notes': 'Excellent engagement with daily exercises'
+    with profiling.section("discover.search"):
+        result = catalog.search.search(query, **filters)
+    counts = result.facet_counts
+
+    # Enhanced filters
+    col1, col2 = st.columns(2)
+    with col1:
+        category = st.selectbox(
+            "Category",
+            ["All"] + catalog.search.facet_options("category"),
+            format_func=lambda x: f"🔍 {x}" if x == "All" else f"🔍 {x} ({counts['category'][x]})",
+            key="discover_category"
+        )
+    with col2:
+        fda_status = st.selectbox(
+            "FDA Status",
+            ["All"] + catalog.search.facet_options("fda_status"),
+            format_func=lambda x: f"🏆 {x}" if x == "All" else f"🏆 {x} ({counts['fda_status'][x]})",
+            key="discover_fda_status"
+        )
+
+    # Ranking weights, applied to the whole catalog in one vectorized pass
+    from beacon.ranking import DEFAULT_WEIGHTS, WEIGHTS, normalize
+
+    with st.expander("⚖️ Ranking weights"):
+        cols = st.columns(3)
+        raw = {
+            name: cols[i % 3].slider(
+                label, 0, 10, DEFAULT_WEIGHTS[name], key=f"discover_weight_{name}"
+            )
+            for i, (name, label) in enumerate(WEIGHTS.items())
         }
-    ])
-    
-    # Messages data
-    st.session_state.messages = pd.DataFrame([
-        {
-            'id': 1,
-            'sender': 'Dr. Smith',
-            'content': 'Great progress with your glucose management! Keep it up! 🌟',
-            'app': 'DiabetesGuard',
-            'date': datetime.now() - timedelta(days=2),
-            'read': False
-        },
-        {
-            'id': 2,
-            'sender': 'Dr. Wilson',
-            'content': 'Your meditation streak is impressive! How are you feeling?',
-            'app': 'MindfulPath',
-            'date': datetime.now() - timedelta(days=1),
-            'read': True
+    weights = normalize(raw)
+    ranking = catalog.ranking
+    profile = store.patient_profile(store.current_patient())
+
+    # Show one page of matching apps
+    filtered = query.strip() or category != "All" or fda_status != "All"
+    show_app_catalog(
+        "discover",
+        result.positions if filtered else None,
+        filters=(query, category, fda_status, weights),
+        rankings={
+            "✨ Recommended for you": lambda positions: ranking.order(weights, positions, profile),
+            "⭐ Top rated": lambda positions: ranking.order(weights, positions),
         }
-    ])
-    
-    st.session_state.initialized = True
+    )
 
-def show_app_card(app):
-    with st.container():
-        # Main app card
-        st.markdown(f"""
-            <div class="card">
-                <div style="display: flex; justify-content: space-between; align-items: center;">
-                    <h3>{app['name']} {'✨' if app['fda_status'] == 'FDA Cleared' else '🔄'}</h3>
-                    <div class="status-badge status-active">{app['fda_status']}</div>
-                </div>
-                <p style="color: #666; margin-bottom: 1rem;">{app['category']}</p>
-                <p>{app['description']}</p>
-                
-                <div style="margin-top: 1rem;">
-                    {''.join([f'<span class="feature-badge">{feature}</span>' for feature in app['features']])}
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        # Metrics and actions
-        col1, col2 = st.columns([3,1])
-        
-        with col1:
-            # Create metrics chart
-            metrics_df = pd.DataFrame({
-                'Metric': ['Clinical', 'UX', 'Security', 'Integration'],
-                'Score': [
-                    app['clinical_score'],
-                    app['ux_score'],
-                    app['security_score'],
-                    app['integration_score']
-                ]
-            })
-            st.bar_chart(metrics_df.set_index('Metric'))
-            
-        with col2:
-            st.markdown(f"""
-                <div class="metric-container">
-                    <div class="big-number">{app['success_rate']}</div>
-                    <div class="metric-label">Success Rate</div>
-                </div>
-            """, unsafe_allow_html=True)
-            
-            if st.button("✨ Try Now", key=f"try_{app['id']}"):
-                st.balloons()
-                st.success(f"Starting your journey with {app['name']}!")
-            
-            if st.button("📋 More Info", key=f"info_{app['id']}"):
-                st.info("Detailed information coming soon!")
+def show_patient_messages():
+    st.header("💌 Messages & Updates")
+
+    show_messages(store.current_patient())
 
 def show_patient_dashboard():
     st.title("🌟 Your Health Journey")
     
     # Quick stats with enhanced visuals
+    summary = store.patient_summary(store.current_patient())
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.markdown("""
+        st.markdown(f"""
             <div class="metric-container">
-                <div class="big-number">2</div>
+                <div class="big-number">{summary.active}</div>
                 <div class="metric-label">Active Therapies</div>
-                <div style="color: #4CAF50; font-size: 0.9rem;">↑ 1 new this month</div>
+                <div style="color: #4CAF50; font-size: 0.9rem;">↑ {summary.new_this_month} new this month</div>
             </div>
         """, unsafe_allow_html=True)
     with col2:
-        st.markdown("""
+        st.markdown(f"""
             <div class="metric-container">
-                <div class="big-number">89%</div>
+                <div class="big-number">{_percent(summary.adherence)}</div>
                 <div class="metric-label">Adherence Score</div>
-                <div style="color: #4CAF50; font-size: 0.9rem;">↑ 12% improvement</div>
+                <div style="color: #4CAF50; font-size: 0.9rem;">{_change(summary.adherence_change)}</div>
             </div>
         """, unsafe_allow_html=True)
     with col3:
-        st.markdown("""
+        schedule = store.get_review_schedule()
+        patient = store.current_patient()
+        overdue, _ = schedule.overdue("patient", patient, limit=0)
+        upcoming = schedule.next_due("patient", patient)
+        if overdue:
+            days, note = "0", f"⚠️ {overdue} overdue"
+        elif upcoming:
+            days, note = reviews.days_until(upcoming), f"📅 {html.escape(upcoming.app_name)}"
+        else:
+            days, note = "–", "Nothing scheduled"
+        st.markdown(f"""
             <div class="metric-container">
-                <div class="big-number">7</div>
+                <div class="big-number">{days}</div>
                 <div class="metric-label">Days to Review</div>
-                <div style="color: #FF9800; font-size: 0.9rem;">📅 Upcoming</div>
+                <div style="color: #FF9800; font-size: 0.9rem;">{note}</div>
             </div>
         """, unsafe_allow_html=True)
 
     # Main content tabs
-    tabs = st.tabs(["📱 My Apps", "🔍 Discover", "💌 Messages"])
-    
-    with tabs[0]:
-        st.header("Your Digital Therapies")
-        
-        for _, prescription in st.session_state.prescriptions.iterrows():
-            app = st.session_state.apps[st.session_state.apps['name'] == prescription['app_name']].iloc[0]
-            
-            with st.expander(f"✨ {app['name']} - Prescribed by {prescription['prescribed_by']}"):
-                col1, col2 = st.columns([2,1])
-                
-                with col1:
-                    st.markdown(f"""
-                        <div style="padding: 1rem; background: linear-gradient(135deg, #F8F9FE 0%, #E8EAF6 100%); border-radius: 10px;">
-                            <h4>{app['description']}</h4>
-                            <p>Prescribed: {prescription['prescribed_date'].strftime('%Y-%m-%d')}</p>
-                            <p>Next Review: {prescription['next_review'].strftime('%Y-%m-%d')}</p>
-                            <div style="margin-top: 1rem;">
-                                <span style="color: #4CAF50;">●</span> {prescription['progress_notes']}
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    # Adherence progress bar
-                    st.write("Adherence Rate")
-                    st.progress(prescription['adherence_rate'] / 100)
-                    st.write(f"{prescription['adherence_rate']}% adherence")
-                
-                with col2:
-                    if st.button("📱 Launch App", key=f"launch_{app['id']}"):
-                        st.success(f"Launching {app['name']}...")
-                    
-                    if st.button("💬 Message Provider", key=f"msg_{app['id']}"):
-                        st.info(f"Opening message composer for {app['name']}...")
-                    
-                    if st.button("📊 View Progress", key=f"progress_{app['id']}"):
-                        st.info("Loading your progress data...")
-                        
-                    st.markdown("""
-                        <div style="margin-top: 1rem; padding: 1rem; background-color: #E3F2FD; border-radius: 10px;">
-                            <h5>🎯 Next Goals</h5>
-                            <ul style="list-style-type: none; padding-left: 0;">
-                                <li>✓ Complete daily check-in</li>
-                                <li>◯ Review weekly progress</li>
-                                <li>◯ Schedule provider chat</li>
-                            </ul>
-                        </div>
-                    """, unsafe_allow_html=True)
-    
-    with tabs[1]:
-        st.header("Discover Digital Therapies")
-        
-        # Enhanced filters
-        col1, col2 = st.columns(2)
-        with col1:
-            category = st.selectbox(
-                "Category",
-                ["All"] + list(st.session_state.apps['category'].unique()),
-                format_func=lambda x: f"🔍 {x}"
-            )
-        with col2:
-            fda_status = st.selectbox(
-                "FDA Status",
-                ["All"] + list(st.session_state.apps['fda_status'].unique()),
-                format_func=lambda x: f"🏆 {x}"
-            )
-        
-        # Filter apps
-        filtered_apps = st.session_state.apps
-        if category != "All":
-            filtered_apps = filtered_apps[filtered_apps['category'] == category]
-        if fda_status != "All":
-            filtered_apps = filtered_apps[filtered_apps['fda_status'] == fda_status]
-        
-        # Show filtered apps
-        for _, app in filtered_apps.iterrows():
-            show_app_card(app)
-    
-    with tabs[2]:
-        st.header("💌 Messages & Updates")
-        
-        # New message composer
-        with st.expander("✏️ New Message"):
-            with st.form("new_message"):
-                app_name = st.selectbox("Select App", options=[None] + list(st.session_state.apps['name']))
-                message = st.text_area("Your Message")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    priority = st.selectbox("Priority", ["Normal", "Urgent"])
-                with col2:
-                    notify = st.checkbox("Send notification", value=True)
-                
-                if st.form_submit_button("Send Message"):
-                    st.success("Message sent successfully!")
-                    st.balloons()
-        
-        # Message inbox
-        for _, msg in st.session_state.messages.iterrows():
-            st.markdown(f"""
-                <div class="message-card" style="border-left-color: {'#4CAF50' if msg['read'] else '#FF9800'}">
-                    <div style="display: flex; justify-content: space-between; align-items: center;">
-                        <h4>{msg['sender']}</h4>
-                        <small>{msg['date'].strftime('%Y-%m-%d %H:%M')}</small>
-                    </div>
-                    <p>{msg['content']}</p>
-                    <div style="display: flex; gap: 10px; margin-top: 10px;">
-                        <span class="feature-badge">{msg['app']}</span>
-                        <span class="status-badge status-{'active' if msg['read'] else 'pending'}">
-                            {'Read' if msg['read'] else 'New'}
-                        </span>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+    show_tabs("patient_tab", {
+        "📱 My Apps": show_my_apps,
+        "🔍 Discover": show_discover,
+        "💌 Messages": show_patient_messages,
+    })
+
+@st.dialog("💊 New Prescription")
+def show_prescribe_dialog(provider, patient=None):
+    # Typed rather than picked, so the dialog never ships the whole library
+    app_name = st.text_input("App", placeholder="Name as listed in the library").strip()
+    if patient is None:
+        conditions = store.patient_conditions(provider)
+        if not conditions:
+            st.info("You have no patients to prescribe to yet.")
+            return
+        condition = st.selectbox(
+            "Everyone with condition",
+            list(conditions),
+            format_func=lambda x: f"{x} ({conditions[x]:,})"
+        )
+    else:
+        st.write(f"**Patient:** {patient}")
+    review_days = st.number_input(
+        "First review in (days)", min_value=1, max_value=365, value=reviews.REVIEW_INTERVAL_DAYS
+    )
+    notes = st.text_area("Progress notes")
+
+    if st.button("💊 Prescribe", type="primary"):
+        if not app_name:
+            st.error("Enter the name of an app from the library.")
+            return
+        # The whole cohort is written as one batch
+        patients = [patient] if patient is not None else store.cohort(provider, condition)
+        try:
+            with profiling.section("prescribe.batch"):
+                written, skipped = store.prescribe(
+                    provider, app_name, patients, review_days, notes.strip()
+                )
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            if written:
+                st.success(f"Prescribed {app_name} to {len(written):,} of {len(patients):,} patients.")
+            if skipped:
+                shown = ", ".join(skipped[:5]) + (" ..." if len(skipped) > 5 else "")
+                st.caption(f"{len(skipped):,} already on {app_name}: {shown}")
+
+@st.fragment
+@profiling.timed("patients")
+def show_patients():
+    # Reruns on its own when a patient checks in or is prescribed an app
+    store.follow(("provider", store.current_provider()))
+    st.header("Patient Management")
+
+    # Patient search and filters
+    col1, col2 = st.columns([2,1])
+    with col1:
+        # Text inputs only rerun on Enter or blur, so each search is one query
+        query = st.text_input(
+            "🔍 Search Patients",
+            placeholder="Enter patient name or ID",
+            key="patient_query"
+        )
+    with col2:
+        status = st.selectbox(
+            "Filter By",
+            ["All Patients", "Active", "Pending Review", "New"],
+            key="patient_status"
+        )
+
+    # Start from the first page whenever the search changes
+    view = (query, status)
+    if st.session_state.get("patients_view") != view:
+        st.session_state.patients_view = view
+        st.session_state.patients_page = 1
+
+    # Patient list, one indexed and cached page at a time
+    with profiling.section("patients.search"):
+        page = store.search_patients(
+            store.current_provider(),
+            query,
+            None if status == "All Patients" else status,
+            st.session_state.patients_page,
+            paging.DEFAULT_PAGE_SIZE
+        )
+    st.session_state.patients_page = page.number
+
+    if not page.total:
+        st.info("No patients match your search.")
+
+    for patient in page.rows.to_dict('records'):
+        with st.expander(f"🧑 {patient['name']} - Age {patient['age']}"):
+            col1, col2 = st.columns([2,1])
+
+            with col1:
+                st.write(f"**Patient ID:** {patient['mrn']} · **Status:** {patient['status']}")
+                st.write(f"**Condition:** {patient['condition']}")
+                st.write("**Adherence Rate**")
+                st.progress(patient['adherence'] / 100)
+                st.write(f"{patient['adherence']}% adherence")
+
+            with col2:
+                if st.button("👁️ View Details", key=f"view_{patient['id']}"):
+                    st.info(f"Loading details for {patient['name']}...")
+
+                if st.button("💊 Prescribe App", key=f"prescribe_{patient['id']}"):
+                    show_prescribe_dialog(store.current_provider(), patient['name'])
+
+                if st.button("📝 Add Note", key=f"note_{patient['id']}"):
+                    st.info("Opening progress note...")
+
+    show_pager("patients", page, "patients")
+
+def show_library():
+    st.header("Digital Therapeutics Library")
+    show_app_catalog("library")
+
+def show_practice_analytics():
+    st.header("Practice Analytics")
+
+    granularity = st.radio(
+        "Period",
+        ["week", "day"],
+        format_func=lambda x: "📅 Weekly" if x == "week" else "🗓️ Daily",
+        horizontal=True,
+        key="analytics_granularity"
+    )
+    with profiling.section("analytics.rollups"):
+        engagement_data, app_usage = store.practice_analytics(store.current_provider(), granularity)
+
+    # Practice metrics
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Patient Engagement")
+        st.line_chart(engagement_data)
+
+    with col2:
+        st.subheader("App Usage Distribution")
+        if app_usage.empty:
+            st.info("No prescriptions yet.")
+        else:
+            st.bar_chart(app_usage)
 
 def show_provider_dashboard():
     st.title("👩‍⚕️ Provider Dashboard")
     
     # Provider quick stats
+    summary = store.provider_summary(store.current_provider())
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.markdown("""
+        st.markdown(f"""
             <div class="metric-container">
-                <div class="big-number">24</div>
+                <div class="big-number">{summary.active_patients}</div>
                 <div class="metric-label">Active Patients</div>
-                <div style="color: #4CAF50; font-size: 0.9rem;">↑ 3 new this month</div>
+                <div style="color: #4CAF50; font-size: 0.9rem;">↑ {summary.new_patients} new this month</div>
             </div>
         """, unsafe_allow_html=True)
     with col2:
-        st.markdown("""
+        st.markdown(f"""
             <div class="metric-container">
-                <div class="big-number">92%</div>
+                <div class="big-number">{_percent(summary.engagement)}</div>
                 <div class="metric-label">Patient Engagement</div>
-                <div style="color: #4CAF50; font-size: 0.9rem;">↑ 5% improvement</div>
+                <div style="color: #4CAF50; font-size: 0.9rem;">Across {summary.active_prescriptions} active prescriptions</div>
             </div>
         """, unsafe_allow_html=True)
     with col3:
-        st.markdown("""
+        schedule = store.get_review_schedule()
+        provider = store.current_provider()
+        overdue, _ = schedule.overdue("provider", provider, limit=0)
+        due_soon, _ = schedule.due_within("provider", provider, 7, limit=0)
+        st.markdown(f"""
             <div class="metric-container">
-                <div class="big-number">8</div>
+                <div class="big-number">{overdue + due_soon}</div>
                 <div class="metric-label">Pending Reviews</div>
-                <div style="color: #FF9800; font-size: 0.9rem;">Due this week</div>
+                <div style="color: #FF9800; font-size: 0.9rem;">{overdue} overdue · {due_soon} due this week</div>
             </div>
         """, unsafe_allow_html=True)
 
     # Main provider tabs
-    tabs = st.tabs(["👥 Patients", "📱 Prescribe Apps", "📊 Analytics"])
-    
-    with tabs[0]:
-        st.header("Patient Management")
-        
-        # Patient search and filters
-        col1, col2 = st.columns([2,1])
-        with col1:
-            st.text_input("🔍 Search Patients", placeholder="Enter patient name or ID")
-        with col2:
-            st.selectbox("Filter By", ["All Patients", "Active", "Pending Review", "New"])
-        
-        # Patient list
-        patients = [
-            {"name": "John Davis", "age": 45, "condition": "Type 2 Diabetes", "adherence": 85},
-            {"name": "Sarah Chen", "age": 32, "condition": "Anxiety", "adherence": 92},
-            {"name": "Michael Brown", "age": 58, "condition": "Hypertension", "adherence": 78}
-        ]
-        
-        for patient in patients:
-            with st.expander(f"🧑 {patient['name']} - Age {patient['age']}"):
-                col1, col2 = st.columns([2,1])
-                
-                with col1:
-                    st.write(f"**Condition:** {patient['condition']}")
-                    st.write("**Adherence Rate**")
-                    st.progress(patient['adherence'] / 100)
-                    st.write(f"{patient['adherence']}% adherence")
-                
-                with col2:
-                    if st.button("👁️ View Details", key=f"view_{patient['name']}"):
-                        st.info(f"Loading details for {patient['name']}...")
-                    
-                    if st.button("💊 Prescribe App", key=f"prescribe_{patient['name']}"):
-                        st.success(f"Opening prescription form for {patient['name']}")
-                        
-                    if st.button("📝 Add Note", key=f"note_{patient['name']}"):
-                        st.info("Opening progress note...")
+    show_tabs("provider_tab", {
+        "👥 Patients": show_patients,
+        "📱 Prescribe Apps": show_library,
+        "📊 Analytics": show_practice_analytics,
+    })
+
+def show_render_times():
+    import pandas as pd
+
+    st.header("Script and Section Timings")
+    sections = metrics.summarize(metrics.SECTION_SECONDS)
+    if sections:
+        st.dataframe(pd.DataFrame(sections).set_index("section"))
+
+    st.subheader("Recent Reruns (ms)")
+    reruns = {
+        role: pd.Series(recent * 1000)
+        for (role,), recent in metrics.RERUN_SECONDS.series().items()
+    }
+    if reruns:
+        st.line_chart(pd.DataFrame(reruns))
+    else:
+        st.info("No reruns recorded yet.")
+
+def show_cache_stats():
+    import pandas as pd
+
+    st.header("Cache Effectiveness")
+    hit_rates = metrics.cache_hit_rates()
+    if hit_rates:
+        st.dataframe(
+            pd.DataFrame(
+                [{"cache": name, "lookups": count, "hit rate": f"{rate:.1%}"}
+                 for name, (count, rate) in sorted(hit_rates.items())]
+            ).set_index("cache")
+        )
+    else:
+        st.info("No cache lookups recorded yet.")
+
+def show_prometheus_export():
+    st.header("Prometheus Export")
+    exposition = metrics.prometheus_text()
+    st.download_button(
+        "📥 Download metrics",
+        exposition,
+        file_name="beacon-metrics.prom",
+        mime="text/plain"
+    )
+    with st.expander("Preview"):
+        st.code(exposition, language="text")
+
+def show_library_admin():
+    from beacon import catalog_io
+
+    st.header("Import Vendor Catalog")
+    upload = st.file_uploader(
+        "CSV, JSON Lines or Parquet file",
+        type=["csv", "jsonl", "ndjson", "parquet"],
+        key="catalog_upload"
+    )
+    if upload is not None and st.button("📥 Import apps", key="catalog_import"):
+        bar = st.progress(0.0, text=f"Importing {upload.name}...")
+        try:
+            result = store.import_apps(
+                upload,
+                catalog_io.format_of(upload.name),
+                progress=lambda fraction, text: bar.progress(fraction, text=text)
+            )
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            st.success(f"Imported {result.imported:,} apps into the library.")
+            if result.rejected:
+                st.warning(f"Skipped {result.rejected:,} invalid rows.")
+                st.dataframe(result.errors)
+
+    st.header("Export Library")
+    export_format = st.selectbox("Format", list(catalog_io.FORMATS), key="catalog_export_format")
+    if st.button("📤 Export apps", key="catalog_export"):
+        with st.spinner("Exporting the library..."):
+            st.session_state.catalog_export_file = store.export_apps(export_format, EXPORT_DIR)
+    export = st.session_state.get("catalog_export_file")
+    path = EXPORT_DIR / export if export else None
+    if path is None or not path.exists():
+        return
+    size = path.stat().st_size
+    if size > STATIC_FILE_LIMIT:
+        st.warning(
+            f"The export is {size / 2**20:,.0f} MB, too large to download here. Run"
+            f" `python -m beacon.catalog_io export beacon-apps{path.suffix}` on the server."
+        )
+        return
+    st.markdown(
+        f'<a href="app/static/exports/{html.escape(export)}" download="beacon-apps{path.suffix}">'
+        f'⬇️ Download beacon-apps{path.suffix}</a> ({size / 2**20:,.1f} MB, kept for'
+        f' {catalog_io.EXPORT_TTL_SECONDS // 60} minutes)',
+        unsafe_allow_html=True
+    )
+
+def show_admin_dashboard():
+    st.title("⚙️ Platform Dashboard")
     
-    with tabs[1]:
-        st.header("Digital Therapeutics Library")
-        for _, app in st.session_state.apps.iterrows():
-            show_app_card(app)
+    # Live platform stats from the in-process metrics collector
+    rerun_p95, = metrics.overall_percentiles(metrics.RERUN_SECONDS, 0.95)
+    hit_rates = metrics.cache_hit_rates()
+    requests = sum(count for count, _ in hit_rates.values())
+    hits = sum(count * rate for count, rate in hit_rates.values())
+    stats = [
+        ("Rerun p95", f"{rerun_p95 * 1000:.0f} ms" if rerun_p95 is not None else "–", "Full script runs"),
+        ("Active Sessions", metrics.active_sessions(), "Last 5 minutes"),
+        ("Cache Hit Rate", f"{hits / requests:.0%}" if requests else "–", f"{requests} lookups"),
+        ("Memory / Session", f"{metrics.memory_per_session_bytes() / 2**20:.0f} MB", "Resident memory"),
+    ]
+    for col, (label, value, note) in zip(st.columns(len(stats)), stats):
+        with col:
+            st.markdown(f"""
+                <div class="metric-container">
+                    <div class="big-number">{value}</div>
+                    <div class="metric-label">{label}</div>
+                    <div style="color: #4CAF50; font-size: 0.9rem;">{note}</div>
+                </div>
+            """, unsafe_allow_html=True)
     
-    with tabs[2]:
-        st.header("Practice Analytics")
-        
-        # Practice metrics
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Patient Engagement")
-            engagement_data = pd.DataFrame(
-                np.random.randint(70, 100, size=(7, 1)),
-                index=pd.date_range(start='2024-02-01', periods=7),
-                columns=['Engagement %']
+    show_tabs("admin_tab", {
+        "⏱️ Render Times": show_render_times,
+        "🗄️ Caches": show_cache_stats,
+        "📤 Prometheus": show_prometheus_export,
+        "📚 Library": show_library_admin,
+    })
+
+def show_rerun_report(captured):
+    with st.sidebar:
+        if profiling.enabled():
+            with st.expander("⏱️ Rerun Timings"):
+                import pandas as pd
+
+                trace = pd.DataFrame(profiling.trace(), columns=["section", "seconds"])
+                summary = trace.groupby("section")["seconds"].agg(["count", "sum"])
+                summary["ms"] = (summary.pop("sum") * 1000).round(1)
+                st.dataframe(summary.sort_values("ms", ascending=False))
+        for capture in captured:
+            st.download_button(
+                "📥 Download rerun profile",
+                capture.data,
+                file_name=capture.file_name,
+                mime=capture.mime
             )
-            st.line_chart(engagement_data)
-        
-        with col2:
-            st.subheader("App Usage Distribution")
-            app_usage = pd.DataFrame({
-                'App': st.session_state.apps['name'],
-                'Users': [15, 12, 8]
-            })
-            st.bar_chart(app_usage.set_index('App'))
+
+def _review_line(review, kind):
+    who = review.patient if kind == "provider" else review.provider
+    return f"**{review.app_name}** · {who} · {review.due[:10]}"
+
+def show_review_schedule(kind, owner):
+    schedule = store.get_review_schedule()
+    overdue, late = schedule.overdue(kind, owner, limit=REVIEWS_SHOWN)
+    due_soon, upcoming = schedule.due_within(kind, owner, 7, limit=REVIEWS_SHOWN)
+    if not overdue and not due_soon:
+        upcoming = [review for review in [schedule.next_due(kind, owner)] if review]
+        st.caption("Nothing due this week." + (" Next review:" if upcoming else ""))
+    for label, count, shown in (("Overdue", overdue, late), ("Due this week", due_soon, upcoming)):
+        if count:
+            st.markdown(f"**{label} ({count})**")
+        for review in shown:
+            col1, col2 = st.columns([3,1])
+            with col1:
+                st.markdown(_review_line(review, kind))
+            with col2:
+                # Providers sign reviews off; that books the next one
+                if kind == "provider":
+                    st.button("✅", key=f"review_done_{review.prescription_id}",
+                              help="Mark reviewed", on_click=store.renew_review,
+                              args=(review.prescription_id,))
+                else:
+                    st.caption(f"{reviews.days_until(review)} d")
+
+# Optional Prometheus scrape endpoint, started once per process
+@st.cache_resource(show_spinner=False)
+def start_metrics_server(port):
+    return metrics.serve(port)
 
 def main():
+    metrics.track_session()
+    # Pick up writes made by the other worker processes, if any
+    store.sync()
+    if os.environ.get("BEACON_METRICS_PORT"):
+        start_metrics_server(int(os.environ["BEACON_METRICS_PORT"]))
+    
     # Sidebar configuration
-    with st.sidebar:
+    with st.sidebar, metrics.timer(metrics.SECTION_SECONDS, section="sidebar"):
         st.title("🏥 Beacon Health")
         st.markdown("""
             <div style="padding: 1rem; background: white; border-radius: 10px; margin-bottom: 1rem;">
@@ -635,25 +823,36 @@ def main():
         # Show relevant role information
         if "Patient" in role:
             st.info("Access and manage your digital therapeutic apps")
-            st.metric("Wellness Score", "85%", "↑ 12%")
+            summary = store.patient_summary(store.current_patient())
+            st.metric("Adherence Score", _percent(summary.adherence),
+                      _change(summary.adherence_change, arrow=False))
+            st.caption(f"📬 {store.unread_count(store.current_patient())} unread messages")
         elif "Provider" in role:
             st.info("Prescribe and monitor digital therapeutics")
-            st.metric("Patient Engagement", "92%", "↑ 5%")
+            summary = store.provider_summary(store.current_provider())
+            st.metric("Patient Engagement", _percent(summary.engagement))
+            st.caption(f"📬 {store.unread_count(store.current_provider())} unread messages")
         else:
             st.info("Manage platform and analyze metrics")
-            st.metric("Platform Health", "98%", "↑ 2%")
+            rerun_p95, = metrics.overall_percentiles(metrics.RERUN_SECONDS, 0.95)
+            st.metric("Rerun p95", f"{rerun_p95 * 1000:.0f} ms" if rerun_p95 is not None else "–")
         
         # Quick actions based on role
         st.markdown("### Quick Actions")
         if "Patient" in role:
-            st.button("🔔 Check Notifications")
-            st.button("📅 Schedule Review")
+            show_notifications(store.current_patient())
+            with st.popover("📅 Schedule Review", width="stretch"):
+                show_review_schedule("patient", store.current_patient())
         elif "Provider" in role:
-            st.button("📋 Patient Reviews")
-            st.button("➕ New Prescription")
+            with st.popover("📋 Patient Reviews", width="stretch"):
+                show_review_schedule("provider", store.current_provider())
+            if st.button("➕ New Prescription"):
+                show_prescribe_dialog(store.current_provider())
         else:
             st.button("📊 Analytics Report")
-            st.button("⚡ System Status")
+            if st.button("⚡ System Status"):
+                uptime = timedelta(seconds=int(time.time() - metrics.STARTED_AT))
+                st.success(f"Up {uptime} · {metrics.active_sessions()} active sessions")
         
         # Help and support
         with st.expander("ℹ️ Help & Support"):
@@ -666,11 +865,19 @@ def main():
     
     # Main content based on role
     if "Patient" in role:
-        show_patient_dashboard()
+        with metrics.timer(metrics.SECTION_SECONDS, section="patient_dashboard"):
+            show_patient_dashboard()
     elif "Provider" in role:
-        show_provider_dashboard()
+        with metrics.timer(metrics.SECTION_SECONDS, section="provider_dashboard"):
+            show_provider_dashboard()
     else:
-        show_admin_dashboard()
+        with metrics.timer(metrics.SECTION_SECONDS, section="admin_dashboard"):
+            show_admin_dashboard()
 
 if __name__ == "__main__":
-    main()
+    role = st.session_state.get("role_selector", "👤 Patient")
+    profiling.begin_rerun()
+    with profiling.capture(profiling.requested_profiler()) as captured:
+        with metrics.timer(metrics.RERUN_SECONDS, role=role.split()[-1]):
+            main()
+    show_rerun_report(captured)
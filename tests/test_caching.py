@@ -0,0 +1,62 @@
+import threading
+
+from beacon.caching import LoadingCache
+
+
+def loader(value, calls):
+    def load():
+        calls.append(value)
+        return value
+    return load
+
+
+def test_values_are_loaded_once_and_the_least_recent_dropped():
+    cache, calls = LoadingCache('test', max_entries=2), []
+    assert cache.get('a', loader('A', calls)) == 'A'
+    assert cache.get('b', loader('B', calls)) == 'B'
+    assert cache.get('a', loader('A2', calls)) == 'A'
+    cache.get('c', loader('C', calls))
+    # b was read least recently, so it made room for c
+    assert cache.get('b', loader('B2', calls)) == 'B2'
+    assert calls == ['A', 'B', 'C', 'B2']
+    assert len(cache) == 2
+
+
+def test_a_stale_value_counts_as_a_miss():
+    cache, calls = LoadingCache('test', max_entries=10), []
+    cache.get('k', loader((1, 'old'), calls))
+    assert cache.get('k', loader((2, 'new'), calls), fresh=lambda v: v[0] == 2) == (2, 'new')
+    assert cache.get('k', loader((3, 'newer'), calls), fresh=lambda v: v[0] == 2) == (2, 'new')
+
+
+def test_a_load_that_raced_an_invalidation_is_not_kept():
+    cache, calls = LoadingCache('test', max_entries=10), []
+    started, release = threading.Event(), threading.Event()
+
+    def slow_load():
+        # Reads the data before the write below lands
+        started.set()
+        release.wait(5)
+        return 'before write'
+
+    results = []
+    reader = threading.Thread(target=lambda: results.append(cache.get('k', slow_load)))
+    reader.start()
+    assert started.wait(5)
+    cache.invalidate('k')
+    release.set()
+    reader.join(5)
+    # The reader gets what it loaded, but the next one reloads after the write
+    assert results == ['before write']
+    assert len(cache) == 0
+    assert cache.get('k', loader('after write', calls)) == 'after write'
+    assert cache.get('k', loader('again', calls)) == 'after write'
+
+
+def test_written_hands_back_the_cached_value_to_update():
+    cache = LoadingCache('test', max_entries=10)
+    assert cache.written('k') is None
+    entries = cache.get('k', lambda: [])
+    cache.written('k').append('new')
+    assert cache.get('k', lambda: ['reloaded']) is entries
+    assert entries == ['new']
@@ -0,0 +1,28 @@
+import io
+
+from beacon import catalog_io
+from beacon.repository import open_repository
+
+HEADER = 'name,category,clinical_score,ux_score,security_score,integration_score,' \
+         'fda_status,success_rate,features\n'
+
+
+def app_row(name, features):
+    return f'{name},Sleep,4,4,4,4,Cleared,80%,"{features}"\n'
+
+
+def test_malformed_features_reject_the_row_not_the_import():
+    feed = HEADER + app_row('Calm', '[""a""]') + app_row('Broken', '[""a"",') \
+        + app_row('Rest', 'b|c')
+    repo = open_repository('sqlite:///:memory:')
+    result = catalog_io.import_apps(repo, io.BytesIO(feed.encode()), 'csv', chunk_size=2)
+    assert (result.imported, result.rejected) == (2, 1)
+    assert result.errors.to_dict('index') == {
+        2: {'name': 'Broken', 'error': "Apps with malformed features JSON"},
+    }
+    apps = {
+        name: list(features)
+        for chunk in repo.iter_apps(10) for name, features in zip(chunk['name'], chunk['features'])
+    }
+    assert apps == {'Calm': ['a'], 'Rest': ['b', 'c']}
+    repo.close()
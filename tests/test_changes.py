@@ -0,0 +1,18 @@
+from beacon.repository import open_repository
+from beacon.sqlite_repo import CHANGE_LOG_SIZE
+
+
+def test_batches_that_step_over_a_thousand_still_prune():
+    repo = open_repository('sqlite:///:memory:')
+    repo.publish_changes('a', [('catalog', '')])
+    # Batches of 7 from seq 2 end on a multiple of 1000 only at 6000, 13000,
+    # 20000 and 27000; the ones in between step over it
+    while repo.last_change() < 26_500:
+        repo.publish_changes('a', [('message', str(index)) for index in range(7)])
+    last = repo.last_change()
+    changes = repo.changes_since(0, limit=3 * CHANGE_LOG_SIZE)
+    # Catalog entries are kept, the rest back to the newest prune point
+    assert changes[0][2] == 'catalog'
+    oldest = changes[1][0]
+    assert last - CHANGE_LOG_SIZE - 1000 < oldest <= last - CHANGE_LOG_SIZE + 1
+    repo.close()
@@ -0,0 +1,141 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from beacon.repository import open_repository
+
+# A Monday, so the first week of check-ins is keyed by this day
+MONDAY = date(2026, 3, 2)
+
+
+def prescription(prescription_id, patient, provider, app_name='Calm Steps'):
+    prescribed = datetime(2026, 2, 20, 9, 0)
+    return {
+        'id': prescription_id, 'app_name': app_name, 'prescribed_by': provider,
+        'prescribed_to': patient, 'status': 'Active', 'prescribed_date': prescribed,
+        'next_review': prescribed + timedelta(days=30), 'adherence_rate': None,
+        'progress_notes': '',
+    }
+
+
+def patient(patient_id, name, provider):
+    return {
+        'id': patient_id, 'mrn': f'MRN{patient_id}', 'name': name, 'age': 40,
+        'condition': 'Anxiety', 'status': 'Active', 'adherence': None, 'provider': provider,
+    }
+
+
+def seeded():
+    repo = open_repository('sqlite:///:memory:')
+    repo.bulk_load('patients', [patient(1, 'Ann', 'Dr. A'), patient(2, 'Ben', 'Dr. A')])
+    repo.bulk_load('prescriptions', [
+        prescription(1, 'Ann', 'Dr. A'),
+        prescription(2, 'Ann', 'Dr. B', 'Sleep Well'),
+        prescription(3, 'Ben', 'Dr. A'),
+    ])
+    return repo
+
+
+@pytest.fixture
+def repo():
+    repo = seeded()
+    yield repo
+    repo.close()
+
+
+def days(count, start=MONDAY):
+    return [start + timedelta(days=offset) for offset in range(count)]
+
+
+def rows(repo, sql, params=()):
+    with repo.connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def totals(repo):
+    return rows(repo, "SELECT prescription_id, days, taken FROM adherence_totals ORDER BY 1")
+
+
+def rates(repo):
+    return dict(rows(repo, "SELECT id, adherence_rate FROM prescriptions"))
+
+
+def engagement(repo, provider, granularity):
+    frame = repo.engagement(provider, granularity, MONDAY - timedelta(days=30))
+    return [(period.date(), days, taken) for period, days, taken in frame.itertuples(index=False)]
+
+
+def test_a_day_is_recorded_once(repo):
+    # The first check-in for a day wins, in a batch or across calls
+    assert repo.record_checkins([(1, MONDAY, True), (1, MONDAY, False)]) == 1
+    assert repo.record_checkins([(1, MONDAY, False), (1, '2026-03-02', False)]) == 0
+    assert rows(repo, "SELECT prescription_id, day, taken FROM adherence_checkins") == [
+        (1, '2026-03-02', 1)
+    ]
+    assert totals(repo) == [(1, 1, 1)]
+    assert rates(repo)[1] == 100
+    assert engagement(repo, 'Dr. A', 'day') == [(MONDAY, 1, 1)]
+
+
+def test_rates_come_from_every_checkin_so_far(repo):
+    repo.record_checkins([(1, day, True) for day in days(3)])
+    repo.record_checkins([(1, day, False) for day in days(1, MONDAY + timedelta(days=3))])
+    repo.record_checkins([(2, day, index % 2 == 0) for index, day in enumerate(days(4))])
+    assert totals(repo) == [(1, 4, 3), (2, 4, 2)]
+    assert rates(repo) == {1: 75, 2: 50, 3: None}
+    # Unrated prescriptions are left out of the patient's average
+    assert dict(rows(repo, "SELECT name, adherence FROM patients")) == {'Ann': 63, 'Ben': None}
+
+
+def test_batches_fold_like_one_batch(repo):
+    checkins = [
+        (prescription_id, day, (prescription_id + day.day) % 3 != 0)
+        for prescription_id in (1, 2, 3) for day in days(17)
+    ]
+    # Repeats straddle the batch boundaries
+    checkins += checkins[5:40]
+    single = seeded()
+    assert repo.record_checkins(checkins, batch_size=4) == 51
+    assert single.record_checkins(checkins) == 51
+    for table in ('adherence_weekly', 'adherence_monthly', 'adherence_totals',
+                  'practice_daily', 'practice_weekly'):
+        sql = f"SELECT * FROM {table} ORDER BY 1, 2"
+        assert rows(repo, sql) == rows(single, sql), table
+    assert rates(repo) == rates(single)
+    single.close()
+
+
+def test_week_and_month_rollups(repo):
+    # Saturday 28 February falls in the week before and the month before
+    repo.record_checkins([(1, MONDAY - timedelta(days=2), True)])
+    repo.record_checkins([(1, day, day.weekday() < 5) for day in days(14)])
+    history = repo.adherence_history(1, 'week', MONDAY - timedelta(days=7))
+    assert [
+        (period.date(), days, taken) for period, days, taken in history.itertuples(index=False)
+    ] == [
+        (date(2026, 2, 23), 1, 1), (MONDAY, 7, 5), (MONDAY + timedelta(days=7), 7, 5),
+    ]
+    monthly = rows(repo, "SELECT period, days, taken FROM adherence_monthly ORDER BY period")
+    assert monthly == [('2026-02-01', 1, 1), ('2026-03-01', 14, 10)]
+
+
+def test_practice_rollups_count_checkins_either_side_of_the_watermark(repo):
+    # Prescriptions 1-3 are folded into the app usage rollup; 4 is added after
+    assert repo.refresh_rollups() == 3
+    repo.add_prescriptions([prescription(None, 'Ben', 'Dr. A', 'Sleep Well')])
+    repo.record_checkins([(1, MONDAY, True), (3, MONDAY, False), (4, MONDAY, True)])
+    repo.record_checkins([(4, MONDAY + timedelta(days=1), False), (2, MONDAY, True)])
+    expected_days = [(MONDAY, 3, 2), (MONDAY + timedelta(days=1), 1, 0)]
+    assert engagement(repo, 'Dr. A', 'day') == expected_days
+    assert engagement(repo, 'Dr. A', 'week') == [(MONDAY, 4, 2)]
+    assert engagement(repo, 'Dr. B', 'day') == [(MONDAY, 1, 1)]
+
+    # Catching the watermark up moves the app usage rollup, not the practice rollups
+    assert repo.refresh_rollups() == 1
+    assert engagement(repo, 'Dr. A', 'day') == expected_days
+    assert engagement(repo, 'Dr. A', 'week') == [(MONDAY, 4, 2)]
+    usage = repo.app_usage('Dr. A')
+    assert dict(zip(usage['app_name'], usage['prescriptions'])) == {
+        'Calm Steps': 2, 'Sleep Well': 1,
+    }
+    assert repo.refresh_rollups() == 0
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from beacon import inbox
+from beacon.repository import open_repository
+
+START = datetime(2026, 3, 2, 9, 0)
+SENDERS = ('Dr. A', 'Dr. B', 'Nurse C')
+
+
+def message(index, recipient='Ann', read=False):
+    return {
+        'id': None, 'recipient': recipient, 'sender': SENDERS[index % 3],
+        'content': f'Message {index}', 'app': ('Calm', 'Sleep', None, None, 'Focus')[index % 5],
+        # Some messages share a timestamp, so ties fall back to the id
+        'date': START + timedelta(minutes=index // 2), 'read': read,
+    }
+
+
+@pytest.fixture
+def repo():
+    repo = open_repository('sqlite:///:memory:')
+    repo.bulk_load('messages', [
+        dict(message(index, read=index % 4 == 0), id=index + 1) for index in range(40)
+    ] + [dict(message(index, recipient='Ben'), id=index + 100) for index in range(5)])
+    yield repo
+    repo.close()
+
+
+def expected(repo, recipient):
+    """The recipient's inbox figures, counted from the repository's rows."""
+    rows = sorted(repo.inbox_entries(recipient), key=lambda row: (str(row[3]), row[0]))
+    groups = {}
+    for field, position in (('senders', 1), ('apps', 2)):
+        counts = groups[field] = {}
+        for row in rows:
+            name = row[position] or None
+            counts.setdefault(name, [0, 0])
+            counts[name][0] += 1
+            counts[name][1] += not row[4]
+    unread = [row[0] for row in rows if not row[4]]
+    return {
+        'unread': len(unread), 'senders': groups['senders'], 'apps': groups['apps'],
+        'newest': [row[0] for row in reversed(rows)],
+        'newest_unread': list(reversed(unread)),
+    }
+
+
+def figures(box):
+    return {
+        'unread': box.unread, 'senders': box.senders, 'apps': box.apps,
+        'newest': box.newest(), 'newest_unread': [found.id for found in box.newest_unread()],
+    }
+
+
+def test_loaded_inbox_counts_like_the_repository(repo):
+    box = inbox.InboxCache(repo).get('Ann')
+    assert len(box) == 40
+    assert figures(box) == expected(repo, 'Ann')
+    assert box.newest(limit=3, offset=2) == expected(repo, 'Ann')['newest'][2:5]
+
+
+def test_read_and_new_messages_update_the_counters_in_place(repo):
+    cache = inbox.InboxCache(repo)
+    box = cache.get('Ann')
+    # Unread, already read and unknown ids; only the unread ones change
+    ids = [2, 3, 4, 5, 9, 999]
+    repo.mark_messages_read(ids)
+    assert cache.mark_read('Ann', ids) == [2, 3, 4]
+    assert cache.mark_read('Ann', ids) == []
+    assert figures(box) == expected(repo, 'Ann')
+
+    # New messages, one from a sender and app the inbox has not seen
+    for record in (message(3), dict(message(7), sender='Dr. New', app='Brand New')):
+        record['date'] = START + timedelta(days=1)
+        record['id'] = repo.add_message(record)
+        cache.add('Ann', inbox.entry(
+            record['id'], record['sender'], record['app'], record['date'], False
+        ))
+    assert cache.get('Ann') is box
+    assert figures(box) == expected(repo, 'Ann')
+    assert box.senders['Dr. New'] == [1, 1]
+
+    # Reading everything leaves no unread counts behind
+    unread = [found.id for found in box.newest_unread()]
+    repo.mark_messages_read(unread)
+    assert sorted(cache.mark_read('Ann', unread)) == sorted(unread)
+    assert figures(box) == expected(repo, 'Ann')
+    assert box.unread == 0 and all(counts[1] == 0 for counts in box.senders.values())
+
+
+def test_writes_to_an_unloaded_inbox_are_left_to_the_next_load(repo):
+    cache = inbox.InboxCache(repo)
+    repo.mark_messages_read([101, 102])
+    # Nothing to update in memory, so every id is reported as changed
+    assert cache.mark_read('Ben', [101, 102]) == [101, 102]
+    assert figures(cache.get('Ben')) == expected(repo, 'Ben')
+    assert cache.get('Ben').unread == 3
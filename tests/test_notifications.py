@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+from beacon import metrics
+from beacon.notifications import Dispatcher, StubTransport
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def outcomes(outcome):
+    return sum(
+        value for (_, counted), value in metrics.NOTIFICATIONS.values().items()
+        if counted == outcome
+    )
+
+
+class GatedTransport(StubTransport):
+    """Holds each send until the test lets it through."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.sending = threading.Semaphore(0)
+        self.gate = threading.Semaphore(0)
+
+    def send(self, batch):
+        self.sending.release()
+        assert self.gate.acquire(timeout=30), "send was never let through"
+        super().send(batch)
+
+
+@pytest.fixture
+def make_dispatcher():
+    """Makes dispatchers that are closed, and their workers stopped, after the test."""
+    made = []
+
+    def make(transport, **options):
+        made.append(Dispatcher(transport, **options))
+        return made[-1]
+
+    yield make
+    for each in made:
+        assert each.close(timeout=5.0)
+
+
+def submit(dispatcher, message_ids, priority='Normal'):
+    for message_id in message_ids:
+        dispatcher.submit(message_id, 'Patient', 'Dr. Smith', None, priority)
+
+
+def test_urgent_lane_is_drained_before_due_normal_notifications(make_dispatcher):
+    transport = GatedTransport(seed=0)
+    dispatcher = make_dispatcher(transport, workers=1, batch_size=10, batch_wait=0)
+    submit(dispatcher, [1])
+    # The worker is held sending 1 while the rest queue up
+    assert transport.sending.acquire(timeout=30)
+    submit(dispatcher, [2, 3, 4])
+    submit(dispatcher, [5], priority='Urgent')
+    for _ in range(3):
+        transport.gate.release()
+    wait_for(lambda: len(transport.delivered) == 5)
+    assert [n.message_id for n in transport.delivered] == [1, 5, 2, 3, 4]
+    assert transport.batches == 3
+
+
+def test_unknown_priority_goes_to_the_normal_lane(make_dispatcher):
+    transport = StubTransport(seed=0)
+    dispatcher = make_dispatcher(transport, workers=1, batch_wait=0)
+    assert dispatcher.submit(1, 'Patient', 'Dr. Smith', None, 'Whenever').priority == 'Normal'
+    wait_for(lambda: len(transport.delivered) == 1)
+
+
+def test_normal_notifications_share_batches_up_to_batch_size(make_dispatcher):
+    transport = StubTransport(seed=0)
+    dispatcher = make_dispatcher(transport, workers=1, batch_size=3, batch_wait=600)
+    submit(dispatcher, range(7))
+    # Two full batches go at once; the last one would wait out its window
+    wait_for(lambda: len(transport.delivered) == 6)
+    assert transport.batches == 2
+    assert dispatcher._lanes['Normal']
+    assert dispatcher.close()
+    assert transport.batches == 3
+    assert sorted(n.message_id for n in transport.delivered) == list(range(7))
+
+
+def test_a_lone_normal_notification_waits_for_the_batch_window(make_dispatcher):
+    transport = StubTransport(seed=0)
+    dispatcher = make_dispatcher(transport, workers=1, batch_size=50, batch_wait=0.5)
+    started = time.monotonic()
+    submit(dispatcher, [1])
+    wait_for(lambda: transport.delivered)
+    assert time.monotonic() - started >= 0.5
+
+
+def test_failed_batches_are_retried_until_delivered(make_dispatcher):
+    transport = StubTransport(fail_rate=0.5, seed=3)
+    # A short backoff keeps even a long run of failures to a few seconds
+    dispatcher = make_dispatcher(transport, workers=2, batch_size=5, batch_wait=0,
+                                 max_attempts=20, backoff=0.001)
+    retried = outcomes('retried')
+    submit(dispatcher, range(20))
+    wait_for(lambda: len(transport.delivered) == 20)
+    assert sorted(n.message_id for n in transport.delivered) == list(range(20))
+    assert not dispatcher.dead_letters
+    # A retried notification carries how many sends it took
+    assert outcomes('retried') > retried
+    assert any(n.attempts for n in transport.delivered)
+
+
+def test_retries_back_off_exponentially_then_dead_letter(make_dispatcher):
+    transport = StubTransport(fail_rate=1.0, seed=0)
+    dispatcher = make_dispatcher(transport, workers=1, batch_wait=0, max_attempts=4, backoff=0.05)
+    failed = outcomes('failed')
+    started = time.monotonic()
+    submit(dispatcher, [1, 2], priority='Urgent')
+    wait_for(lambda: len(dispatcher.dead_letters) == 2)
+    # Retries wait 0.05, 0.1 and 0.2 s before the fourth and last attempt
+    assert time.monotonic() - started >= 0.35
+    assert sorted((n.message_id, n.attempts) for n in dispatcher.dead_letters) == [(1, 4), (2, 4)]
+    assert not transport.delivered
+    assert outcomes('failed') - failed == 2
+    assert not dispatcher._retries
+
+
+def test_close_delivers_what_is_still_queued(make_dispatcher):
+    transport = StubTransport(seed=0)
+    dispatcher = make_dispatcher(transport, workers=2, batch_wait=60)
+    submit(dispatcher, range(3))
+    # The batch window is a minute, but closing does not wait it out
+    assert dispatcher.close(timeout=5.0)
+    assert sorted(n.message_id for n in transport.delivered) == [0, 1, 2]
+    with pytest.raises(RuntimeError):
+        submit(dispatcher, [3])
+
+
+def test_close_sends_waiting_retries_once_more(make_dispatcher):
+    transport = StubTransport(fail_rate=1.0, seed=0)
+    dispatcher = make_dispatcher(transport, workers=1, batch_wait=0, max_attempts=5, backoff=60)
+    submit(dispatcher, [1], priority='Urgent')
+    wait_for(lambda: dispatcher._retries)
+    assert dispatcher.close(timeout=5.0)
+    # The retry went out without its backoff and failed, which ends it
+    assert [(n.message_id, n.attempts) for n in dispatcher.dead_letters] == [(1, 2)]
+    assert not dispatcher._retries
@@ -0,0 +1,56 @@
+import pytest
+
+from beacon import sqlite_repo
+from beacon.repository import open_repository
+
+
+def patient(patient_id, name, provider='Dr. A', status='Active'):
+    return {
+        'id': patient_id, 'mrn': f'MR{patient_id:04d}', 'name': name, 'age': 40,
+        'condition': 'Anxiety', 'status': status, 'adherence': None, 'provider': provider,
+    }
+
+
+@pytest.fixture
+def repo():
+    repo = open_repository('sqlite:///:memory:')
+    repo.bulk_load('patients', [
+        patient(1, 'Jo Park'), patient(2, 'john Lee'), patient(3, 'Joan Ray', status='Inactive'),
+        patient(4, 'Jon Other', provider='Dr. B'), patient(5, '50% Club'), patient(6, 'J_ Test'),
+        patient(12, 'Amy Fox'),
+    ])
+    yield repo
+    repo.close()
+
+
+def names(repo, query, status=None, provider='Dr. A'):
+    patients, total = repo.search_patients(provider, query, status)
+    assert total == len(patients)
+    return list(patients['name'])
+
+
+def test_short_queries_match_name_or_mrn_prefixes(repo):
+    assert names(repo, 'jo') == ['Jo Park', 'Joan Ray', 'john Lee']
+    assert names(repo, 'JO', status='Active') == ['Jo Park', 'john Lee']
+    assert names(repo, 'MR') == [
+        '50% Club', 'Amy Fox', 'J_ Test', 'Jo Park', 'Joan Ray', 'john Lee',
+    ]
+    assert names(repo, 'zz') == []
+
+
+def test_wildcards_in_a_prefix_match_themselves(repo):
+    assert names(repo, '5%') == []
+    assert names(repo, '50') == ['50% Club']
+    assert names(repo, 'J_') == ['J_ Test']
+
+
+def test_prefix_search_reads_only_the_matching_index_ranges(repo):
+    with repo.connection() as conn:
+        plan = [row[3] for row in conn.execute(
+            'EXPLAIN QUERY PLAN ' + sqlite_repo.SQL_SEARCH_PATIENTS['prefix', False],
+            ('Dr. A', 'jo', 'jo\U0010ffff', 'Dr. A', 'jo', 'jo\U0010ffff', -1, 0),
+        )]
+    assert any('ix_patients_provider_name (provider=? AND name>? AND name<?)' in step
+               for step in plan), plan
+    assert any('ix_patients_provider_mrn (provider=? AND mrn>? AND mrn<?)' in step
+               for step in plan), plan
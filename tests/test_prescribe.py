@@ -0,0 +1,57 @@
+import threading
+from datetime import datetime, timedelta
+
+from beacon.repository import open_repository
+
+NOW = datetime(2026, 3, 2, 9, 0)
+
+
+def prescription(patient, app_name='Calm Steps', status='Active'):
+    return {
+        'id': None, 'app_name': app_name, 'prescribed_by': 'Dr. A', 'prescribed_to': patient,
+        'status': status, 'prescribed_date': NOW, 'next_review': NOW + timedelta(days=30),
+        'adherence_rate': None, 'progress_notes': '',
+    }
+
+
+def open_ids(repo, app_name):
+    return sorted(row[0] for row in repo.open_reviews() if row[1] == app_name)
+
+
+def test_add_new_prescriptions_skips_patients_already_on_the_app():
+    repo = open_repository('sqlite:///:memory:')
+    repo.add_prescriptions([
+        prescription('Ann'), prescription('Ben', status='Completed'),
+        prescription('Cy', app_name='Sleep Well'),
+    ])
+    ids = repo.add_new_prescriptions(
+        'Calm Steps', [prescription(patient) for patient in ('Ann', 'Ben', 'Cy')]
+    )
+    assert ids[0] is None
+    assert None not in ids[1:]
+    assert repo.patients_on_app('Calm Steps', ['Ann', 'Ben', 'Cy']) == {'Ann', 'Ben', 'Cy'}
+    repo.close()
+
+
+def test_concurrent_prescribers_write_each_patient_once(tmp_path):
+    url = f'sqlite:///{tmp_path / "beacon.db"}'
+    patients = [f'Patient {index}' for index in range(50)]
+    # One repository per prescriber, as each worker process has its own
+    repos = [open_repository(url) for _ in range(4)]
+    start = threading.Barrier(len(repos))
+    written = []
+
+    def prescribe(repo):
+        start.wait()
+        ids = repo.add_new_prescriptions('Calm Steps', [prescription(p) for p in patients])
+        written.extend(prescription_id for prescription_id in ids if prescription_id)
+
+    threads = [threading.Thread(target=prescribe, args=(repo,)) for repo in repos]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(written) == open_ids(repos[0], 'Calm Steps')
+    assert len(written) == len(patients)
+    for repo in repos:
+        repo.close()
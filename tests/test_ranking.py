@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from beacon import ranking
+from beacon.repository import open_repository
+from beacon.schema import load_apps
+from beacon.synthetic import seed_repository
+
+# More apps than the cached top, so pages past it take the full sort
+APPS = ranking.TOP_K * 2 + 500
+
+
+@pytest.fixture(scope='module')
+def apps():
+    repo = open_repository('sqlite:///:memory:')
+    seed_repository(repo, apps=APPS, prescriptions=1, messages=1, patients=1, providers=1)
+    apps, _ = load_apps(repo.list_apps())
+    repo.close()
+    return apps
+
+
+@pytest.fixture
+def ranker(apps):
+    return ranking.Ranker(apps)
+
+
+def full_sort(scores):
+    # Best first, ties by catalog row
+    rows = np.flatnonzero(np.isfinite(scores))
+    return rows[np.lexsort((rows, -scores[rows]))].tolist()
+
+
+def weights(**named):
+    return ranking.normalize(named)
+
+
+def test_one_weighted_score_orders_by_that_column(apps, ranker):
+    order = ranker.order(weights(clinical=1))
+    expected = sorted(range(len(apps)), key=lambda row: (-apps['clinical_score'].iloc[row], row))
+    assert order[:len(apps)].tolist() == expected
+
+
+@pytest.mark.parametrize('named', [
+    ranking.DEFAULT_WEIGHTS,
+    # Whole percentages, so the cut at TOP_K falls among many ties
+    {'success': 1},
+])
+def test_pages_either_side_of_the_cached_top_match_a_full_sort(ranker, named):
+    order = ranker.order(weights(**named))
+    expected = full_sort(ranker.scores(weights(**named)))
+    assert len(order) == APPS
+    top = ranking.TOP_K
+    for start, stop in ((0, 20), (top - 10, top), (top - 5, top + 5), (APPS - 20, APPS)):
+        assert order[start:stop].tolist() == expected[start:stop], (start, stop)
+
+
+def test_the_full_sort_is_only_paid_for_past_the_top(ranker, monkeypatch):
+    calls = []
+    ranked = ranker.ranked
+    monkeypatch.setattr(ranker, 'ranked', lambda *args: calls.append(args) or ranked(*args))
+    order = ranker.order(weights(clinical=1))
+    order[:ranking.TOP_K]
+    assert not calls
+    order[ranking.TOP_K:ranking.TOP_K + 10]
+    order[APPS - 10:APPS]
+    assert len(calls) == 1
+
+
+def test_recommendations_leave_out_current_apps_on_every_page(apps, ranker):
+    names = apps['name']
+    profile = ranking.Profile('Ann', ('Insomnia',), (
+        (names.iloc[0], 90, 'Active'), (names.iloc[1], 40, 'Completed'),
+        (names.iloc[APPS - 1], None, 'Active'),
+    ))
+    order = ranker.order(weights(**ranking.DEFAULT_WEIGHTS), profile=profile)
+    expected = full_sort(ranker.recommendation_scores(weights(**ranking.DEFAULT_WEIGHTS), profile))
+    assert len(order) == ranker.rankable(profile) == APPS - 2
+    assert order[:len(order)].tolist() == expected
+    assert {0, APPS - 1}.isdisjoint(expected)
+    # Sleep and mental health apps get the condition's boost
+    top = apps['category'].iloc[order[:20]]
+    assert top.isin(ranking.CONDITION_CATEGORIES['Insomnia']).all()
+
+
+def test_top_rankings_are_cached_until_the_history_changes(apps, ranker):
+    profile = ranking.Profile('Ann', ('Asthma',), ())
+    first = ranker.top(weights(ux=1), profile)
+    assert ranker.top(weights(ux=1), profile) is first
+    moved_on = profile._replace(history=((apps['name'].iloc[first[0]], 80, 'Active'),))
+    assert ranker.top(weights(ux=1), moved_on)[0] != first[0]
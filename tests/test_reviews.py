@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from beacon.repository import date_key, open_repository
+from beacon.reviews import ReviewSchedule
+
+NOW = datetime(2026, 3, 2, 9, 0)
+PROVIDERS = ('Dr. A', 'Dr. B')
+PATIENTS = ('Ann', 'Ben', 'Cy')
+
+
+def prescription(index, due, status='Active'):
+    return {
+        'id': None, 'app_name': f'App {index % 4}', 'prescribed_by': PROVIDERS[index % 2],
+        'prescribed_to': PATIENTS[index % 3], 'status': status,
+        'prescribed_date': NOW - timedelta(days=60), 'next_review': due,
+        'adherence_rate': None, 'progress_notes': '',
+    }
+
+
+def add(repo, records):
+    for record, prescription_id in zip(records, repo.add_prescriptions(records)):
+        record['id'] = prescription_id
+    return records
+
+
+@pytest.fixture
+def repo():
+    repo = open_repository('sqlite:///:memory:')
+    # Due dates either side of NOW, some on the same day, one closed
+    add(repo, [prescription(index, NOW + timedelta(days=index * 7 % 50 - 20, hours=index))
+               for index in range(24)])
+    add(repo, [prescription(24, NOW, status='Completed')])
+    yield repo
+    repo.close()
+
+
+def open_reviews(repo, kind, owner):
+    column = 2 if kind == 'provider' else 3
+    return [
+        (date_key(row[4]), row[0]) for row in repo.open_reviews() if row[column] == owner
+    ]
+
+
+def assert_matches_repository(schedule, repo):
+    for kind, owners in (('provider', PROVIDERS), ('patient', PATIENTS)):
+        for owner in owners:
+            reviews = open_reviews(repo, kind, owner)
+            ids = [prescription_id for _, prescription_id in reviews]
+            overdue = [i for due, i in reviews if due < date_key(NOW)]
+            week = [i for due, i in reviews
+                    if date_key(NOW) <= due < date_key(NOW + timedelta(days=7))]
+            count, found = schedule.overdue(kind, owner, now=NOW)
+            assert (count, [review.prescription_id for review in found]) == (len(overdue), overdue)
+            count, found = schedule.overdue(kind, owner, now=NOW, limit=2)
+            assert (count, [review.prescription_id for review in found]) == (
+                len(overdue), overdue[:2]
+            )
+            count, found = schedule.due_within(kind, owner, 7, now=NOW)
+            assert (count, [review.prescription_id for review in found]) == (len(week), week)
+            upcoming = ids[len(overdue):]
+            next_due = schedule.next_due(kind, owner, now=NOW)
+            assert (next_due and next_due.prescription_id) == (upcoming[0] if upcoming else None)
+
+
+def test_loaded_schedule_answers_like_the_repository(repo):
+    schedule = ReviewSchedule.load(repo)
+    assert len(schedule) == 24
+    assert_matches_repository(schedule, repo)
+    assert schedule.due_within('provider', 'Nobody', 7, now=NOW) == (0, [])
+
+
+def test_batches_and_reschedules_keep_the_ranges_sorted(repo):
+    schedule = ReviewSchedule.load(repo)
+    batch = add(repo, [
+        prescription(index, NOW + timedelta(days=index % 9 - 4, minutes=index))
+        for index in range(30, 60)
+    ])
+    # Closed and unscheduled prescriptions are not filed
+    skipped = add(repo, [prescription(60, NOW, status='Completed'), prescription(61, None)])
+    schedule.add_many(batch + skipped)
+    assert len(schedule) == 54
+    assert_matches_repository(schedule, repo)
+
+    # Re-filing a batch that is already filed moves it rather than adding it twice
+    for record in batch[:5]:
+        record['next_review'] = NOW + timedelta(days=40)
+        repo.set_next_review(record['id'], record['next_review'])
+    schedule.add_many(batch[:5])
+    moved = batch[5]['id']
+    repo.set_next_review(moved, NOW - timedelta(days=30))
+    schedule.reschedule(moved, NOW - timedelta(days=30))
+    assert len(schedule) == 54
+    assert_matches_repository(schedule, repo)
+
+
+def test_refresh_refiles_or_drops_a_prescription(repo):
+    schedule = ReviewSchedule.load(repo)
+    prescription_id = list(repo.open_reviews())[0][0]
+    repo.set_next_review(prescription_id, NOW + timedelta(days=3))
+    schedule.refresh(prescription_id, repo.open_review(prescription_id))
+    assert_matches_repository(schedule, repo)
+    schedule.refresh(prescription_id, None)
+    assert len(schedule) == 23
+    for kind, owners in (('provider', PROVIDERS), ('patient', PATIENTS)):
+        for owner in owners:
+            _, found = schedule.due_within(kind, owner, 100, now=NOW - timedelta(days=50))
+            assert prescription_id not in [review.prescription_id for review in found]
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from beacon import search
+from beacon.repository import open_repository
+from beacon.schema import load_apps
+from beacon.synthetic import seed_repository
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    repo = open_repository('sqlite:///:memory:')
+    seed_repository(repo, apps=300, prescriptions=1, messages=1, patients=1, providers=1)
+    apps, features = load_apps(repo.list_apps())
+    repo.close()
+    return apps, features, search.SearchIndex(apps, features)
+
+
+def words(apps, features):
+    """Every app's tokens, from its description and features."""
+    return [
+        set(search.tokenize(description)).union(
+            *(search.tokenize(feature) for feature in features.of(row))
+        )
+        for row, description in enumerate(apps['description'])
+    ]
+
+
+def matches(tokens, query):
+    # Every word must be there, except the last, which only has to start one
+    *whole, last = search.tokenize(query) or ['']
+    return set(whole) <= tokens and any(token.startswith(last) for token in tokens)
+
+
+def expected(apps, features, query, **filters):
+    rows = [row for row, tokens in enumerate(words(apps, features)) if matches(tokens, query)]
+
+    def narrow(rows, skip=None):
+        return [
+            row for row in rows
+            if all(apps[facet].iloc[row] == value for facet, value in filters.items()
+                   if value is not None and facet != skip)
+        ]
+
+    counts = {
+        facet: {value: 0 for value in sorted(apps[facet].unique())} for facet in search.FACETS
+    }
+    for facet in search.FACETS:
+        for row in narrow(rows, skip=facet):
+            counts[facet][apps[facet].iloc[row]] += 1
+    return narrow(rows), counts
+
+
+@pytest.mark.parametrize('query, filters', [
+    ('', {}),
+    ('therapy', {}),
+    ('daily mood', {}),
+    ('daily mo', {}),
+    ('Sleep  ANAL', {'fda_status': 'Pending'}),
+    ('s', {'category': 'Nutrition'}),
+    ('digital 1', {'category': 'Nutrition', 'fda_status': 'FDA Cleared'}),
+    ('unheard', {}),
+    ('', {'category': 'No such category', 'fda_status': None}),
+])
+def test_search_matches_a_scan_of_the_catalog(catalog, query, filters):
+    apps, features, index = catalog
+    result = index.search(query, **filters)
+    rows, counts = expected(apps, features, query, **filters)
+    assert result.positions.tolist() == rows
+    assert result.facet_counts == counts
+
+
+def test_only_the_last_word_matches_as_a_prefix(catalog):
+    apps, features, index = catalog
+    everything = len(apps)
+    assert len(index.search('therap').positions) == everything
+    assert len(index.search('therap digital').positions) == 0
+    assert len(index.search('digital therap').positions) == everything
+
+
+def test_facet_counts_ignore_their_own_filter(catalog):
+    apps, _, index = catalog
+    result = index.search('', category='Nutrition')
+    # Picking another category is still offered with its full count
+    assert result.facet_counts['category'] == apps['category'].value_counts().to_dict()
+    assert sum(result.facet_counts['fda_status'].values()) == len(result.positions)
+    assert np.all(apps['category'].iloc[result.positions] == 'Nutrition')